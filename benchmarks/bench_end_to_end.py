@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""Offline end-to-end benchmark of the graph and multi-agent workflows.
+
+Runs `graph.py`'s `builder` and `multi_agent.py`'s `supervisor_builder` end to
+end against the deterministic fakes in benchmarks/fakes.py: no API keys and no
+network access are needed, and the same arguments always produce the same
+prompts, queries and pages. The human feedback interrupt is approved
+automatically.
+
+For every workflow, section count and search depth it reports the best wall
+time over --repeat runs, the critical path of the traced run, LLM and search
+call counts, and the peak traced memory of one extra run under tracemalloc.
+
+With --cassette, the run is replayed from a recorded cassette instead (see
+open_deep_research.cassettes): pass the topic and configuration it was recorded
+with, and the recorded latencies are replayed.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --sections 3 6 --depth 1 2 \\
+        --llm-latency 0.05 --search-latency 0.2 --content-chars 8000
+    python benchmarks/bench_end_to_end.py --workflow graph --cassette run.jsonl.gz \\
+        --topic "Recorded topic" --config '{"planner_model": "gpt-4.1"}'
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from contextlib import nullcontext
+from typing import Any, Dict, List
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from fakes import FakeChatModel, FakeSearchBackend, install_fakes
+from open_deep_research.graph import builder
+from open_deep_research.multi_agent import supervisor_builder
+from open_deep_research.rate_limit import configure_rate_limits
+from open_deep_research.tracing import LLM, NODE, PROVIDER, critical_path, summarize, trace_run
+
+TOPIC = "Offline benchmark topic"
+WORKFLOWS = ("graph", "multi_agent")
+
+async def run_workflow(workflow: str, config: Dict[str, Any], topic: str = TOPIC) -> Dict[str, Any]:
+    """Run one report end to end, approving the report plan, and return the final state."""
+    if workflow == "graph":
+        graph = builder.compile(checkpointer=MemorySaver())
+        result = await graph.ainvoke({"topic": topic}, config)
+        while "__interrupt__" in result:
+            result = await graph.ainvoke(Command(resume={"feedback": "正确"}), config)
+        return result
+    graph = supervisor_builder.compile()
+    return await graph.ainvoke({"messages": [{"role": "user", "content": topic}]}, config)
+
+def make_config(args: argparse.Namespace, depth: int) -> Dict[str, Any]:
+    replay = {"cassette_path": args.cassette, "cassette_mode": "replay"} if args.cassette else {}
+    return {"configurable": {
+        "thread_id": f"bench-{uuid.uuid4().hex}",
+        "search_api": "tavily",
+        "number_of_queries": args.queries,
+        "max_search_depth": depth,
+        "max_concurrent_sections": args.max_concurrent_sections,
+        "max_concurrent_llm_calls": args.max_concurrent_llm_calls,
+        **replay,
+        **json.loads(args.config or "{}"),
+    }}
+
+async def measure(workflow: str, sections: int, depth: int, args: argparse.Namespace) -> Dict[str, Any]:
+    chat_model = FakeChatModel(latency=args.llm_latency, sections=sections, queries=args.queries,
+                               search_depth=depth, output_chars=args.output_chars)
+    backend = FakeSearchBackend(latency=args.search_latency, results=args.results,
+                                content_chars=args.content_chars, counter=chat_model.counter)
+    with nullcontext() if args.cassette else install_fakes(chat_model, backend):
+        walls = []
+        spans = []
+        for _ in range(args.repeat):
+            async with trace_run(echo=False) as trace:
+                start = time.perf_counter()
+                result = await run_workflow(workflow, make_config(args, depth), args.topic)
+                walls.append(time.perf_counter() - start)
+            spans = trace.spans
+
+        # Memory is measured on a separate run, so tracemalloc does not slow the timed ones
+        tracemalloc.start()
+        await run_workflow(workflow, make_config(args, depth), args.topic)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    path = critical_path(spans)
+    llm_spans = [s for s in spans if s.kind == LLM]
+    return {
+        "workflow": workflow,
+        "sections": sections,
+        "depth": depth,
+        "wall_s": min(walls),
+        "critical_path_s": sum(s.duration for level, s in path if level == 0),
+        "critical_path": [s.name for level, s in path if level == 0 and s.kind == NODE],
+        "llm_calls": len(llm_spans),
+        "search_calls": sum(s.attributes.get("queries", 0) for s in spans
+                            if s.kind == PROVIDER and s.name.startswith("search:")),
+        "tokens": sum(s.attributes.get("input_tokens", 0) + s.attributes.get("output_tokens", 0) for s in llm_spans),
+        "peak_mem_mb": peak / 1e6,
+        "report_chars": len(result.get("final_report") or ""),
+        "summary": summarize(spans, title=f"{workflow}, {sections} sections, depth {depth}"),
+    }
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    configure_rate_limits({"tavily": {"rate": args.search_rate, "burst": args.search_rate}})
+    results = []
+    print(f"{'workflow':<12} {'sections':>8} {'depth':>5} {'wall s':>8} {'crit s':>8} {'llm':>5} "
+          f"{'search':>6} {'tokens':>9} {'peak MB':>8}")
+    for workflow in args.workflow:
+        for sections in args.sections:
+            for depth in args.depth:
+                result = await measure(workflow, sections, depth, args)
+                results.append(result)
+                print(f"{workflow:<12} {sections:>8} {depth:>5} {result['wall_s']:>8.2f} "
+                      f"{result['critical_path_s']:>8.2f} {result['llm_calls']:>5} {result['search_calls']:>6} "
+                      f"{result['tokens']:>9} {result['peak_mem_mb']:>8.1f}")
+                if args.critical_path:
+                    print(result["summary"] + "\n")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark both workflows end to end against offline fakes")
+    parser.add_argument("--workflow", nargs="+", choices=WORKFLOWS, default=list(WORKFLOWS), help="Workflows to run")
+    parser.add_argument("--sections", nargs="+", type=int, default=[3], help="Research sections per report")
+    parser.add_argument("--depth", nargs="+", type=int, default=[2],
+                        help="Search iterations per section (max_search_depth for the graph, searches per researcher)")
+    parser.add_argument("--queries", type=int, default=2, help="Search queries per iteration")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per chat model call")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Seconds per search query")
+    parser.add_argument("--results", type=int, default=5, help="Results per search query")
+    parser.add_argument("--content-chars", type=int, default=5000, help="Characters of raw content per result")
+    parser.add_argument("--output-chars", type=int, default=1500, help="Characters of each written section")
+    parser.add_argument("--search-rate", type=float, default=1e6,
+                        help="Search requests per second allowed by the rate limiter (default: unlimited)")
+    parser.add_argument("--max-concurrent-sections", type=int, default=4, help="max_concurrent_sections")
+    parser.add_argument("--max-concurrent-llm-calls", type=int, default=8, help="max_concurrent_llm_calls")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per configuration (best is reported)")
+    parser.add_argument("--critical-path", action="store_true", help="Print the critical path of every configuration")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--cassette", help="Replay this recorded cassette instead of running against the fakes")
+    parser.add_argument("--topic", default=TOPIC, help="Report topic (the recorded one when replaying a cassette)")
+    parser.add_argument("--config", help="JSON object of further configurable values, e.g. the recorded models")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
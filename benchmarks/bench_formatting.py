@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""Micro-benchmark for the source formatters on synthetic 100-source inputs.
+
+Compares the streaming formatters in open_deep_research.formatting against the
+previous `+=` implementations (kept below as reference) and checks that both
+produce identical output.
+
+Usage:
+    python benchmarks/bench_formatting.py --sources 100 --chars 30000 --repeat 20
+"""
+
+import argparse
+import io
+import random
+import string
+import timeit
+import tracemalloc
+
+from open_deep_research.formatting import iter_source_segments, write_segments
+from open_deep_research.state import Section
+from open_deep_research.utils import (
+    deduplicate_and_format_sources,
+    format_scraped_pages,
+    format_sections,
+    format_tavily_results,
+    unique_sources_by_url,
+)
+
+## Reference implementations (string concatenation) --
+
+def naive_deduplicate_and_format_sources(search_response, max_tokens_per_source=5000, include_raw_content=True):
+    sources_list = []
+    for response in search_response:
+        sources_list.extend(response['results'])
+    unique_sources = {source['url']: source for source in sources_list}
+    formatted_text = "Content from sources:\n"
+    for i, source in enumerate(unique_sources.values(), 1):
+        formatted_text += f"{'='*80}\n"
+        formatted_text += f"Source: {source['title']}\n"
+        formatted_text += f"{'-'*80}\n"
+        formatted_text += f"URL: {source['url']}\n===\n"
+        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
+        if include_raw_content:
+            char_limit = max_tokens_per_source * 4
+            raw_content = source.get('raw_content', '') or ''
+            if len(raw_content) > char_limit:
+                raw_content = raw_content[:char_limit] + "... [truncated]"
+            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
+        formatted_text += f"{'='*80}\n\n"
+    return formatted_text.strip()
+
+def naive_format_tavily_results(search_results):
+    formatted_output = "Search results: \n\n"
+    unique_results = {}
+    for response in search_results:
+        for result in response['results']:
+            if result['url'] not in unique_results:
+                unique_results[result['url']] = result
+    for i, (url, result) in enumerate(unique_results.items()):
+        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
+        formatted_output += f"URL: {url}\n\n"
+        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
+        if result.get('raw_content'):
+            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:30000]}"
+        formatted_output += "\n\n" + "-" * 80 + "\n"
+    return formatted_output
+
+def naive_format_scraped_pages(titles, urls, pages):
+    formatted_output = "Search results: \n\n"
+    for i, (title, url, page) in enumerate(zip(titles, urls, pages)):
+        formatted_output += f"\n\n--- SOURCE {i+1}: {title} ---\n"
+        formatted_output += f"URL: {url}\n\n"
+        formatted_output += f"FULL CONTENT:\n {page}"
+        formatted_output += "\n\n" + "-" * 80 + "\n"
+    return formatted_output
+
+def naive_format_sections(sections):
+    formatted_str = ""
+    for idx, section in enumerate(sections, 1):
+        formatted_str += f"""
+{'='*60}
+Section {idx}: {section.name}
+{'='*60}
+Description:
+{section.description}
+Requires Research: 
+{section.research}
+
+Content:
+{section.content if section.content else '[Not yet written]'}
+
+"""
+    return formatted_str
+
+## Synthetic inputs --
+
+def make_search_response(num_sources, chars, num_queries=4, seed=0):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + "     \n"
+    body = "".join(rng.choice(alphabet) for _ in range(chars))
+    per_query = max(1, num_sources // num_queries)
+    return [
+        {
+            "query": f"query {q}",
+            "results": [
+                {
+                    "title": f"Source {q}-{i}",
+                    "url": f"https://example.com/{q}/{i}",
+                    "content": body[:300],
+                    "score": 1.0,
+                    # Rotate so sources are distinct strings of the same length
+                    "raw_content": body[i:] + body[:i],
+                }
+                for i in range(per_query)
+            ],
+        }
+        for q in range(num_queries)
+    ]
+
+def bench(name, fn, reference, repeat):
+    assert fn() == reference(), f"{name}: output differs from the reference implementation"
+    new = min(timeit.repeat(fn, number=1, repeat=repeat))
+    old = min(timeit.repeat(reference, number=1, repeat=repeat))
+
+    tracemalloc.start()
+    fn()
+    _, new_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    reference()
+    _, old_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<34} streaming {new * 1000:8.2f} ms  concat {old * 1000:8.2f} ms  "
+          f"speedup {old / new:5.2f}x  peak mem {new_peak / 1e6:7.1f} MB vs {old_peak / 1e6:7.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the source formatters")
+    parser.add_argument("--sources", type=int, default=100, help="Number of synthetic sources")
+    parser.add_argument("--chars", type=int, default=30000, help="Characters of raw content per source")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    response = make_search_response(args.sources, args.chars)
+    entries = [result for r in response for result in r["results"]]
+    titles = [e["title"] for e in entries]
+    urls = [e["url"] for e in entries]
+    pages = [e["raw_content"] for e in entries]
+    sections = [Section(name=e["title"], description=e["content"], research=True, content=e["raw_content"]) for e in entries]
+
+    print(f"{len(entries)} sources x {args.chars} chars\n")
+    bench("deduplicate_and_format_sources", lambda: deduplicate_and_format_sources(response, 8000),
+          lambda: naive_deduplicate_and_format_sources(response, 8000), args.repeat)
+    bench("format_tavily_results", lambda: format_tavily_results(response),
+          lambda: naive_format_tavily_results(response), args.repeat)
+    bench("format_scraped_pages", lambda: format_scraped_pages(titles, urls, pages),
+          lambda: naive_format_scraped_pages(titles, urls, pages), args.repeat)
+    bench("format_sections", lambda: format_sections(sections),
+          lambda: naive_format_sections(sections), args.repeat)
+
+    # Streaming straight into a buffer never materializes the full string twice
+    buffer = io.StringIO()
+    written = write_segments(iter_source_segments(unique_sources_by_url(response), 8000), buffer)
+    print(f"\nwrite_segments streamed {written} characters into a StringIO buffer")
+
+if __name__ == "__main__":
+    main()
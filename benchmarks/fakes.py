@@ -0,0 +1,252 @@
+"""Deterministic in-process fakes of the chat models and the search backend.
+
+The fakes let both workflows run end to end without network access:
+
+- ``FakeChatModel`` answers every structured output the graph workflow asks for
+  (report plan, queries, query batches, grades) and drives the multi-agent
+  supervisor and researchers through their tools. Outputs depend only on the
+  prompt, so a run is reproducible; each call sleeps for a configurable latency
+  and reports token usage.
+- ``FakeSearchBackend`` stands in for the Tavily client, so rate limiting,
+  caching, coalescing and passage selection all run as they would in production.
+  Latency, result count and page size are configurable.
+
+Usage:
+    with install_fakes(FakeChatModel(latency=0.05), FakeSearchBackend(latency=0.1)):
+        await graph.ainvoke({"topic": topic}, config)
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.output_parsers.openai_tools import PydanticToolsParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from open_deep_research import graph as graph_module
+from open_deep_research import multi_agent as multi_agent_module
+from open_deep_research import utils
+from open_deep_research.state import (
+    Feedback,
+    Queries,
+    SearchQuery,
+    Section,
+    SectionQueries,
+    SectionQueriesBatch,
+    Sections,
+)
+
+# Synthetic vocabulary; large enough that generated queries and pages rarely overlap
+_SYLLABLES = ("ba", "de", "fi", "go", "hu", "ja", "ke", "li", "mo", "nu",
+              "pa", "re", "si", "to", "vu", "wa", "xe", "yi", "zo", "ru")
+VOCABULARY = [a + b + c for a in _SYLLABLES for b in _SYLLABLES for c in _SYLLABLES]
+
+def _seed(*parts: Any) -> int:
+    return int.from_bytes(hashlib.sha256("\x1f".join(map(str, parts)).encode("utf-8")).digest()[:8], "big")
+
+def _words(rng: random.Random, chars: int) -> str:
+    words: List[str] = []
+    length = 0
+    while length < chars:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+def _message_text(message: BaseMessage) -> str:
+    text = message.content if isinstance(message.content, str) else str(message.content)
+    return text + str(getattr(message, "tool_calls", "") or "")
+
+class CallCounter:
+    """Thread-safe counters of the calls a fake served."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            return self.counts.get(key, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering the prompts of both workflows with deterministic synthetic output."""
+
+    latency: float = 0.0
+    sections: int = 3
+    queries: int = 2
+    search_depth: int = 1
+    output_chars: int = 1500
+    counter: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.counter is None:
+            self.counter = CallCounter()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": "fake-benchmark"}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        names = [convert_to_openai_tool(tool)["function"]["name"] for tool in tools]
+        return self.bind(tool_names=names, **kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        return self.bind(structured_output=schema) | PydanticToolsParser(tools=[schema], first_tool_only=True)
+
+    def _respond(self, messages: List[BaseMessage], structured_output: Any = None,
+                 tool_names: Optional[List[str]] = None) -> AIMessage:
+        prompt = "\n".join(_message_text(m) for m in messages)
+        rng = random.Random(_seed(prompt))
+        call_id = f"call_{rng.getrandbits(48):012x}"
+
+        def call(name: str, args: Dict[str, Any]) -> AIMessage:
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+        def queries() -> List[Dict[str, str]]:
+            return [{"search_query": _words(rng, 40)} for _ in range(self.queries)]
+
+        if structured_output is Sections:
+            plan = [Section(name="Introduction", description=_words(rng, 80), research=False, content="")]
+            plan += [Section(name=f"Section {i + 1}", description=_words(rng, 120), research=True, content="")
+                     for i in range(self.sections)]
+            plan.append(Section(name="Conclusion", description=_words(rng, 80), research=False, content=""))
+            return call("Sections", Sections(sections=plan).model_dump())
+        if structured_output is Queries:
+            return call("Queries", Queries(queries=queries()).model_dump())
+        if structured_output is SectionQueriesBatch:
+            batch = [SectionQueries(section_name=f"Section {i + 1}", queries=[SearchQuery(**q) for q in queries()])
+                     for i in range(self.sections)]
+            return call("SectionQueriesBatch", SectionQueriesBatch(sections=batch).model_dump())
+        if structured_output is Feedback:
+            # Always ask for more, so max_search_depth decides how often sections search
+            return call("Feedback", Feedback(grade="fail", follow_up_queries=queries()).model_dump())
+        if structured_output is not None:
+            raise ValueError(f"FakeChatModel has no answer for {structured_output}")
+
+        if tool_names and "Sections" in tool_names:
+            return self._supervise(messages, rng, call)
+        if tool_names and "Section" in tool_names:
+            called = [c["name"] for m in messages for c in getattr(m, "tool_calls", None) or []]
+            if "Section" in called:
+                return AIMessage(content="The section is written.")
+            if len(called) < self.search_depth:
+                search_tool = next(name for name in tool_names if name != "Section")
+                return call(search_tool, {"queries" if search_tool == "tavily_search" else "search_queries":
+                                          [q["search_query"] for q in queries()]})
+            return call("Section", {"name": f"Section {rng.randint(1, 10 ** 6)}", "description": _words(rng, 80),
+                                    "content": f"## {_words(rng, 30)}\n\n{_words(rng, self.output_chars)}"})
+        return AIMessage(content=_words(rng, self.output_chars))
+
+    def _supervise(self, messages: List[BaseMessage], rng: random.Random, call: Any) -> AIMessage:
+        """Plan the sections, then write the introduction and conclusion, then finish."""
+        called = {c["name"] for m in messages for c in getattr(m, "tool_calls", None) or []}
+        if "Sections" not in called:
+            return call("Sections", {"sections": [f"Section {i + 1}: {_words(rng, 60)}" for i in range(self.sections)]})
+        if "Introduction" not in called:
+            return call("Introduction", {"name": _words(rng, 30), "content": _words(rng, self.output_chars // 3)})
+        if "Conclusion" not in called:
+            return call("Conclusion", {"name": "Conclusion", "content": _words(rng, self.output_chars // 3)})
+        return AIMessage(content="The report is complete.")
+
+    def _result(self, messages: List[BaseMessage], **kwargs: Any) -> ChatResult:
+        message = self._respond(messages, kwargs.get("structured_output"), kwargs.get("tool_names"))
+        input_tokens = sum(len(_message_text(m)) for m in messages) // 4
+        output_tokens = len(_message_text(message)) // 4
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        self.counter.add("llm_calls")
+        self.counter.add("input_tokens", input_tokens)
+        self.counter.add("output_tokens", output_tokens)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages, **kwargs)
+
+class FakeSearchBackend:
+    """Stand-in for AsyncTavilyClient returning synthetic pages derived from the query."""
+
+    def __init__(self, latency: float = 0.0, results: int = 5, content_chars: int = 5000,
+                 counter: Optional[CallCounter] = None):
+        """
+        Args:
+            latency (float): Seconds each search takes
+            results (int): Results per query, capped by the caller's max_results
+            content_chars (int): Characters of raw content per result
+            counter (Optional[CallCounter]): Counters to share, e.g. with the chat model
+        """
+        self.latency = latency
+        self.results = results
+        self.content_chars = content_chars
+        self.counter = counter or CallCounter()
+
+    async def search(self, query: str, max_results: int = 5, include_raw_content: bool = True,
+                     topic: str = "general", **kwargs: Any) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        rng = random.Random(_seed("search", query))
+        results = []
+        for i in range(min(max_results, self.results)):
+            page = _words(rng, self.content_chars)
+            results.append({
+                "title": _words(rng, 40),
+                "url": f"https://bench.example/{_seed(query, i):016x}",
+                "content": page[:300],
+                "score": round(1.0 - i / (self.results + 1), 3),
+                "raw_content": page if include_raw_content else None,
+            })
+        self.counter.add("search_calls")
+        self.counter.add("search_bytes", sum(len(r["raw_content"] or "") + len(r["content"]) for r in results))
+        return {"query": query, "follow_up_questions": None, "answer": None, "images": [], "results": results}
+
+    async def close(self) -> None:
+        pass
+
+@contextmanager
+def install_fakes(chat_model: FakeChatModel, backend: FakeSearchBackend) -> Iterator[Tuple[FakeChatModel, FakeSearchBackend]]:
+    """Route every chat model and Tavily search of both workflows to the fakes inside the block."""
+    def get_chat_model(model: Optional[str] = None, model_provider: Optional[str] = None,
+                       model_kwargs: Optional[Dict[str, Any]] = None, base_url: Optional[str] = None,
+                       structured_output: Optional[Any] = None):
+        if structured_output is not None:
+            return chat_model.with_structured_output(structured_output)
+        return chat_model
+
+    patches = [(graph_module, "get_chat_model", get_chat_model),
+               (multi_agent_module, "get_chat_model", get_chat_model),
+               (utils, "get_tavily_client", lambda: backend)]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    try:
+        yield chat_model, backend
+    finally:
+        for module, name, value in originals:
+            setattr(module, name, value)
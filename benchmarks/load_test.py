@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""Concurrent multi-topic load test of the compiled graphs on one event loop.
+
+Starts N report runs at once (each with its own topic and thread_id) against
+the offline fakes in benchmarks/fakes.py, for every N given, and reports:
+
+- throughput in completed reports per minute
+- latency percentiles of a full report (plan approval included)
+- event-loop lag: how late a 10 ms ticker wakes up while the runs are in flight;
+  a high lag means something blocks the loop
+- resident memory before and after each level, and its growth per run
+
+With --slow-callback, asyncio debug mode names every callback that held the
+loop longer than the threshold, which points at the blocking code path.
+
+With --cassette, every run replays a recorded cassette instead of the fakes;
+all runs then use the recorded --topic and --config.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 1 10 50 --llm-latency 0.5 --search-latency 0.3
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import re
+import resource
+import time
+import json
+import uuid
+from collections import Counter
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from fakes import FakeChatModel, FakeSearchBackend, install_fakes
+from open_deep_research.graph import builder
+from open_deep_research.multi_agent import supervisor_builder
+from open_deep_research.rate_limit import configure_rate_limits
+
+WORKFLOWS = ("graph", "multi_agent")
+LAG_INTERVAL = 0.01
+
+def rss_mb() -> float:
+    """Return the resident set size of the process, or its peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+class LoopLagMonitor:
+    """Measures how late a periodic ticker wakes up on the running loop."""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _tick(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def __enter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._task.cancel()
+
+class SlowCallbackLog(logging.Handler):
+    """Collects the callbacks asyncio debug mode reports as slow."""
+
+    _pattern = re.compile(r"Executing (.*) took ([\d.]+) seconds")
+    _coroutine = re.compile(r"coro=<(\S+) (?:running|done)[^>]*? at ([^>\s]+:\d+)")
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.callbacks: Counter = Counter()
+        self.worst: Dict[str, float] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        match = self._pattern.search(record.getMessage())
+        if match:
+            # Name tasks by the coroutine and line they were at, so the same code path is counted once
+            coroutine = self._coroutine.search(match.group(1))
+            name = f"{coroutine.group(1)} at {coroutine.group(2)}" if coroutine else match.group(1)[:120]
+            self.callbacks[name] += 1
+            self.worst[name] = max(self.worst.get(name, 0.0), float(match.group(2)))
+
+async def run_report(workflow: str, topic: str, config: Dict[str, Any], stream: bool) -> None:
+    """Run one report end to end, approving the report plan, with ainvoke or astream."""
+    if workflow == "multi_agent":
+        graph = supervisor_builder.compile()
+        payload: Any = {"messages": [{"role": "user", "content": topic}]}
+    else:
+        graph = builder.compile(checkpointer=MemorySaver())
+        payload = {"topic": topic}
+    while payload is not None:
+        interrupted = False
+        if stream:
+            async for chunk in graph.astream(payload, config, stream_mode="updates"):
+                interrupted = interrupted or "__interrupt__" in chunk
+        else:
+            interrupted = "__interrupt__" in await graph.ainvoke(payload, config)
+        payload = Command(resume={"feedback": "正确"}) if interrupted else None
+
+async def run_level(concurrency: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Start concurrency runs at once and measure them until the last one finishes."""
+    gc.collect()
+    rss_before = rss_mb()
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        config = {"configurable": {
+            "thread_id": f"load-{uuid.uuid4().hex}",
+            "search_api": "tavily",
+            "number_of_queries": args.queries,
+            "max_search_depth": args.depth,
+            "max_concurrent_sections": args.max_concurrent_sections,
+            "max_concurrent_llm_calls": args.max_concurrent_llm_calls,
+            **({"cassette_path": args.cassette, "cassette_mode": "replay"} if args.cassette else {}),
+            **json.loads(args.config or "{}"),
+        }}
+        start = time.perf_counter()
+        try:
+            await run_report(args.workflow, args.topic or f"Load test topic {i}", config, args.stream)
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            failures += 1
+            print(f"Run {i} failed: {type(e).__name__}: {e}")
+
+    with LoopLagMonitor() as monitor:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    gc.collect()
+    rss_after = rss_mb()
+    return {
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "failed": failures,
+        "elapsed_s": elapsed,
+        "reports_per_min": len(latencies) / elapsed * 60 if elapsed else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p90_s": percentile(latencies, 90),
+        "p99_s": percentile(latencies, 99),
+        "lag_p99_ms": percentile(monitor.lags, 99) * 1000,
+        "lag_max_ms": max(monitor.lags, default=0.0) * 1000,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": rss_after,
+        "rss_growth_per_run_mb": (rss_after - rss_before) / concurrency,
+    }
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    configure_rate_limits({"tavily": {"rate": args.search_rate, "burst": args.search_rate}})
+    slow_log = None
+    if args.slow_callback:
+        loop = asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = args.slow_callback / 1000
+        slow_log = SlowCallbackLog()
+        logging.getLogger("asyncio").addHandler(slow_log)
+
+    chat_model = FakeChatModel(latency=args.llm_latency, sections=args.sections, queries=args.queries,
+                               search_depth=args.depth, output_chars=args.output_chars)
+    backend = FakeSearchBackend(latency=args.search_latency, results=args.results,
+                                content_chars=args.content_chars, counter=chat_model.counter)
+    results = []
+    print(f"{'N':>5} {'done':>5} {'fail':>4} {'reports/min':>11} {'p50 s':>7} {'p90 s':>7} {'p99 s':>7} "
+          f"{'lag p99 ms':>10} {'lag max ms':>10} {'rss MB':>8} {'MB/run':>7}")
+    with nullcontext() if args.cassette else install_fakes(chat_model, backend):
+        for concurrency in args.concurrency:
+            result = await run_level(concurrency, args)
+            results.append(result)
+            print(f"{concurrency:>5} {result['completed']:>5} {result['failed']:>4} {result['reports_per_min']:>11.1f} "
+                  f"{result['p50_s']:>7.2f} {result['p90_s']:>7.2f} {result['p99_s']:>7.2f} "
+                  f"{result['lag_p99_ms']:>10.1f} {result['lag_max_ms']:>10.1f} {result['rss_after_mb']:>8.1f} "
+                  f"{result['rss_growth_per_run_mb']:>7.2f}")
+
+    if slow_log is not None and slow_log.callbacks:
+        print(f"\nCallbacks holding the loop longer than {args.slow_callback:g} ms:")
+        for name, count in slow_log.callbacks.most_common(10):
+            print(f"  {count:>5}x  worst {slow_log.worst[name] * 1000:7.1f} ms  {name}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the compiled graphs with concurrent runs on one event loop")
+    parser.add_argument("--workflow", choices=WORKFLOWS, default="graph", help="Workflow to run")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50], help="Concurrent runs per level")
+    parser.add_argument("--stream", action="store_true", help="Consume runs with astream instead of ainvoke")
+    parser.add_argument("--sections", type=int, default=3, help="Research sections per report")
+    parser.add_argument("--depth", type=int, default=2, help="Search iterations per section")
+    parser.add_argument("--queries", type=int, default=2, help="Search queries per iteration")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per chat model call")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="Seconds per search query")
+    parser.add_argument("--results", type=int, default=5, help="Results per search query")
+    parser.add_argument("--content-chars", type=int, default=5000, help="Characters of raw content per result")
+    parser.add_argument("--output-chars", type=int, default=1500, help="Characters of each written section")
+    parser.add_argument("--search-rate", type=float, default=1e6,
+                        help="Search requests per second allowed by the rate limiter (default: unlimited)")
+    parser.add_argument("--max-concurrent-sections", type=int, default=4, help="max_concurrent_sections")
+    parser.add_argument("--max-concurrent-llm-calls", type=int, default=8, help="max_concurrent_llm_calls")
+    parser.add_argument("--slow-callback", type=float, default=0.0,
+                        help="Report callbacks holding the loop longer than this many milliseconds (asyncio debug mode)")
+    parser.add_argument("--cassette", help="Replay this recorded cassette in every run instead of the fakes")
+    parser.add_argument("--topic", help="Topic of every run (the recorded one when replaying); default: one per run")
+    parser.add_argument("--config", help="JSON object of further configurable values, e.g. the recorded models")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Record and replay of chat model, search and page fetch calls.
+
+With ``cassette_mode="record"`` and a ``cassette_path``, every chat model request
+and response, every search provider response (one entry per query) and every
+fetched page of a run is appended to the cassette: a gzip-compressed JSON-lines
+file whose entries are keyed by a hash of the request. With
+``cassette_mode="replay"`` the same requests are answered from the cassette,
+after the recorded latency or, with ``cassette_replay_latency="zero"``,
+immediately. A request the cassette does not hold raises ``CassetteMissError``
+instead of reaching the network.
+
+Chat models are hooked through the LangChain cache interface of the models the
+registry builds, so structured output and tool calls are replayed as the
+provider returned them. A request recorded several times (the same prompt asked
+again later in the run) is answered with its responses in recorded order.
+"""
+
+import asyncio
+import copy
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.globals import get_llm_cache
+from langchain_core.load import dumpd, load
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from open_deep_research.configuration import Configuration
+
+RECORD = "record"
+REPLAY = "replay"
+ZERO_LATENCY = "zero"
+
+# Message fields that differ between runs without changing the request
+_VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+_ADDRESS_RE = re.compile(r" at 0x[0-9a-fA-F]+")
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a request the cassette has no response for."""
+
+def request_key(kind: str, request: Any) -> str:
+    """Return the hash a request is stored under."""
+    payload = json.dumps({"kind": kind, "request": request}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class Cassette:
+    """Recorded responses of one cassette file, indexed by request key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+        except (EOFError, OSError, json.JSONDecodeError) as e:
+            # A recording interrupted mid-write leaves a truncated last entry
+            print(f"Cassette {self.path} is truncated, keeping the entries read so far: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the next recorded entry for a key, cycling through its entries, or None."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            entry = entries[self._served[key] % len(entries)]
+            self._served[key] += 1
+            return entry
+
+    def record(self, kind: str, key: str, request: Any, response: Any, latency: float) -> None:
+        """Keep an entry and append it to the cassette file."""
+        entry = {"key": key, "kind": kind, "request": request, "response": response, "latency": latency}
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._entries[key].append(entry)
+            # Every append is a gzip member of its own; readers see them as one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+def get_cassette(path: str) -> Cassette:
+    """Return the cassette stored at path, loading it on first use."""
+    path = os.path.abspath(path)
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cassette = Cassette(path)
+            _cassettes[path] = cassette
+        return cassette
+
+def active_cassette(config: Optional[RunnableConfig] = None) -> Optional[Tuple[Cassette, str, bool]]:
+    """
+    Return the cassette of the current run, its mode and whether replay skips the recorded latency.
+
+    Returns None when the run records nothing.
+
+    Raises:
+        ValueError: If cassette_mode is neither "record" nor "replay"
+    """
+    configurable = Configuration.from_runnable_config(config if config is not None else ensure_config())
+    if not configurable.cassette_path:
+        return None
+    if configurable.cassette_mode not in (RECORD, REPLAY):
+        raise ValueError(f"Unsupported cassette mode: {configurable.cassette_mode}")
+    return (get_cassette(configurable.cassette_path), configurable.cassette_mode,
+            configurable.cassette_replay_latency == ZERO_LATENCY)
+
+def _miss(kind: str, request: Any) -> CassetteMissError:
+    return CassetteMissError(f"No recorded {kind} response for {json.dumps(request, ensure_ascii=False, default=str)[:200]}")
+
+async def cassette_call(kind: str, request: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Make a call through the cassette of the current run.
+
+    Args:
+        kind (str): Kind of call, part of the key (e.g. "page")
+        request (Any): JSON-serializable description of the request
+        call: Makes the request; its result must be JSON-serializable
+
+    Returns:
+        Any: The recorded response when replaying, otherwise the result of call
+    """
+    active = active_cassette()
+    if active is None:
+        return await call()
+    cassette, mode, zero_latency = active
+    key = request_key(kind, request)
+    if mode == REPLAY:
+        entry = cassette.lookup(key)
+        if entry is None:
+            raise _miss(kind, request)
+        if not zero_latency:
+            await asyncio.sleep(entry["latency"])
+        return copy.deepcopy(entry["response"])
+    start = time.perf_counter()
+    response = await call()
+    cassette.record(kind, key, request, response, time.perf_counter() - start)
+    return response
+
+async def cassette_search(search_api: str, queries: Sequence[str], params: Dict[str, Any],
+                          fetch: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """
+    Search a list of queries through the cassette of the current run, one entry per query.
+
+    Entries are per query, so a replay matches even when queries are batched differently.
+
+    Args:
+        search_api (str): Search API the queries go to
+        queries (Sequence[str]): Queries to search
+        params (Dict[str, Any]): Search API parameters
+        fetch: Searches a list of queries and returns one response per query, in order
+
+    Returns:
+        List[Dict[str, Any]]: One response per query, in order
+    """
+    active = active_cassette()
+    if active is None:
+        return await fetch(list(queries))
+    cassette, mode, zero_latency = active
+    requests = [{"api": search_api, "query": query, "params": params} for query in queries]
+    if mode == REPLAY:
+        entries = []
+        for request in requests:
+            entry = cassette.lookup(request_key("search", request))
+            if entry is None:
+                raise _miss("search", request)
+            entries.append(entry)
+        # The queries of a batch were searched concurrently
+        if entries and not zero_latency:
+            await asyncio.sleep(max(entry["latency"] for entry in entries))
+        return [copy.deepcopy(entry["response"]) for entry in entries]
+    start = time.perf_counter()
+    responses = await fetch(list(queries))
+    latency = time.perf_counter() - start
+    for request, response in zip(requests, responses):
+        cassette.record("search", request_key("search", request), request, response, latency)
+    return responses
+
+def _normalize_prompt(prompt: str) -> Any:
+    """Drop message fields that differ between runs from a serialized prompt."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    for message in messages if isinstance(messages, list) else []:
+        kwargs = message.get("kwargs") if isinstance(message, dict) else None
+        if isinstance(kwargs, dict):
+            for field in _VOLATILE_MESSAGE_FIELDS:
+                kwargs.pop(field, None)
+    return messages
+
+class CassetteLLMCache(BaseCache):
+    """LangChain cache that records and replays chat model calls of runs with a cassette.
+
+    Runs without a cassette fall through to the global LangChain cache, if any.
+    """
+
+    def __init__(self):
+        # Start times of lookups that missed while recording, per request
+        self._started: Dict[Tuple[str, str], Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _request(prompt: str, llm_string: str) -> Dict[str, Any]:
+        return {"messages": _normalize_prompt(prompt), "llm": _ADDRESS_RE.sub("", llm_string)}
+
+    def _replay(self, cassette: Cassette, prompt: str, llm_string: str) -> Tuple[List[Any], float]:
+        request = self._request(prompt, llm_string)
+        entry = cassette.lookup(request_key("chat", request))
+        if entry is None:
+            raise _miss("chat model", request["messages"])
+        return [load(generation, allowed_objects="core") for generation in entry["response"]], entry["latency"]
+
+    def _started_lookup(self, prompt: str, llm_string: str) -> None:
+        with self._lock:
+            self._started[(prompt, llm_string)].append(time.perf_counter())
+
+    def _record(self, cassette: Cassette, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        with self._lock:
+            started = self._started.get((prompt, llm_string))
+            start = started.popleft() if started else None
+            if started is not None and not started:
+                del self._started[(prompt, llm_string)]
+        request = self._request(prompt, llm_string)
+        cassette.record("chat", request_key("chat", request), request, [dumpd(generation) for generation in return_val],
+                        time.perf_counter() - start if start is not None else 0.0)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        active = active_cassette()
+        if active is None:
+            fallback = get_llm_cache()
+            return fallback.lookup(prompt, llm_string) if fallback is not None else None
+        cassette, mode, zero_latency = active
+        if mode == REPLAY:
+            generations, latency = self._replay(cassette, prompt, llm_string)
+            if not zero_latency:
+                time.sleep(latency)
+            return generations
+        self._started_lookup(prompt, llm_string)
+        return None
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        active = active_cassette()
+        if active is None:
+            fallback = get_llm_cache()
+            return await fallback.alookup(prompt, llm_string) if fallback is not None else None
+        cassette, mode, zero_latency = active
+        if mode == REPLAY:
+            generations, latency = self._replay(cassette, prompt, llm_string)
+            if not zero_latency:
+                await asyncio.sleep(latency)
+            return generations
+        self._started_lookup(prompt, llm_string)
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        active = active_cassette()
+        if active is None:
+            fallback = get_llm_cache()
+            if fallback is not None:
+                fallback.update(prompt, llm_string, return_val)
+        elif active[1] == RECORD:
+            self._record(active[0], prompt, llm_string, return_val)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._started.clear()
+
+_LLM_CACHE = CassetteLLMCache()
+
+def install_cassette_cache(chat_model: Any) -> Any:
+    """Route a chat model's calls through the cassette of the run that makes them.
+
+    Models with a cache of their own, or with caching turned off, are left alone.
+    """
+    if getattr(chat_model, "cache", False) is None:
+        chat_model.cache = _LLM_CACHE
+    return chat_model
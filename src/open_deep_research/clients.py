@@ -0,0 +1,183 @@
+"""Process-level registry of long-lived HTTP and search-provider clients.
+
+Async clients own connection pools that are bound to the event loop they were
+first used on, so they are kept per running loop; synchronous provider clients
+are shared by the whole process. Call ``aclose_clients`` before the event loop
+shuts down to release the keep-alive connections cleanly.
+"""
+
+import asyncio
+import atexit
+import importlib.util
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import aiohttp
+import httpx
+import requests
+from duckduckgo_search import DDGS
+from exa_py import Exa
+from linkup import LinkupClient
+from tavily import AsyncTavilyClient
+
+# Keep-alive pool sizing shared by every HTTP client
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+DNS_CACHE_TTL = 300
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class ClientRegistry:
+    """Holds named clients together with the coroutine or function that closes them."""
+
+    def __init__(self):
+        self._clients: Dict[Hashable, Any] = {}
+        self._closers: List[Tuple[Any, Callable]] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Return the client stored under key, creating it with factory on first use."""
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+                if close is not None:
+                    self._closers.append((client, close))
+            return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def aclose(self) -> None:
+        """Close every registered client, awaiting async closers."""
+        with self._lock:
+            closers, self._closers = self._closers, []
+            self._clients.clear()
+        for client, close in reversed(closers):
+            try:
+                result = close(client)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"Warning: Failed to close client {type(client).__name__}: {str(e)}")
+
+    def close_sync(self) -> None:
+        """Close clients whose closers are synchronous; used for process-level clients."""
+        with self._lock:
+            closers, self._closers = self._closers, []
+            self._clients.clear()
+        for client, close in reversed(closers):
+            try:
+                close(client)
+            except Exception as e:
+                print(f"Warning: Failed to close client {type(client).__name__}: {str(e)}")
+
+_process_registry = ClientRegistry()
+_loop_registries: Dict[int, Tuple[asyncio.AbstractEventLoop, ClientRegistry]] = {}
+_loop_registries_lock = threading.Lock()
+_thread_local = threading.local()
+
+def get_loop_registry() -> ClientRegistry:
+    """Return the registry of async clients for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _loop_registries_lock:
+        # Forget registries of loops that were closed without calling aclose_clients
+        for loop_id in [k for k, (other, _) in _loop_registries.items() if other.is_closed()]:
+            del _loop_registries[loop_id]
+        entry = _loop_registries.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            entry = (loop, ClientRegistry())
+            _loop_registries[id(loop)] = entry
+        return entry[1]
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared httpx client (HTTP/2 when the h2 package is installed)."""
+    return get_loop_registry().get(
+        "httpx",
+        lambda: httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=30.0,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        ),
+        close=lambda client: client.aclose(),
+    )
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session with keep-alive and DNS caching."""
+    return get_loop_registry().get(
+        "aiohttp",
+        lambda: aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=MAX_CONNECTIONS,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_EXPIRY,
+            )
+        ),
+        close=lambda session: session.close(),
+    )
+
+def get_tavily_client() -> AsyncTavilyClient:
+    """Return the shared AsyncTavilyClient for the current API key."""
+    api_key = os.getenv("TAVILY_API_KEY")
+    return get_loop_registry().get(
+        ("tavily", api_key),
+        lambda: AsyncTavilyClient(api_key=api_key),
+        close=lambda client: client.close() if hasattr(client, "close") else None,
+    )
+
+def get_linkup_client() -> LinkupClient:
+    """Return the shared LinkupClient for the current API key."""
+    api_key = os.getenv("LINKUP_API_KEY")
+    return _process_registry.get(("linkup", api_key), lambda: LinkupClient(api_key=api_key))
+
+def get_exa_client() -> Exa:
+    """Return the shared Exa client for the current API key."""
+    api_key = f"{os.getenv('EXA_API_KEY')}"
+    return _process_registry.get(("exa", api_key), lambda: Exa(api_key=api_key))
+
+def get_requests_session() -> requests.Session:
+    """Return the process-wide requests session used by synchronous scrapers."""
+    def make_session():
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=MAX_KEEPALIVE_CONNECTIONS,
+                                                pool_maxsize=MAX_KEEPALIVE_CONNECTIONS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    return _process_registry.get("requests", make_session, close=lambda session: session.close())
+
+def get_ddgs_client() -> DDGS:
+    """Return a DuckDuckGo client for the calling thread.
+
+    DDGS is synchronous and runs in executor threads, so each thread keeps its own instance.
+    """
+    client = getattr(_thread_local, "ddgs", None)
+    if client is None:
+        client = DDGS()
+        _thread_local.ddgs = client
+    return client
+
+async def aclose_clients() -> None:
+    """Close all async clients opened on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _loop_registries_lock:
+        entry = _loop_registries.pop(id(loop), None)
+    if entry is not None:
+        await entry[1].aclose()
+
+def client_pool_stats() -> Dict[str, int]:
+    """Return how many clients are currently pooled."""
+    with _loop_registries_lock:
+        loop_clients = sum(len(registry) for _, registry in _loop_registries.values())
+    return {"process_clients": len(_process_registry), "loop_clients": loop_clients}
+
+atexit.register(_process_registry.close_sync)
@@ -1,7 +1,7 @@
 import os
 from enum import Enum
 from dataclasses import dataclass, fields
-from typing import Any, Optional, Dict 
+from typing import Any, Optional, Dict, List
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
@@ -40,6 +40,9 @@ class Configuration:
     # 图相关配置
     number_of_queries: int = 4 # 每次迭代生成的搜索查询数量
     max_search_depth: int = 2 # 最大反思+搜索迭代次数
+    novelty_min_content_growth: float = 0.1 # 一次检索新增内容片段占已有内容的比例下限
+    novelty_min_score_gain: float = 0.1 # 一次检索新增来源的相关度占已有来源的比例下限；两项都低于下限时不再继续检索（均设为 0 时关闭）
+    batch_query_generation: bool = False # 为 True 时，计划批准后用一次结构化调用为所有章节生成检索查询，输出无效的章节再单独生成
     planner_provider: str = "openai"  # 规划模型的提供商，默认为 Anthropic
     planner_model: str = "qwen2.5_72b_instruct-gptq-int4" # 规划模型，默认为 claude-3-7-sonnet-latest
     planner_model_kwargs: Optional[Dict[str, Any]] = None # 规划模型的额外参数
@@ -51,6 +54,63 @@ class Configuration:
     search_api: SearchAPI = SearchAPI.TAVILY # 默认为 TAVILY
     search_api_config: Optional[Dict[str, Any]] = None # 搜索 API 的配置参数
 
+    # 搜索缓存相关配置
+    search_cache_path: Optional[str] = None # 持久化搜索缓存（SQLite）文件路径，为空时不启用缓存
+    search_cache_ttl: int = 24 * 60 * 60 # 缓存条目的有效期（秒）
+    search_cache_max_entries: int = 10000 # 缓存最多保留的条目数，超出后按最近最少使用淘汰
+    bypass_search_cache: bool = False # 为 True 时本次运行跳过缓存读取（仍会写入最新结果）
+    page_store_scope: str = "run" # 抓取页面的缓存范围："run" 按 thread_id 隔离，"process" 跨运行共享
+
+    query_coalescing_similarity: float = 0.85 # 同一运行中词集合相似度（Jaccard）不低于该值的查询只检索一次，结果分发给所有提出该查询的章节（大于 1 时关闭合并）
+
+    search_rate_limits: Optional[Dict[str, Dict[str, float]]] = None # 按搜索 API 覆盖默认限速，例如 {"exa": {"rate": 2, "burst": 2}}（rate 为每秒请求数）
+
+    # 提示词 token 预算相关配置
+    token_counter: str = "estimate" # token 计数方式："estimate"（CJK 感知估算）、"tiktoken:<编码名>" 或 "hf:<tokenizer.json 路径或模型目录>"（离线分词器）
+    planner_prompt_token_budget: int = 24000 # report_planner_instructions 提示词（含检索资料）的 token 上限
+    writer_prompt_token_budget: int = 24000 # section_writer_inputs 提示词（含检索资料）的 token 上限
+    passage_chars: int = 600 # 网页正文切分为段落的目标长度（字符数），按 BM25 与检索查询的相关度挑选段落
+
+    # 规划检索结果复用（预热来源池）相关配置
+    warm_cache_min_coverage: float = 0.8 # 规划结果中的文档至少包含查询词的该比例时，视为覆盖了该查询（大于 1 时关闭复用）
+    warm_cache_min_sources: int = 1 # 覆盖一个查询所需的最少文档数
+
+    # 断点续跑相关配置
+    node_memo_path: Optional[str] = None # 节点输出记忆化（SQLite）文件路径，按输入哈希重放已完成的节点，为空时不启用
+    node_memo_ttl: int = 7 * 24 * 60 * 60 # 记忆化节点输出的有效期（秒）
+
+    # 调度相关配置（进程内所有运行共享）
+    max_concurrent_sections: int = 4 # 同时进行研究的章节分支数上限，超出的章节按预计工作量从大到小排队
+    max_concurrent_llm_calls: int = 8 # 每个模型端点同时进行的 LLM 请求数上限
+
+    section_dependency_timeout: float = 1800.0 # 无需检索的章节等待其依赖章节的最长时间（秒），超时后在汇总阶段再撰写
+
+    # 追踪相关配置
+    trace_path: Optional[str] = None # 节点、LLM 调用及搜索调用的追踪记录写入的本地文件，为空时不启用追踪
+    trace_format: str = "jsonl" # 追踪记录格式："jsonl" 或 "otlp"（OTLP/JSON，每行一个导出请求）
+
+    # 录制与回放相关配置
+    cassette_path: Optional[str] = None # 录制文件（gzip 压缩的 JSONL）路径，记录 LLM 请求与响应、检索结果及抓取的页面，为空时不启用
+    cassette_mode: str = "replay" # "record" 录制本次运行的调用；"replay" 从录制文件返回响应，未录制的请求直接报错而不访问网络
+    cassette_replay_latency: str = "original" # 回放时的延迟："original" 按录制时的耗时等待，"zero" 立即返回
+
+    # 性能剖析相关配置
+    profile_targets: Optional[List[str]] = None # 要剖析的节点及检索调用名称（如 "search_web"、"search:tavily"、"fetch_pages"），支持通配符，"*" 表示全部；为空时不启用
+    profile_dir: Optional[str] = None # 剖析结果的输出目录，每次运行（thread_id）写入其下的子目录；为空时写在追踪文件旁的 profiles 目录，未启用追踪时为 ./profiles
+    profile_interval_ms: float = 5.0 # CPU 采样间隔（毫秒 CPU 时间）
+    profile_top_allocations: int = 25 # 内存分配报告中列出的条目数
+
+    # Token 计量相关配置
+    run_token_budget: Optional[int] = None # 单次运行可消耗的 token 总数，为空时不限制
+    token_budget_degrade_at: float = 0.8 # 消耗达到预算的该比例后降级：每个章节只生成一个查询，且不再评估章节
+    token_prices: Optional[Dict[str, Dict[str, float]]] = None # 各模型每百万输入、输出 token 的价格，如 {"gpt-4.1": {"input": 2.0, "output": 8.0}}
+
+    # 网页抓取相关配置
+    scrape_max_concurrency: int = 10 # 同时抓取的最大页面数
+    scrape_per_host_limit: int = 2 # 对同一主机同时发起的最大请求数
+    scrape_request_timeout: float = 15.0 # 单个页面抓取的超时时间（秒）
+    scrape_total_timeout: float = 60.0 # 一批页面抓取的总超时时间（秒）
+
     # 多智能体相关配置
     supervisor_model: str = "openai:gpt-4.1" # 多智能体设置中主管代理的模型
     researcher_model: str = "openai:gpt-4.1" # 多智能体设置中研究代理的模型
@@ -68,4 +128,5 @@ class Configuration:
             for f in fields(cls)
             if f.init
         }
-        return cls(**{k: v for k, v in values.items() if v})
+        # Only unset values fall back to the defaults; False and 0 are valid settings
+        return cls(**{k: v for k, v in values.items() if v is not None})
@@ -0,0 +1,126 @@
+"""Bounded concurrent fetching with per-host limits and deadlines."""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_MAX_CONCURRENCY = 10
+DEFAULT_PER_HOST_LIMIT = 2
+DEFAULT_REQUEST_TIMEOUT = 15.0
+DEFAULT_TOTAL_TIMEOUT = 60.0
+
+@dataclass
+class FetchRecord:
+    """Timing for a single URL fetch."""
+    url: str
+    host: str
+    queued: float = 0.0   # Seconds spent waiting for a concurrency slot
+    duration: float = 0.0  # Seconds spent in the fetch itself
+    ok: bool = False
+    error: Optional[str] = None
+
+@dataclass
+class FetchStats:
+    """Per-URL fetch timings collected by fetch_concurrently."""
+    records: List[FetchRecord] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate the records into counts and latency figures."""
+        durations = sorted(record.duration for record in self.records)
+        count = len(durations)
+        return {
+            "fetches": count,
+            "failures": sum(1 for record in self.records if not record.ok),
+            "wall_time": self.wall_time,
+            "total_fetch_time": sum(durations),
+            "max_fetch_time": durations[-1] if durations else 0.0,
+            "p50_fetch_time": durations[count // 2] if durations else 0.0,
+            "max_queue_time": max((record.queued for record in self.records), default=0.0),
+        }
+
+def _host(url: str) -> str:
+    try:
+        return urlsplit(url).netloc.lower()
+    except ValueError:
+        return ""
+
+async def fetch_concurrently(
+    urls: Sequence[str],
+    fetch_one: Callable[[str], Awaitable[Any]],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+    request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT,
+    total_timeout: Optional[float] = DEFAULT_TOTAL_TIMEOUT,
+) -> Tuple[List[Any], FetchStats]:
+    """
+    Fetch many URLs concurrently under a global and a per-host concurrency cap.
+
+    Args:
+        urls (Sequence[str]): URLs to fetch
+        fetch_one (Callable[[str], Awaitable[Any]]): Coroutine function fetching a single URL
+        max_concurrency (int): Maximum number of fetches in flight overall
+        per_host_limit (int): Maximum number of fetches in flight against one host
+        request_timeout (Optional[float]): Deadline in seconds for each individual fetch
+        total_timeout (Optional[float]): Deadline in seconds for the whole batch; fetches still
+            queued or running when it expires fail with asyncio.TimeoutError
+
+    Returns:
+        Tuple[List[Any], FetchStats]: Results in the same order as urls (the exception instance
+            for failed fetches) and the timing of every fetch
+    """
+    stats = FetchStats()
+    if not urls:
+        return [], stats
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + total_timeout if total_timeout else None
+    global_slots = asyncio.Semaphore(max(1, max_concurrency))
+    host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def run(url: str, record: FetchRecord):
+        queued_at = loop.time()
+        host = host_slots.setdefault(record.host, asyncio.Semaphore(max(1, per_host_limit)))
+        # Take the host slot first so a request queued behind a slow host never holds a global slot
+        async with host, global_slots:
+            record.queued = loop.time() - queued_at
+            timeout = request_timeout
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            fetch_started = time.perf_counter()
+            try:
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError()
+                result = await asyncio.wait_for(fetch_one(url), timeout)
+                record.ok = True
+                return result
+            except Exception as e:
+                record.error = repr(e)
+                return e
+            finally:
+                record.duration = time.perf_counter() - fetch_started
+
+    records = [FetchRecord(url=url, host=_host(url)) for url in urls]
+    tasks = [asyncio.ensure_future(run(url, record)) for url, record in zip(urls, records)]
+    _, pending = await asyncio.wait(tasks, timeout=(deadline - loop.time()) if deadline is not None else None)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for task, record in zip(tasks, records):
+        if task in pending or task.cancelled():
+            record.ok = False
+            record.error = record.error or "TimeoutError('total fetch deadline exceeded')"
+            results.append(asyncio.TimeoutError("total fetch deadline exceeded"))
+        else:
+            results.append(task.result())
+
+    stats.records = records
+    stats.wall_time = loop.time() - started
+    return results, stats
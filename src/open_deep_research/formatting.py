@@ -0,0 +1,131 @@
+"""Linear-time formatting of search sources and report sections.
+
+Formatters are generators that yield string segments instead of growing a string
+with repeated ``+=``. Segments can be joined once with ``render`` or streamed
+into any writable buffer (``io.StringIO``, an open file, a socket wrapper) with
+``write_segments``. Per-source limits slice only the prefix that is kept, so no
+full copy of a long document is ever made.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+SOURCE_SEPARATOR = "=" * 80
+SUBSECTION_SEPARATOR = "-" * 80
+SECTION_SEPARATOR = "=" * 60
+NO_RESULTS_MESSAGE = "No valid search results found. Please try different search queries or use a different search API."
+
+def render(segments: Iterable[str]) -> str:
+    """Join segments into a single string with one allocation."""
+    return "".join(segments)
+
+def write_segments(segments: Iterable[str], out: TextIO) -> int:
+    """
+    Stream segments into a writable text buffer.
+
+    Args:
+        segments (Iterable[str]): Segments produced by one of the formatters
+        out (TextIO): Any object with a write(str) method
+
+    Returns:
+        int: Number of characters written
+    """
+    written = 0
+    for segment in segments:
+        out.write(segment)
+        written += len(segment)
+    return written
+
+def truncate(text: str, char_limit: Optional[int], suffix: str = "") -> str:
+    """Return at most char_limit characters of text, copying only the kept prefix."""
+    if char_limit is None or len(text) <= char_limit:
+        return text
+    return text[:char_limit] + suffix
+
+def unique_sources_by_url(search_response: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collect the results of all responses, keeping the last result seen for each URL at its first position."""
+    unique: Dict[str, Dict[str, Any]] = {}
+    for response in search_response:
+        for source in response['results']:
+            unique[source['url']] = source
+    return list(unique.values())
+
+def first_sources_by_url(search_response: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collect the results of all responses, keeping the first result seen for each URL."""
+    unique: Dict[str, Dict[str, Any]] = {}
+    for response in search_response:
+        for source in response['results']:
+            unique.setdefault(source['url'], source)
+    return list(unique.values())
+
+def iter_source_segments(sources: Iterable[Dict[str, Any]], max_tokens_per_source: int = 5000,
+                         include_raw_content: bool = True) -> Iterator[str]:
+    """
+    Yield the "Content from sources" block used by deduplicate_and_format_sources.
+
+    Args:
+        sources (Iterable[Dict[str, Any]]): Deduplicated sources with title, url, content and raw_content
+        max_tokens_per_source (int): Token limit for each source's raw content
+        include_raw_content (bool): Whether to include the raw content
+
+    Yields:
+        str: Consecutive pieces of the formatted text
+    """
+    yield "Content from sources:\n"
+    # Using rough estimate of 4 characters per token
+    char_limit = max_tokens_per_source * 4
+    for source in sources:
+        yield f"{SOURCE_SEPARATOR}\n"  # Clear section separator
+        yield f"Source: {source['title']}\n"
+        yield f"{SUBSECTION_SEPARATOR}\n"  # Subsection separator
+        yield f"URL: {source['url']}\n===\n"
+        yield f"Most relevant content from source: {source['content']}\n===\n"
+        if include_raw_content:
+            # Handle None raw_content
+            raw_content = source.get('raw_content', '')
+            if raw_content is None:
+                raw_content = ''
+                print(f"Warning: No raw_content found for source {source['url']}")
+            yield f"Full source content limited to {max_tokens_per_source} tokens: "
+            yield truncate(raw_content, char_limit, "... [truncated]")
+            yield "\n\n"
+        yield f"{SOURCE_SEPARATOR}\n\n"  # End section separator
+
+def iter_search_result_segments(entries: Iterable[Dict[str, Any]], include_summary: bool = True,
+                                char_limit: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the "Search results" block used by the Tavily tool and scrape_pages.
+
+    Args:
+        entries (Iterable[Dict[str, Any]]): Dicts with title, url and optionally content (the summary)
+            and raw_content (the full page)
+        include_summary (bool): Whether to include a SUMMARY block built from content
+        char_limit (Optional[int]): Maximum characters of raw_content to include
+
+    Yields:
+        str: Consecutive pieces of the formatted text
+    """
+    yield "Search results: \n\n"
+    for i, entry in enumerate(entries):
+        yield f"\n\n--- SOURCE {i+1}: {entry['title']} ---\n"
+        yield f"URL: {entry['url']}\n\n"
+        if include_summary:
+            yield f"SUMMARY:\n{entry['content']}\n\n"
+            if entry.get('raw_content'):
+                yield "FULL CONTENT:\n"
+                yield truncate(entry['raw_content'], char_limit)
+        else:
+            yield "FULL CONTENT:\n "
+            yield truncate(entry['raw_content'], char_limit)
+        yield "\n\n" + SUBSECTION_SEPARATOR + "\n"
+
+def iter_section_segments(sections: Iterable[Any]) -> Iterator[str]:
+    """Yield the formatted text of report sections used as context for final sections."""
+    for idx, section in enumerate(sections, 1):
+        yield (f"\n{SECTION_SEPARATOR}\n"
+               f"Section {idx}: {section.name}\n"
+               f"{SECTION_SEPARATOR}\n"
+               f"Description:\n{section.description}\n"
+               f"Requires Research: \n{section.research}\n\n"
+               f"Content:\n")
+        yield section.content if section.content else '[Not yet written]'
+        yield "\n\n"
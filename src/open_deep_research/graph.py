@@ -1,6 +1,7 @@
-from typing import Literal
+import asyncio
+import uuid
+from typing import Dict, List, Literal, Optional
 
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 
@@ -15,7 +16,11 @@ from open_deep_research.state import (
     ReportState,
     SectionState,
     SectionOutputState,
+    DependentSectionsState,
+    Section,
+    SectionQueriesBatch,
     Queries,
+    SearchQuery,
     Feedback
 )
 
@@ -23,6 +28,7 @@ from open_deep_research.prompts import (
     report_planner_query_writer_instructions,
     report_planner_instructions,
     query_writer_instructions, 
+    batch_query_writer_instructions,
     section_writer_instructions,
     final_section_writer_instructions,
     section_grader_instructions,
@@ -30,15 +36,47 @@ from open_deep_research.prompts import (
 )
 
 from open_deep_research.configuration import Configuration
+from open_deep_research.model_registry import get_chat_model
+from open_deep_research.token_budget import get_token_counter, remaining_budget
+from open_deep_research.persistence import memoize_node
+from open_deep_research.tracing import traced_node
+from open_deep_research.token_ledger import ledger_scope, over_budget, start_run_ledger
+from open_deep_research.streaming import REPORT_PLAN, SECTION_READY, emit_event, publishes_sections
+from open_deep_research.scheduler import endpoint_key, llm_slot, section_priority, section_slot
 from open_deep_research.utils import (
     format_sections, 
+    format_sections_for_queries,
+    match_batch_queries,
     get_config_value, 
     get_search_params, 
-    select_and_execute_search
+    get_search_cache_from_config,
+    execute_search,
+    format_search_docs,
+    merge_search_docs,
+    release_current_page_store,
+)
+from open_deep_research.search_cache import normalize_query
+from open_deep_research.source_pool import SourcePool
+from open_deep_research.novelty import (
+    GRADER_PASS,
+    LOW_NOVELTY,
+    MAX_DEPTH,
+    TOKEN_BUDGET,
+    is_low_yield,
+    measure_novelty,
+    novelty_record,
+    record_stop,
+)
+from open_deep_research.section_dag import (
+    cyclic_sections,
+    dependencies_of,
+    get_section_board,
+    release_section_board,
 )
 
 ## Nodes -- 
 
+@traced_node("generate_report_plan")
 async def generate_report_plan(state: ReportState, config: RunnableConfig):
     """生成初始报告计划及其各个部分。
 
@@ -56,6 +94,16 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
         包含生成的各个部分的字典
     """
 
+    # A new report starts a new token ledger; revising the plan keeps counting.
+    # Started outside the memoized body, so a memo hit resets it as well
+    if state.get("feedback_on_report_plan", None) is None:
+        start_run_ledger(config)
+    return await _generate_report_plan(state, config)
+
+@memoize_node("generate_report_plan")
+async def _generate_report_plan(state: ReportState, config: RunnableConfig):
+    """生成报告计划的主体，按输入状态和配置缓存结果。"""
+
     # Inputs
     topic = state["topic"]
     feedback = state.get("feedback_on_report_plan", None)
@@ -79,22 +127,39 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
     writer_model_base_url = get_config_value(configurable.writer_model_base_url)
 
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs,base_url=writer_model_base_url) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    structured_llm = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs,
+                                    base_url=writer_model_base_url, structured_output=Queries)
 
     # Format system instructions
     system_instructions_query = report_planner_query_writer_instructions.format(topic=topic, report_organization=report_structure, number_of_queries=number_of_queries)
 
     # Generate queries  
-    results = await structured_llm.ainvoke([SystemMessage(content=system_instructions_query),
-                                     HumanMessage(content="生成有助于规划报告各部分的网页搜索查询。输出结果形式为json")],
-                                    extra_body={"enable_thinking": False})
+    async with llm_slot(endpoint_key(writer_model_name, writer_provider, writer_model_base_url),
+                        configurable.max_concurrent_llm_calls), ledger_scope("query_writer"):
+        results = await structured_llm.ainvoke([SystemMessage(content=system_instructions_query),
+                                         HumanMessage(content="生成有助于规划报告各部分的网页搜索查询。输出结果形式为json")],
+                                        extra_body={"enable_thinking": False})
 
     # Web search
     query_list = [query.search_query for query in results.queries]
 
+    # Report planner instructions（中文提示词）
+    planner_message = """请生成报告的各个部分。你的回复必须包含一个 'sections' 字段，其值为各部分的列表。
+每个部分必须包含以下字段: name(名称)、description(描述)、plan(规划/计划)、research(是否需要检索)、content(内容)。
+无需检索的部分可以额外给出 depends_on(所依赖的部分名称列表)；不依赖任何部分时给出空列表，省略则表示依赖所有需要检索的部分。"""
+
+    # Tokens left for search results once the rest of the planner prompt is counted
+    token_counter = get_token_counter(configurable.token_counter)
+    context_budget = remaining_budget(configurable.planner_prompt_token_budget, token_counter,
+                                      report_planner_instructions.format(topic=topic, report_organization=report_structure, context="", feedback=feedback),
+                                      planner_message)
+
     # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    planning_docs = await execute_search(search_api, query_list, params_to_pass,
+                                         cache=get_search_cache_from_config(configurable),
+                                         bypass_cache=configurable.bypass_search_cache)
+    source_str = format_search_docs(search_api, planning_docs, token_budget=context_budget, token_counter=token_counter,
+                                    queries=query_list, passage_chars=configurable.passage_chars)
 
     # Format system instructions
     system_instructions_sections = report_planner_instructions.format(topic=topic, report_organization=report_structure, context=source_str, feedback=feedback)
@@ -105,35 +170,56 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     planner_model_kwargs = get_config_value(configurable.planner_model_kwargs or {})
     planer_model_base_url = get_config_value(configurable.planer_model_base_url)
 
-    # Report planner instructions（中文提示词）
-    planner_message = """请生成报告的各个部分。你的回复必须包含一个 'sections' 字段，其值为各部分的列表。
-每个部分必须包含以下字段: name(名称)、description(描述)、plan(规划/计划)、research(是否需要检索)、content(内容)。"""
-
    
-    planner_llm = init_chat_model(model=planner_model, 
+    # Generate the report sections
+    structured_llm = get_chat_model(model=planner_model, 
                                     model_provider=planner_provider,
                                     model_kwargs=planner_model_kwargs,
-                                    base_url = planer_model_base_url)
-
-    # Generate the report sections
-    structured_llm = planner_llm.with_structured_output(Sections)
-    report_sections = await structured_llm.ainvoke([SystemMessage(content=system_instructions_sections),
-                                             HumanMessage(content=planner_message)],
-                                            extra_body={"enable_thinking": False})
+                                    base_url=planer_model_base_url,
+                                    structured_output=Sections)
+    async with llm_slot(endpoint_key(planner_model, planner_provider, planer_model_base_url),
+                        configurable.max_concurrent_llm_calls), ledger_scope("planner"):
+        report_sections = await structured_llm.ainvoke([SystemMessage(content=system_instructions_sections),
+                                                 HumanMessage(content=planner_message)],
+                                                extra_body={"enable_thinking": False})
 
     # Get sections
     sections = report_sections.sections
 
-    return {"sections": sections}
+    # Keep the planning results as a warm source pool for section research
+    return {"sections": sections, "planning_docs": planning_docs}
+
+def start_section_writing(state: ReportState, dag_run_id: str, search_queries: Optional[Dict[str, List[SearchQuery]]] = None) -> List[Send]:
+    """为批准后的报告计划创建章节写作任务。
 
-def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan","build_section_with_web_research"]]:
+    需要检索的章节按预计工作量从大到小依次发送到研究子图，已有批量生成查询的章节直接带上这些查询；
+    存在无需检索的章节时，另发送一个 write_dependent_sections 任务。
+    """
+    topic = state["topic"]
+    sections = state["sections"]
+    search_queries = search_queries or {}
+    research_sections = sorted((s for s in sections if s.research), key=section_priority, reverse=True)
+    sends = []
+    for s in research_sections:
+        section_input = {"topic": topic, "section": s, "search_iterations": 0,
+                         "planning_docs": state.get("planning_docs") or [], "dag_run_id": dag_run_id}
+        if s.name in search_queries:
+            section_input["search_queries"] = search_queries[s.name]
+        sends.append(Send("build_section_with_web_research", section_input))
+    if any(not s.research for s in sections):
+        sends.append(Send("write_dependent_sections", {"topic": topic, "sections": sections, "dag_run_id": dag_run_id}))
+    return sends
+
+@traced_node("human_feedback")
+def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan","generate_all_queries","build_section_with_web_research","write_dependent_sections"]]:
     """获取用户对报告计划的反馈并确定下一步操作。
     
     此节点功能：
     1. 格式化当前报告计划以供用户审阅
     2. 通过中断获取用户反馈
     3. 根据反馈进行路由：
-       - 如果计划获得批准，则开始撰写章节
+       - 如果计划获得批准，则开始撰写章节：需要检索的章节并行研究（启用批量查询生成时先统一生成查询），
+         无需检索的章节交给 write_dependent_sections，在其依赖章节完成后立即撰写
        - 如果收到反馈意见，则重新生成计划
     
     参数：
@@ -145,7 +231,6 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     """
 
     # Get sections
-    topic = state["topic"]
     sections = state['sections']
     sections_str = "\n\n".join(
         f"章节: {section.name}\n"
@@ -163,12 +248,14 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     feedback = feedback.get("feedback")
     # If the user approves the report plan, kick off section writing
     if  feedback == "正确":
-        # Treat this as approve and kick off section writing
-        return Command(goto=[
-            Send("build_section_with_web_research", {"topic": topic, "section": s, "search_iterations": 0}) 
-            for s in sections 
-            if s.research
-        ])
+        # Treat this as approve and kick off section writing, longest sections first
+        emit_event({"event": REPORT_PLAN, "sections": [s.name for s in sections]})
+        # Research branches announce completed sections on this run's board
+        dag_run_id = uuid.uuid4().hex
+        configurable = Configuration.from_runnable_config(config)
+        if configurable.batch_query_generation and any(s.research for s in sections):
+            return Command(goto="generate_all_queries", update={"dag_run_id": dag_run_id})
+        return Command(goto=start_section_writing(state, dag_run_id), update={"dag_run_id": dag_run_id})
     
     # If the user provides feedback, regenerate the report plan 
     elif isinstance(feedback, str):
@@ -178,6 +265,59 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     else:
         raise TypeError(f"Interrupt value of type {type(feedback)} is not supported.")
     
+@traced_node("generate_all_queries")
+async def generate_all_queries(state: ReportState, config: RunnableConfig) -> Command[Literal["build_section_with_web_research","write_dependent_sections"]]:
+    """用一次结构化调用为所有需要检索的章节生成检索查询，然后开始撰写章节。
+
+    批量输出按章节名称对应到各章节；输出缺失或校验失败的章节不带查询发送，
+    由其研究子图中的 generate_queries 单独生成。整个批量调用失败时，所有章节都各自生成。
+
+    参数：
+        state: 包含已批准章节的当前图状态
+        config: 配置，包括要生成的查询数量
+
+    返回：
+        开始章节撰写的命令
+    """
+
+    # Get state
+    topic = state["topic"]
+    research_sections = [s for s in state["sections"] if s.research]
+
+    # Get configuration
+    configurable = Configuration.from_runnable_config(config)
+    # Near the token budget, a single query per section
+    number_of_queries = 1 if over_budget(config) else configurable.number_of_queries
+
+    # Generate queries for every section at once
+    writer_provider = get_config_value(configurable.writer_provider)
+    writer_model_name = get_config_value(configurable.writer_model)
+    writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
+    writer_model_base_url = get_config_value(configurable.writer_model_base_url)
+    structured_llm = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs,
+                                    base_url=writer_model_base_url, structured_output=SectionQueriesBatch)
+
+    # Format system instructions
+    system_instructions = batch_query_writer_instructions.format(topic=topic,
+                                                                 sections=format_sections_for_queries(research_sections),
+                                                                 number_of_queries=number_of_queries)
+
+    try:
+        async with llm_slot(endpoint_key(writer_model_name, writer_provider, writer_model_base_url),
+                            configurable.max_concurrent_llm_calls), \
+                ledger_scope("query_writer"):
+            batch = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
+                                                  HumanMessage(content="为每个章节生成有助于检索信息的网页搜索查询。")],
+                                                 extra_body={"enable_thinking": False})
+    except Exception as e:
+        print(f"Batch query generation failed, sections will generate their own queries: {e}")
+        batch = None
+
+    search_queries = match_batch_queries(batch, research_sections, number_of_queries)
+    return Command(goto=start_section_writing(state, state["dag_run_id"], search_queries))
+
+@traced_node("generate_queries")
+@memoize_node("generate_queries")
 async def generate_queries(state: SectionState, config: RunnableConfig):
     """为特定章节生成检索查询。
 
@@ -197,14 +337,16 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
-    number_of_queries = configurable.number_of_queries
+    # Near the token budget, a single query per section
+    number_of_queries = 1 if over_budget(config) else configurable.number_of_queries
 
     # Generate queries 
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    writer_model_base_url = get_config_value(configurable.writer_model_base_url)
+    structured_llm = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs,
+                                    base_url=writer_model_base_url, structured_output=Queries)
 
     # Format system instructions
     system_instructions = query_writer_instructions.format(topic=topic, 
@@ -212,19 +354,26 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
                                                            number_of_queries=number_of_queries)
 
     # Generate queries  
-    queries = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
-                                     HumanMessage(content="生成有助于检索信息的网页搜索查询。")],
-                                    extra_body={"enable_thinking": False})
+    async with llm_slot(endpoint_key(writer_model_name, writer_provider, writer_model_base_url),
+                        configurable.max_concurrent_llm_calls,
+                        priority=section_priority(section)), ledger_scope("query_writer", section.name):
+        queries = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
+                                         HumanMessage(content="生成有助于检索信息的网页搜索查询。")],
+                                        extra_body={"enable_thinking": False})
 
-    return {"search_queries": queries.queries}
+    return {"search_queries": queries.queries[:number_of_queries]}
 
+@traced_node("search_web")
+@memoize_node("search_web")
 async def search_web(state: SectionState, config: RunnableConfig):
     """为章节查询执行网页搜索。
 
     此节点：
-    1. 获取已生成的检索查询
-    2. 使用配置的搜索API执行检索
-    3. 将结果格式化为可用的上下文
+    1. 获取已生成的检索查询，跳过本章节之前迭代中已检索过的查询；
+       首轮检索时，已被规划阶段检索结果覆盖的查询直接复用这些结果
+    2. 使用配置的搜索API执行检索，只把新出现的文档并入本章节的来源集合
+    3. 在 token 预算内按相关度挑选新旧来源，格式化为可用的上下文
+    4. 记录本次检索的边际新颖度（新增 URL、新增内容片段、相关度增益），供 write_section 决定是否继续检索
 
     参数：
         state: 包含检索查询的当前状态
@@ -236,6 +385,7 @@ async def search_web(state: SectionState, config: RunnableConfig):
 
     # Get state
     search_queries = state["search_queries"]
+    section = state["section"]
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
@@ -246,11 +396,63 @@ async def search_web(state: SectionState, config: RunnableConfig):
     # Web search
     query_list = [query.search_query for query in search_queries]
 
-    # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
-
-    return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
-
+    # Tokens left for search results once the rest of the section writer prompt is counted
+    token_counter = get_token_counter(configurable.token_counter)
+    context_budget = remaining_budget(configurable.writer_prompt_token_budget, token_counter,
+                                      section_writer_instructions,
+                                      section_writer_inputs.format(topic=state["topic"],
+                                                                   section_name=section.name,
+                                                                   section_topic=section.description,
+                                                                   context="",
+                                                                   section_content=section.content))
+
+    # Only search queries that earlier iterations of this section have not run
+    previous_docs = state.get("source_docs") or []
+    searched_queries = state.get("searched_queries") or []
+    seen_queries = {normalize_query(query) for query in searched_queries}
+    new_queries = []
+    for query in query_list:
+        if normalize_query(query) not in seen_queries:
+            seen_queries.add(normalize_query(query))
+            new_queries.append(query)
+
+    # In the first round, queries already covered by the planning searches are answered from that pool
+    source_docs = state.get("source_docs") or []
+    if not searched_queries and state.get("planning_docs"):
+        pool = SourcePool(state["planning_docs"], min_coverage=configurable.warm_cache_min_coverage,
+                          min_sources=configurable.warm_cache_min_sources)
+        covered = [query for query in new_queries if pool.covers(query)]
+        if covered:
+            source_docs = merge_search_docs(source_docs, pool.relevant_docs(covered))
+            searched_queries = covered
+            new_queries = [query for query in new_queries if query not in covered]
+
+    # Search the web with parameters, keeping only documents we do not have yet
+    if new_queries:
+        known_urls = {result['url'] for response in source_docs for result in response.get('results') or [] if 'url' in result}
+        new_docs = await execute_search(search_api, new_queries, params_to_pass,
+                                        cache=get_search_cache_from_config(configurable),
+                                        bypass_cache=configurable.bypass_search_cache,
+                                        skip_urls=known_urls)
+        source_docs = merge_search_docs(source_docs, new_docs)
+    searched_queries = searched_queries + new_queries
+
+    # Marginal yield of this iteration; merged documents only ever append new sources
+    novelty = list(state.get("novelty") or [])
+    if previous_docs:
+        novelty.append(novelty_record(measure_novelty(previous_docs, source_docs[len(previous_docs):],
+                                                      iteration=state["search_iterations"] + 1)))
+
+    # Budgeted merge of old and new evidence
+    source_str = format_search_docs(search_api, source_docs, token_budget=context_budget, token_counter=token_counter,
+                                    queries=searched_queries, passage_chars=configurable.passage_chars)
+
+    return {"source_str": source_str, "source_docs": source_docs, "searched_queries": searched_queries,
+            "novelty": novelty, "search_iterations": state["search_iterations"] + 1}
+
+@traced_node("write_section")
+@publishes_sections
+@memoize_node("write_section")
 async def write_section(state: SectionState, config: RunnableConfig) -> Command[Literal[END, "search_web"]]:
     """撰写报告的一个章节并评估是否需要进一步研究。
 
@@ -259,7 +461,8 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     2. 评估章节质量
     3. 根据评估结果：
        - 若质量合格，则完成该章节
-       - 若质量不合格，则触发进一步研究
+       - 若达到最大检索深度，或上一次检索的边际新颖度过低，也完成该章节
+       - 否则触发进一步研究
 
     参数：
         state: 包含检索结果和章节信息的当前状态
@@ -288,23 +491,39 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-
-    section_content = await writer_model.ainvoke([SystemMessage(content=section_writer_instructions),
-                                           HumanMessage(content=section_writer_inputs_formatted)],
-                                          extra_body={"enable_thinking": False})
+    writer_model_base_url = get_config_value(configurable.writer_model_base_url)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs,
+                                  base_url=writer_model_base_url)
+
+    async with llm_slot(endpoint_key(writer_model_name, writer_provider, writer_model_base_url),
+                        configurable.max_concurrent_llm_calls,
+                        priority=section_priority(section)), ledger_scope("writer", section.name):
+        section_content = await writer_model.ainvoke([SystemMessage(content=section_writer_instructions),
+                                               HumanMessage(content=section_writer_inputs_formatted)],
+                                              extra_body={"enable_thinking": False})
     
     # Write content to the section object  
     section.content = section_content.content
 
+    # Near the token budget, keep the section as written instead of grading it
+    novelty = state.get("novelty") or []
+    if over_budget(config):
+        record_stop(section.name, TOKEN_BUDGET, state["search_iterations"], novelty)
+        return Command(
+        update={"completed_sections": [section]},
+        goto=END
+    )
+
     # Use planner model for reflection
     planner_provider = get_config_value(configurable.planner_provider)
     planner_model = get_config_value(configurable.planner_model)
     planner_model_kwargs = get_config_value(configurable.planner_model_kwargs or {})
+    planer_model_base_url = get_config_value(configurable.planer_model_base_url)
 
     # Initialize the reflection model
-    reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider, model_kwargs=planner_model_kwargs).with_structured_output(Feedback)
+    reflection_model = get_chat_model(model=planner_model, 
+                                      model_provider=planner_provider, model_kwargs=planner_model_kwargs,
+                                      base_url=planer_model_base_url, structured_output=Feedback)
 
     section_grader_instructions_formatted = section_grader_instructions.format(topic=topic, 
                                                                             section_topic=section.description,
@@ -314,12 +533,26 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
                               "如果评分是'通过'，则返回空字符串作为所有后续查询。 "
                               "如果评分是'失败'，则提供特定的搜索查询以收集缺失信息。")
     
-    feedback = await reflection_model.ainvoke([SystemMessage(content=section_grader_instructions_formatted),
-                                        HumanMessage(content=section_grader_message)],
-                                       extra_body={"enable_thinking": False})
+    async with llm_slot(endpoint_key(planner_model, planner_provider, planer_model_base_url),
+                        configurable.max_concurrent_llm_calls,
+                        priority=section_priority(section)), ledger_scope("grader", section.name):
+        feedback = await reflection_model.ainvoke([SystemMessage(content=section_grader_instructions_formatted),
+                                            HumanMessage(content=section_grader_message)],
+                                           extra_body={"enable_thinking": False})
+
+    # Stop when the section passes, the max search depth is reached, or searching no longer adds much
+    if feedback.grade == "pass":
+        stop_reason = GRADER_PASS
+    elif state["search_iterations"] >= configurable.max_search_depth:
+        stop_reason = MAX_DEPTH
+    elif is_low_yield(novelty[-1] if novelty else None, configurable.novelty_min_content_growth,
+                      configurable.novelty_min_score_gain):
+        stop_reason = LOW_NOVELTY
+    else:
+        stop_reason = None
 
-    # If the section is passing or the max search depth is reached, publish the section to completed sections 
-    if feedback.grade == "pass" or state["search_iterations"] >= configurable.max_search_depth:
+    if stop_reason is not None:
+        record_stop(section.name, stop_reason, state["search_iterations"], novelty)
         # Publish the section to completed sections 
         return  Command(
         update={"completed_sections": [section]},
@@ -333,6 +566,9 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
         goto="search_web"
         )
     
+@traced_node("write_final_sections")
+@publishes_sections
+@memoize_node("write_final_sections")
 async def write_final_sections(state: SectionState, config: RunnableConfig):
     """使用已完成的章节作为上下文，撰写无需检索的章节。
 
@@ -353,26 +589,87 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     topic = state["topic"]
     section = state["section"]
     completed_report_sections = state["report_sections_from_research"]
-    
+
+    # Write the section
+    section = await write_section_from_context(topic, section, completed_report_sections, configurable)
+
+    # Write the updated section to completed sections
+    return {"completed_sections": [section]}
+
+async def write_section_from_context(topic: str, section: Section, context: str, configurable: Configuration) -> Section:
+    """以已完成章节的内容为上下文撰写一个无需检索的章节，返回写入内容后的章节。"""
+
     # Format system instructions
-    system_instructions = final_section_writer_instructions.format(topic=topic, section_name=section.name, section_topic=section.description, context=completed_report_sections)
+    system_instructions = final_section_writer_instructions.format(topic=topic, section_name=section.name, section_topic=section.description, context=context)
 
     # Generate section  
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
+    writer_model_base_url = get_config_value(configurable.writer_model_base_url)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs,
+                                  base_url=writer_model_base_url)
     
-    section_content = await writer_model.ainvoke([SystemMessage(content=system_instructions),
-                                           HumanMessage(content="根据提供的源内容生成一个报告章节。")],
-                                          extra_body={"enable_thinking": False})
+    async with llm_slot(endpoint_key(writer_model_name, writer_provider, writer_model_base_url),
+                        configurable.max_concurrent_llm_calls), \
+            ledger_scope("final_writer", section.name):
+        section_content = await writer_model.ainvoke([SystemMessage(content=system_instructions),
+                                               HumanMessage(content="根据提供的源内容生成一个报告章节。")],
+                                              extra_body={"enable_thinking": False})
     
     # Write content to section 
     section.content = section_content.content
+    return section
 
-    # Write the updated section to completed sections
-    return {"completed_sections": [section]}
+@traced_node("write_dependent_sections")
+async def write_dependent_sections(state: DependentSectionsState, config: RunnableConfig):
+    """在依赖章节完成后立即撰写无需检索的章节。
 
+    此节点与章节研究分支并行运行：每个无需检索的章节等待其 depends_on 中的章节
+    出现在本次运行的章节看板上，随即以这些章节为上下文撰写，写好的章节同样发布到看板，
+    供依赖它的章节使用。依赖失败、等待超时或存在循环依赖的章节留给
+    write_final_sections 在汇总阶段撰写。
+
+    参数:
+        state: 包含报告主题、全部章节及运行标识的状态
+        config: 撰写模型及依赖等待时长的配置
+
+    返回:
+        包含已撰写章节的字典
+    """
+
+    # Get configuration
+    configurable = Configuration.from_runnable_config(config)
+
+    # Get state
+    topic = state["topic"]
+    sections = state["sections"]
+    board = get_section_board(state["dag_run_id"])
+    cyclic = cyclic_sections(sections)
+
+    async def write_when_ready(section: Section):
+        if section.name in cyclic:
+            await board.fail(section.name)
+            return None
+        dependencies = await board.wait_for(dependencies_of(section, sections),
+                                            timeout=configurable.section_dependency_timeout)
+        if dependencies is None:
+            await board.fail(section.name)
+            return None
+        try:
+            written = await write_section_from_context(topic, section.model_copy(), format_sections(dependencies), configurable)
+        except Exception as e:
+            print(f"Writing section '{section.name}' early failed, deferring it to the final pass: {e}")
+            await board.fail(section.name)
+            return None
+        await board.publish(written)
+        emit_event({"event": SECTION_READY, "name": written.name, "content": written.content})
+        return written
+
+    written_sections = await asyncio.gather(*(write_when_ready(s) for s in sections if not s.research))
+    return {"completed_sections": [s for s in written_sections if s is not None]}
+
+@traced_node("gather_completed_sections")
 def gather_completed_sections(state: ReportState):
     """将已完成的章节格式化为撰写总结性章节的上下文字符串。
 
@@ -388,21 +685,27 @@ def gather_completed_sections(state: ReportState):
     # List of completed sections
     completed_sections = state["completed_sections"]
 
+    # Every branch of the run has finished, so its section board is no longer needed
+    release_section_board(state.get("dag_run_id"))
+
     # Format completed section to str to use as context for final sections
     completed_report_sections = format_sections(completed_sections)
 
     return {"report_sections_from_research": completed_report_sections}
 
-def compile_final_report(state: ReportState):
+@traced_node("compile_final_report", final=True)
+def compile_final_report(state: ReportState, config: RunnableConfig):
     """将所有章节汇编成最终报告。
 
     此节点功能：
     1. 获取所有已完成的章节
     2. 按照原始计划顺序排序
     3. 合并为最终报告
+    4. 释放本次运行抓取页面的缓存
 
     参数:
         state: 包含所有已完成章节的当前状态
+        config: 运行配置，用于确定要释放的页面缓存
 
     返回:
         包含完整报告的字典
@@ -419,27 +722,41 @@ def compile_final_report(state: ReportState):
     # Compile final report
     all_sections = "\n\n".join([s.content for s in sections])
 
+    # The run is over; its fetched pages are no longer needed
+    release_current_page_store(config)
+
     return {"final_report": all_sections}
 
 def initiate_final_section_writing(state: ReportState):
-    """为无需检索的章节创建并行写作任务。
+    """为尚未撰写的无需检索章节创建并行写作任务。
 
-    此边缘函数会识别所有不需要检索的章节，
-    并为每个章节创建一个并行的写作任务。
+    此边缘函数会识别所有不需要检索、且未被 write_dependent_sections 提前写好的章节，
+    并为每个章节创建一个并行的写作任务，上下文只包含该章节所依赖且已完成的章节。
 
     参数:
-        state: 当前状态，包含所有章节及研究上下文
+        state: 当前状态，包含所有章节及已完成章节
 
     返回:
-        用于并行章节写作的 Send 命令列表
+        用于并行章节写作的 Send 命令列表；没有剩余章节时直接汇编最终报告
     """
 
+    sections = state["sections"]
+    completed_sections = {s.name: s for s in state["completed_sections"]}
+
     # Kick off section writing in parallel via Send() API for any sections that do not require research
-    return [
-        Send("write_final_sections", {"topic": state["topic"], "section": s, "report_sections_from_research": state["report_sections_from_research"]}) 
-        for s in state["sections"] 
-        if not s.research
+    sends = [
+        Send("write_final_sections", {"topic": state["topic"], "section": s,
+                                      "report_sections_from_research": format_sections(
+                                          [completed_sections[name] for name in dependencies_of(s, sections)
+                                           if name in completed_sections])}) 
+        for s in sections 
+        if not s.research and s.name not in completed_sections
     ]
+    return sends or "compile_final_report"
+
+def initiate_section_research(state: SectionState):
+    """已带有批量生成查询的章节直接开始检索，其余章节先生成查询。"""
+    return "search_web" if state.get("search_queries") else "generate_queries"
 
 # Report section sub-graph -- 
 
@@ -450,17 +767,57 @@ section_builder.add_node("search_web", search_web)
 section_builder.add_node("write_section", write_section)
 
 # Add edges
-section_builder.add_edge(START, "generate_queries")
+section_builder.add_conditional_edges(START, initiate_section_research, ["generate_queries", "search_web"])
 section_builder.add_edge("generate_queries", "search_web")
 section_builder.add_edge("search_web", "write_section")
 
+section_graph = section_builder.compile()
+
+@traced_node("build_section_with_web_research")
+async def build_section_with_web_research(state: SectionState, config: RunnableConfig):
+    """在章节并发上限内运行章节研究子图。
+
+    所有运行共享同一个章节调度器：超出 max_concurrent_sections 的章节分支排队等待，
+    预计工作量大的章节优先获得执行槽位。完成的章节发布到本次运行的章节看板，
+    依赖它的无需检索章节随即开始撰写。
+
+    参数:
+        state: 章节子图的输入状态
+        config: 包含并发上限的配置
+
+    返回:
+        章节子图的输出（已完成的章节）
+    """
+    configurable = Configuration.from_runnable_config(config)
+
+    # The run id only addresses the section board; keeping it out of the subgraph keeps memo keys stable across runs
+    dag_run_id = state.get("dag_run_id")
+    section_input = {k: v for k, v in state.items() if k != "dag_run_id"}
+    board = get_section_board(dag_run_id) if dag_run_id else None
+
+    try:
+        async with section_slot(configurable.max_concurrent_sections, priority=section_priority(state["section"])):
+            output = await section_graph.ainvoke(section_input, config)
+    except Exception:
+        if board is not None:
+            await board.fail(state["section"].name)
+        raise
+
+    # Sections that depend on this one can start as soon as it is on the board
+    if board is not None:
+        for section in output.get("completed_sections", []):
+            await board.publish(section)
+    return output
+
 # Outer graph for initial report plan compiling results from each section -- 
 
 # Add nodes
 builder = StateGraph(ReportState, input=ReportStateInput, output=ReportStateOutput, config_schema=Configuration)
 builder.add_node("generate_report_plan", generate_report_plan)
 builder.add_node("human_feedback", human_feedback)
-builder.add_node("build_section_with_web_research", section_builder.compile())
+builder.add_node("generate_all_queries", generate_all_queries)
+builder.add_node("build_section_with_web_research", build_section_with_web_research)
+builder.add_node("write_dependent_sections", write_dependent_sections)
 builder.add_node("gather_completed_sections", gather_completed_sections)
 builder.add_node("write_final_sections", write_final_sections)
 builder.add_node("compile_final_report", compile_final_report)
@@ -469,7 +826,8 @@ builder.add_node("compile_final_report", compile_final_report)
 builder.add_edge(START, "generate_report_plan")
 builder.add_edge("generate_report_plan", "human_feedback")
 builder.add_edge("build_section_with_web_research", "gather_completed_sections")
-builder.add_conditional_edges("gather_completed_sections", initiate_final_section_writing, ["write_final_sections"])
+builder.add_edge("write_dependent_sections", "gather_completed_sections")
+builder.add_conditional_edges("gather_completed_sections", initiate_final_section_writing, ["write_final_sections", "compile_final_report"])
 builder.add_edge("write_final_sections", "compile_final_report")
 builder.add_edge("compile_final_report", END)
 
@@ -0,0 +1,117 @@
+"""Process-wide registry of chat models and their structured-output wrappers.
+
+Nodes used to call ``init_chat_model`` (and ``with_structured_output``) on every
+invocation, building a new client with its own HTTP pool each time. The registry
+builds each distinct configuration once and hands the same instance to every
+node and run that asks for it.
+"""
+
+import json
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from langchain.chat_models import init_chat_model
+from langchain_core.runnables import Runnable
+
+from open_deep_research.cassettes import install_cassette_cache
+
+def _freeze(value: Any) -> str:
+    """Turn kwargs (possibly nested dicts) into a stable, hashable key component."""
+    return json.dumps(value or {}, sort_keys=True, default=repr)
+
+class ModelRegistry:
+    """Caches chat models keyed by (provider, model, kwargs, base_url, structured schema)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Hashable, Runnable] = {}
+        self.requests = 0
+        self.reuses = 0
+
+    def get(
+        self,
+        model: str,
+        model_provider: Optional[str] = None,
+        model_kwargs: Optional[Dict[str, Any]] = None,
+        base_url: Optional[str] = None,
+        structured_output: Optional[Any] = None,
+    ) -> Runnable:
+        """
+        Return a shared chat model, creating it on first use.
+
+        Args:
+            model (str): Model name, optionally prefixed with the provider ("openai:gpt-4.1")
+            model_provider (Optional[str]): Provider passed to init_chat_model
+            model_kwargs (Optional[Dict[str, Any]]): Extra model parameters
+            base_url (Optional[str]): Endpoint override; omitted from init_chat_model when None
+            structured_output (Optional[Any]): Schema to wrap the model with via with_structured_output
+
+        Returns:
+            Runnable: The chat model, or its structured-output wrapper
+        """
+        base_key: Tuple = (model_provider, model, _freeze(model_kwargs), base_url)
+        key = base_key + (structured_output,)
+        with self._lock:
+            self.requests += 1
+            cached = self._models.get(key)
+            if cached is not None:
+                self.reuses += 1
+                return cached
+
+            chat_model = self._models.get(base_key + (None,))
+            if chat_model is None:
+                init_kwargs: Dict[str, Any] = {"model": model}
+                if model_provider is not None:
+                    init_kwargs["model_provider"] = model_provider
+                if model_kwargs is not None:
+                    init_kwargs["model_kwargs"] = model_kwargs
+                if base_url is not None:
+                    init_kwargs["base_url"] = base_url
+                # Runs with a cassette record or replay through the model's cache
+                chat_model = install_cassette_cache(init_chat_model(**init_kwargs))
+                self._models[base_key + (None,)] = chat_model
+
+            if structured_output is None:
+                return chat_model
+
+            wrapped = chat_model.with_structured_output(structured_output)
+            self._models[key] = wrapped
+            return wrapped
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the pool size and how often a cached model was reused."""
+        with self._lock:
+            return {
+                "pool_size": len(self._models),
+                "requests": self.requests,
+                "reuses": self.reuses,
+                "reuse_rate": self.reuses / self.requests if self.requests else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Drop every cached model."""
+        with self._lock:
+            self._models.clear()
+            self.requests = 0
+            self.reuses = 0
+
+_registry = ModelRegistry()
+
+def get_chat_model(
+    model: str,
+    model_provider: Optional[str] = None,
+    model_kwargs: Optional[Dict[str, Any]] = None,
+    base_url: Optional[str] = None,
+    structured_output: Optional[Any] = None,
+) -> Runnable:
+    """Return a shared chat model from the process-wide registry; see ModelRegistry.get."""
+    return _registry.get(model, model_provider=model_provider, model_kwargs=model_kwargs,
+                         base_url=base_url, structured_output=structured_output)
+
+def model_registry_stats() -> Dict[str, Any]:
+    """Return the pool size and reuse rate of the process-wide registry."""
+    return _registry.stats()
+
+def clear_model_registry() -> None:
+    """Drop every model from the process-wide registry."""
+    _registry.clear()
@@ -1,7 +1,6 @@
 from typing import List, Annotated, TypedDict, operator, Literal
 from pydantic import BaseModel, Field
 
-from langchain.chat_models import init_chat_model
 from langchain_core.tools import tool
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState
@@ -10,7 +9,12 @@ from langgraph.types import Command, Send
 from langgraph.graph import START, END, StateGraph
 
 from open_deep_research.configuration import Configuration
-from open_deep_research.utils import get_config_value, tavily_search, duckduckgo_search
+from open_deep_research.model_registry import get_chat_model
+from open_deep_research.persistence import memoize_node
+from open_deep_research.scheduler import endpoint_key, llm_slot, section_priority, section_slot
+from open_deep_research.tracing import traced_node
+from open_deep_research.token_ledger import ledger_scope, start_run_ledger
+from open_deep_research.utils import get_config_value, release_current_page_store, tavily_search, duckduckgo_search
 from open_deep_research.prompts import SUPERVISOR_INSTRUCTIONS, RESEARCH_INSTRUCTIONS
 
 ## Tools factory - will be initialized based on configuration
@@ -99,9 +103,25 @@ def get_research_tools(config: RunnableConfig):
     tool_list = [search_tool, Section]
     return tool_list, {tool.name: tool for tool in tool_list}
 
+# The run ends when the supervisor stops calling tools
+@traced_node("supervisor", final=lambda output: not output["messages"][-1].tool_calls)
 async def supervisor(state: ReportState, config: RunnableConfig):
     """LLM decides whether to call a tool or not"""
 
+    # The first supervisor turn starts a new report, and a new token ledger.
+    # Started outside the memoized body, so a memo hit resets it as well
+    if not any(getattr(m, "type", None) == "ai" for m in state["messages"]):
+        start_run_ledger(config)
+    output = await _supervisor(state, config)
+    # The report is done when the supervisor stops calling tools; free the run's fetched pages
+    if not output["messages"][-1].tool_calls:
+        release_current_page_store(config)
+    return output
+
+@memoize_node("supervisor")
+async def _supervisor(state: ReportState, config: RunnableConfig):
+    """Supervisor turn, memoized by input state and configuration"""
+
     # Messages
     messages = state["messages"]
 
@@ -109,8 +129,8 @@ async def supervisor(state: ReportState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     supervisor_model = get_config_value(configurable.supervisor_model)
     
-    # Initialize the model
-    llm = init_chat_model(model=supervisor_model)
+    # Get the shared model
+    llm = get_chat_model(model=supervisor_model)
     
     # If sections have been completed, but we don't yet have the final report, then we need to initiate writing the introduction and conclusion
     if state.get("completed_sections") and not state.get("final_report"):
@@ -121,19 +141,19 @@ async def supervisor(state: ReportState, config: RunnableConfig):
     supervisor_tool_list, _ = get_supervisor_tools(config)
     
     # Invoke
-    return {
-        "messages": [
-            await llm.bind_tools(supervisor_tool_list, parallel_tool_calls=False).ainvoke(
-                [
-                    {"role": "system",
-                     "content": SUPERVISOR_INSTRUCTIONS,
-                    }
-                ]
-                + messages
-            )
-        ]
-    }
+    async with llm_slot(endpoint_key(supervisor_model), configurable.max_concurrent_llm_calls), ledger_scope("supervisor"):
+        response = await llm.bind_tools(supervisor_tool_list, parallel_tool_calls=False).ainvoke(
+            [
+                {"role": "system",
+                 "content": SUPERVISOR_INSTRUCTIONS,
+                }
+            ]
+            + messages
+        )
+    return {"messages": [response]}
 
+@traced_node("supervisor_tools")
+@memoize_node("supervisor_tools")
 async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Command[Literal["supervisor", "research_team", "__end__"]]:
     """Performs the tool call and sends to the research agent"""
 
@@ -179,8 +199,9 @@ async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Comma
     
     # After processing all tool calls, decide what to do next
     if sections_list:
-        # Send the sections to the research agents
-        return Command(goto=[Send("research_team", {"section": s}) for s in sections_list], update={"messages": result})
+        # Send the sections to the research agents, longest sections first
+        return Command(goto=[Send("research_team", {"section": s}) for s in sorted(sections_list, key=section_priority, reverse=True)],
+                       update={"messages": result})
     elif intro_content:
         # Store introduction while waiting for conclusion
         # Append to messages to guide the LLM to write conclusion next
@@ -215,6 +236,8 @@ async def supervisor_should_continue(state: ReportState) -> Literal["supervisor_
     else:
         return END
 
+@traced_node("research_agent")
+@memoize_node("research_agent")
 async def research_agent(state: SectionState, config: RunnableConfig):
     """LLM decides whether to call a tool or not"""
     
@@ -222,26 +245,27 @@ async def research_agent(state: SectionState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     researcher_model = get_config_value(configurable.researcher_model)
     
-    # Initialize the model
-    llm = init_chat_model(model=researcher_model)
+    # Get the shared model
+    llm = get_chat_model(model=researcher_model)
 
     # Get tools based on configuration
     research_tool_list, _ = get_research_tools(config)
     
-    return {
-        "messages": [
-            # Enforce tool calling to either perform more search or call the Section tool to write the section
-            await llm.bind_tools(research_tool_list).ainvoke(
-                [
-                    {"role": "system",
-                     "content": RESEARCH_INSTRUCTIONS.format(section_description=state["section"])
-                    }
-                ]
-                + state["messages"]
-            )
-        ]
-    }
+    # Enforce tool calling to either perform more search or call the Section tool to write the section
+    async with llm_slot(endpoint_key(researcher_model), configurable.max_concurrent_llm_calls,
+                        priority=section_priority(state["section"])), ledger_scope("researcher", state["section"]):
+        response = await llm.bind_tools(research_tool_list).ainvoke(
+            [
+                {"role": "system",
+                 "content": RESEARCH_INSTRUCTIONS.format(section_description=state["section"])
+                }
+            ]
+            + state["messages"]
+        )
+    return {"messages": [response]}
 
+@traced_node("research_agent_tools")
+@memoize_node("research_agent_tools")
 async def research_agent_tools(state: SectionState, config: RunnableConfig):
     """Performs the tool call and route to supervisor or continue the research loop"""
 
@@ -308,12 +332,20 @@ research_builder.add_conditional_edges(
     },
 )
 research_builder.add_edge("research_agent_tools", "research_agent")
+research_graph = research_builder.compile()
+
+@traced_node("research_team")
+async def research_team(state: SectionState, config: RunnableConfig):
+    """Run the research agent for one section within the shared section concurrency limit"""
+    configurable = Configuration.from_runnable_config(config)
+    async with section_slot(configurable.max_concurrent_sections, priority=section_priority(state["section"])):
+        return await research_graph.ainvoke(state, config)
 
 # Supervisor workflow
 supervisor_builder = StateGraph(ReportState, input=MessagesState, output=ReportStateOutput, config_schema=Configuration)
 supervisor_builder.add_node("supervisor", supervisor)
 supervisor_builder.add_node("supervisor_tools", supervisor_tools)
-supervisor_builder.add_node("research_team", research_builder.compile())
+supervisor_builder.add_node("research_team", research_team)
 
 # Flow of the supervisor agent
 supervisor_builder.add_edge(START, "supervisor")
@@ -0,0 +1,120 @@
+"""Marginal novelty of search iterations, used to stop section research early.
+
+``max_search_depth`` caps how often a section goes back to search, but the
+last iterations often return the same domains and content. After each search,
+the results that joined a section's sources are compared with what the section
+already had:
+
+- ``new_urls``: results whose URL the section did not have
+- ``content_growth``: new content shingles (5-term windows) relative to the
+  shingles already known
+- ``score_gain``: relevance of the new results relative to that of the known ones
+
+A graded-fail section stops searching when both the content growth and the score
+gain fall below their thresholds. Every section records why it stopped
+(``grader_pass``, ``max_depth``, ``low_novelty`` or ``token_budget``); ``section_stop_log`` and
+``stop_reason_stats`` expose them for tuning.
+"""
+
+import threading
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from open_deep_research.passages import tokenize
+from open_deep_research.token_budget import source_score
+
+SHINGLE_SIZE = 5
+MAX_STOP_LOG = 1000
+
+GRADER_PASS = "grader_pass"
+MAX_DEPTH = "max_depth"
+LOW_NOVELTY = "low_novelty"
+# Set by the token ledger when the run nears its budget
+TOKEN_BUDGET = "token_budget"
+
+@dataclass
+class IterationNovelty:
+    """What one search iteration added to a section's sources."""
+    iteration: int
+    new_urls: int
+    new_shingles: int
+    content_growth: float
+    score_gain: float
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Return hashes of the overlapping windows of size terms in a text."""
+    terms = tokenize(text)
+    if len(terms) < size:
+        return {hash(tuple(terms))} if terms else set()
+    return {hash(tuple(terms[i:i + size])) for i in range(len(terms) - size + 1)}
+
+def _results(search_docs: Iterable[Dict[str, Any]]) -> Iterable[tuple]:
+    for response in search_docs:
+        for rank, result in enumerate(response.get('results') or []):
+            yield rank, result
+
+def _doc_shingles(search_docs: Iterable[Dict[str, Any]]) -> Set[int]:
+    found: Set[int] = set()
+    for _, result in _results(search_docs):
+        found |= shingles(f"{result.get('content') or ''}\n{result.get('raw_content') or ''}")
+    return found
+
+def measure_novelty(previous_docs: List[Dict[str, Any]], added_docs: List[Dict[str, Any]], iteration: int) -> IterationNovelty:
+    """
+    Compare the results an iteration added with the sources a section already had.
+
+    Args:
+        previous_docs (List[Dict[str, Any]]): Search responses the section had before the iteration
+        added_docs (List[Dict[str, Any]]): Responses with the results the iteration added (new URLs only)
+        iteration (int): Number of the search iteration, starting at 1
+
+    Returns:
+        IterationNovelty: New URLs, content growth and score gain of the iteration
+    """
+    known = _doc_shingles(previous_docs)
+    new_shingles = len(_doc_shingles(added_docs) - known)
+    known_score = sum(source_score(result, rank) for rank, result in _results(previous_docs))
+    added_score = sum(source_score(result, rank) for rank, result in _results(added_docs))
+    return IterationNovelty(
+        iteration=iteration,
+        new_urls=sum(1 for _, result in _results(added_docs) if result.get('url')),
+        new_shingles=new_shingles,
+        content_growth=new_shingles / len(known) if known else float(bool(new_shingles)),
+        score_gain=added_score / known_score if known_score else float(added_score > 0),
+    )
+
+def is_low_yield(novelty: Optional[Dict[str, Any]], min_content_growth: float, min_score_gain: float) -> bool:
+    """Return True if an iteration's content growth and score gain both fell below their thresholds."""
+    if not novelty:
+        return False
+    return novelty["content_growth"] < min_content_growth and novelty["score_gain"] < min_score_gain
+
+_log_lock = threading.Lock()
+_stop_log: Deque[Dict[str, Any]] = deque(maxlen=MAX_STOP_LOG)
+_stop_reasons: Counter = Counter()
+
+def record_stop(section_name: str, reason: str, iterations: int, novelty: List[Dict[str, Any]]) -> None:
+    """Record why a section stopped researching, with the novelty of each of its iterations."""
+    entry = {"section": section_name, "reason": reason, "iterations": iterations, "novelty": list(novelty)}
+    with _log_lock:
+        _stop_log.append(entry)
+        _stop_reasons[reason] += 1
+    last = novelty[-1] if novelty else None
+    print(f"Section '{section_name}' stopped after {iterations} search iteration(s): {reason}"
+          + (f" (new urls {last['new_urls']}, content growth {last['content_growth']:.2f}, "
+             f"score gain {last['score_gain']:.2f})" if last else ""))
+
+def section_stop_log() -> List[Dict[str, Any]]:
+    """Return the most recent stop records, oldest first."""
+    with _log_lock:
+        return list(_stop_log)
+
+def stop_reason_stats() -> Dict[str, int]:
+    """Return how many sections stopped for each reason."""
+    with _log_lock:
+        return dict(_stop_reasons)
+
+def novelty_record(novelty: IterationNovelty) -> Dict[str, Any]:
+    """Return the state representation of an iteration's novelty."""
+    return asdict(novelty)
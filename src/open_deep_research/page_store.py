@@ -0,0 +1,173 @@
+"""Run-scoped store of fetched web pages with single-flight deduplication.
+
+Pages are keyed by canonical URL and by the extractor used (markdown for
+``scrape_pages``, plain text for the Google full-content fetch), and the store
+keeps the extracted text rather than the raw HTML so repeated hits skip both
+the download and the parsing. Concurrent requests for the same page share a
+single in-flight fetch.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_MAX_PAGES = 2000
+MAX_RUN_STORES = 32
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "spm"}
+
+class PageFetchAborted(Exception):
+    """Raised to callers sharing an in-flight fetch whose owner was cancelled."""
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so that trivially different links to the same page share a key.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the remaining query parameters and strips trailing slashes.
+
+    Args:
+        url (str): The URL to normalize
+
+    Returns:
+        str: The canonical form of the URL
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+class PageStore:
+    """In-memory LRU store of extracted page content with single-flight fetches."""
+
+    def __init__(self, max_pages: int = DEFAULT_MAX_PAGES):
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._pages: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def get(self, url: str, kind: str = "markdown") -> Optional[str]:
+        """Return stored content for a URL without fetching it."""
+        key = (kind, canonicalize_url(url))
+        content = self._pages.get(key)
+        if content is not None:
+            self._pages.move_to_end(key)
+        return content
+
+    def put(self, url: str, content: str, kind: str = "markdown") -> None:
+        """Store extracted content for a URL, evicting the least recently used pages."""
+        key = (kind, canonicalize_url(url))
+        self._pages[key] = content
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    async def get_or_fetch(self, url: str, fetch: Callable[[], Awaitable[Optional[str]]], kind: str = "markdown") -> Optional[str]:
+        """
+        Return the content for a URL, fetching it at most once across concurrent callers.
+
+        Args:
+            url (str): The page URL
+            fetch (Callable[[], Awaitable[Optional[str]]]): Coroutine factory that downloads and
+                extracts the page. A None result is returned to the caller but not stored.
+            kind (str): Extractor name, so different extractions of the same page do not collide
+
+        Returns:
+            Optional[str]: The extracted content
+
+        Raises:
+            PageFetchAborted: The caller that owned the shared fetch was cancelled
+            Exception: Whatever the fetch raised; failures are never stored
+        """
+        key = (kind, canonicalize_url(url))
+        content = self._pages.get(key)
+        if content is not None:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return content
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and not in_flight.done():
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            content = await fetch()
+        except asyncio.CancelledError:
+            # Only the owner was cancelled; the callers sharing its fetch get an ordinary failure
+            future.set_exception(PageFetchAborted(f"fetch of {url} was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        else:
+            future.set_result(content)
+            if content is not None:
+                self.put(url, content, kind=kind)
+            return content
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and coalesced-fetch counters and the number of stored pages."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "pages": len(self._pages),
+        }
+
+_shared_store = PageStore()
+_run_stores: "OrderedDict[str, PageStore]" = OrderedDict()
+_run_stores_lock = threading.Lock()
+
+def get_page_store(run_key: Optional[str] = None) -> PageStore:
+    """
+    Return the page store for a run, or the process-wide store when run_key is None.
+
+    Only the most recently used MAX_RUN_STORES run stores are kept alive.
+    """
+    if run_key is None:
+        return _shared_store
+
+    with _run_stores_lock:
+        store = _run_stores.get(run_key)
+        if store is None:
+            store = PageStore()
+            _run_stores[run_key] = store
+            while len(_run_stores) > MAX_RUN_STORES:
+                _run_stores.popitem(last=False)
+        else:
+            _run_stores.move_to_end(run_key)
+        return store
+
+def release_page_store(run_key: str) -> None:
+    """Drop the page store of a finished run."""
+    with _run_stores_lock:
+        _run_stores.pop(run_key, None)
@@ -0,0 +1,221 @@
+"""Query-relevant passage selection for raw page content.
+
+Cutting ``raw_content`` to its first N characters mostly keeps navigation and
+boilerplate. Instead, each document is chunked into passages. The passages of
+one section's search results are indexed in memory, scored against the
+section's queries with a vectorized BM25, and only the best passages are kept,
+in document order, within a token budget.
+
+Terms are lowercased ASCII words plus character bigrams of CJK runs, so Chinese
+queries and pages are matched without a word segmenter.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from open_deep_research.token_budget import TokenCounter, estimate_tokens, truncate_to_tokens
+
+PASSAGE_SEPARATOR = "\n\n[...]\n\n"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RUN_RE = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n")
+_SENTENCE_RE = re.compile(r"(?<=[。！？；.!?;])\s*")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into BM25 terms: ASCII words and CJK character bigrams."""
+    lowered = text.lower()
+    terms = _WORD_RE.findall(lowered)
+    for run in _CJK_RUN_RE.findall(lowered):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """Split a paragraph longer than max_chars at sentence ends, or hard-split if needed."""
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if len(current) + len(sentence) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_text(text: str, max_chars: int = 600) -> List[str]:
+    """
+    Chunk a document into passages of at most max_chars characters.
+
+    Short consecutive paragraphs are merged and long ones are split at sentence
+    boundaries, so passages stay close to max_chars.
+    """
+    passages: List[str] = []
+    current = ""
+    for paragraph in _PARAGRAPH_RE.split(text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+            if current and len(current) + len(piece) + 1 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+class PassageIndex:
+    """In-memory BM25 index over a set of passages, stored as sparse NumPy term arrays."""
+
+    def __init__(self, passages: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = list(passages)
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+
+        doc_ids: List[int] = []
+        term_ids: List[int] = []
+        term_freqs: List[int] = []
+        lengths = np.zeros(len(self.passages), dtype=np.float64)
+        for doc_id, passage in enumerate(self.passages):
+            terms = tokenize(passage)
+            lengths[doc_id] = len(terms)
+            counts: Dict[int, int] = {}
+            for term in terms:
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            doc_ids.extend([doc_id] * len(counts))
+            term_ids.extend(counts.keys())
+            term_freqs.extend(counts.values())
+
+        # One entry per (passage, term) pair
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.term_ids = np.asarray(term_ids, dtype=np.int64)
+        self.term_freqs = np.asarray(term_freqs, dtype=np.float64)
+        self.lengths = lengths
+        document_frequency = np.bincount(self.term_ids, minlength=len(self.vocabulary)).astype(np.float64)
+        n = len(self.passages)
+        self.idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if n else 0.0
+        # Length normalization of every entry, computed once
+        self._norm = k1 * (1 - b + b * lengths[self.doc_ids] / (average_length or 1.0))
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def score(self, query: str) -> np.ndarray:
+        """Return the BM25 score of every passage for one query."""
+        query_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not query_ids or not len(self.passages):
+            return np.zeros(len(self.passages))
+        mask = np.isin(self.term_ids, query_ids)
+        tf = self.term_freqs[mask]
+        contributions = self.idf[self.term_ids[mask]] * tf * (self.k1 + 1) / (tf + self._norm[mask])
+        return np.bincount(self.doc_ids[mask], weights=contributions, minlength=len(self.passages))
+
+    def score_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Return each passage's best score over several queries."""
+        if not queries:
+            return np.zeros(len(self.passages))
+        return np.max(np.vstack([self.score(query) for query in queries]), axis=0)
+
+def select_passages(
+    search_docs: List[Dict[str, Any]],
+    queries: Sequence[str],
+    token_budget: Optional[int] = None,
+    count: TokenCounter = estimate_tokens,
+    max_tokens_per_source: Optional[int] = None,
+    passage_chars: int = 600,
+) -> List[Dict[str, Any]]:
+    """
+    Replace each source's raw_content with its passages most relevant to the queries.
+
+    All passages of the search results form one index. Passages are taken from
+    the highest BM25 score down until token_budget (over all sources) or
+    max_tokens_per_source is spent, skipping passages that no longer fit, then
+    rejoined in document order. Passages
+    that match no query term are dropped. If no passage matches at all, the
+    documents are returned unchanged and the formatters fall back to their
+    head truncation.
+
+    Args:
+        search_docs: Search responses, each with a 'results' list
+        queries: Search queries of the section
+        token_budget (Optional[int]): Tokens of passages to keep over all sources
+        count (TokenCounter): Token counter
+        max_tokens_per_source (Optional[int]): Tokens of passages to keep per source
+        passage_chars (int): Target passage size in characters
+
+    Returns:
+        List[Dict[str, Any]]: Copies of the search responses with selected raw_content
+    """
+    passages: List[str] = []
+    owners: List[str] = []
+    chunked_urls = set()
+    for response in search_docs:
+        for source in response.get('results') or []:
+            url = source.get('url')
+            if url is None or url in chunked_urls or not source.get('raw_content'):
+                continue
+            chunked_urls.add(url)
+            for passage in chunk_text(source['raw_content'], passage_chars):
+                passages.append(passage)
+                owners.append(url)
+    if not passages:
+        return search_docs
+
+    index = PassageIndex(passages)
+    scores = index.score_queries(queries)
+    if not np.any(scores > 0):
+        return search_docs
+
+    selected: Dict[str, List[int]] = {}
+    used_per_source: Dict[str, int] = {}
+    used_total = 0
+    # Stable sort keeps document order among equal scores
+    for passage_id in np.argsort(-scores, kind="stable"):
+        if scores[passage_id] <= 0:
+            break
+        url = owners[passage_id]
+        tokens = count(passages[passage_id])
+        room = token_budget - used_total if token_budget is not None else tokens
+        if max_tokens_per_source is not None:
+            room = min(room, max_tokens_per_source - used_per_source.get(url, 0))
+        if room <= 0:
+            if token_budget is not None and used_total >= token_budget:
+                break
+            continue
+        if tokens > room:
+            # Prefer smaller relevant passages that fit; only cut one if nothing was selected yet
+            if used_total:
+                continue
+            passages[passage_id] = truncate_to_tokens(passages[passage_id], room, count)
+            tokens = count(passages[passage_id])
+        selected.setdefault(url, []).append(int(passage_id))
+        used_per_source[url] = used_per_source.get(url, 0) + tokens
+        used_total += tokens
+
+    selected_content = {
+        url: PASSAGE_SEPARATOR.join(passages[i] for i in sorted(ids))
+        for url, ids in selected.items()
+    }
+    return [
+        {**response, 'results': [
+            {**source, 'raw_content': selected_content.get(source.get('url'), '')}
+            if source.get('raw_content') else source
+            for source in response.get('results') or []
+        ]}
+        for response in search_docs
+    ]
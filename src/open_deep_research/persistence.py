@@ -0,0 +1,239 @@
+"""Durable checkpointing and node-level memoization for crash-resumable runs.
+
+Reports take minutes, and a worker restart or one failing ``write_section``
+used to mean running the whole graph again. Two layers make runs resumable:
+
+- ``durable_graph`` compiles a graph builder with a SQLite (WAL) checkpointer,
+  so a run can be resumed on the same ``thread_id`` after a crash
+- ``memoize_node`` stores node outputs (LLM responses, search results) in a
+  local SQLite (WAL) file keyed by a hash of the node name, its input state and
+  the run configuration, so a re-run replays completed nodes without calling
+  models or search APIs and only the failed branch executes again
+
+Example:
+    async with durable_graph(builder, "runs.sqlite") as graph:
+        await graph.ainvoke({"topic": topic}, {"configurable": {"thread_id": "report-1",
+                                                                "node_memo_path": "memo.sqlite"}})
+"""
+
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from pydantic import BaseModel
+
+from open_deep_research.configuration import Configuration
+
+DEFAULT_CHECKPOINT_PATH = "open_deep_research_checkpoints.sqlite"
+DEFAULT_MEMO_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Types of this package that may be restored from checkpoints and memoized outputs
+ALLOWED_STATE_TYPES = [
+    ("open_deep_research.state", name) for name in ("Section", "Sections", "SearchQuery", "Queries", "Feedback")
+] + [
+    ("open_deep_research.multi_agent", name) for name in ("Section", "Sections", "Introduction", "Conclusion")
+]
+
+def make_serializer() -> JsonPlusSerializer:
+    """Return the serializer used for checkpoints and memoized node outputs."""
+    return JsonPlusSerializer(allowed_msgpack_modules=ALLOWED_STATE_TYPES)
+
+def _ensure_directory(path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+@asynccontextmanager
+async def sqlite_checkpointer(path: str = DEFAULT_CHECKPOINT_PATH) -> AsyncIterator[Any]:
+    """
+    Open an AsyncSqliteSaver on a local file in WAL mode.
+
+    Args:
+        path (str): SQLite file holding the checkpoints
+
+    Yields:
+        AsyncSqliteSaver: The checkpointer, set up and ready to use
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    _ensure_directory(path)
+    async with aiosqlite.connect(path) as conn:
+        saver = AsyncSqliteSaver(conn, serde=make_serializer())
+        # Creates the tables and switches the file to WAL
+        await saver.setup()
+        yield saver
+
+@asynccontextmanager
+async def durable_graph(builder: Any, path: str = DEFAULT_CHECKPOINT_PATH) -> AsyncIterator[Any]:
+    """
+    Compile a graph builder (graph.builder or multi_agent.supervisor_builder) with a SQLite checkpointer.
+
+    Invoke the compiled graph with a ``thread_id``; after a crash, invoking it again
+    with ``None`` as input and the same ``thread_id`` resumes from the last checkpoint.
+    """
+    async with sqlite_checkpointer(path) as saver:
+        yield builder.compile(checkpointer=saver)
+
+def _stable(value: Any) -> Any:
+    """Convert state values into JSON-compatible data with a deterministic layout."""
+    if isinstance(value, BaseMessage):
+        # Message ids are assigned at random and do not change the meaning of the state
+        return _stable(value.model_dump(exclude={"id"}))
+    if isinstance(value, BaseModel):
+        return _stable(value.model_dump())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _stable(dataclasses.asdict(value))
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): _stable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stable(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_stable(v) for v in value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+def make_node_key(node: str, state: Any, configurable: Optional[Configuration] = None) -> str:
+    """
+    Build the content address of one node execution.
+
+    Args:
+        node (str): Node name
+        state: Input state of the node
+        configurable (Optional[Configuration]): Run configuration; every field takes part in the key
+
+    Returns:
+        str: Hex digest identifying the execution
+    """
+    payload = json.dumps(
+        {"node": node, "state": _stable(state), "config": _stable(configurable) if configurable else None},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class NodeMemo:
+    """SQLite-backed (WAL) store of node outputs keyed by input hash."""
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_MEMO_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._serde = make_serializer()
+
+        _ensure_directory(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS node_memo (
+                key TEXT PRIMARY KEY,
+                node TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                type TEXT NOT NULL,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, node: str, key: str) -> Tuple[bool, Any]:
+        """Return (True, output) for a stored execution, or (False, None) on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, type, payload FROM node_memo WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or time.time() - row[0] > self.ttl_seconds:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        _, type_, payload = row
+        return True, self._serde.loads_typed((type_, zlib.decompress(payload)))
+
+    def set(self, node: str, key: str, output: Any) -> None:
+        """Store the output of a node execution."""
+        type_, payload = self._serde.dumps_typed(output)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO node_memo (key, node, created_at, type, payload) VALUES (?, ?, ?, ?, ?)",
+                (key, node, time.time(), type_, zlib.compress(payload)),
+            )
+            self._conn.execute("DELETE FROM node_memo WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of stored outputs."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM node_memo").fetchone()
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "entries": entries}
+
+    def clear(self) -> None:
+        """Remove every stored output."""
+        with self._lock:
+            self._conn.execute("DELETE FROM node_memo")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+_memos: Dict[str, NodeMemo] = {}
+_memos_lock = threading.Lock()
+
+def get_node_memo(path: str, ttl_seconds: float = DEFAULT_MEMO_TTL_SECONDS) -> NodeMemo:
+    """Return the process-wide node memo for a given file path, creating it on first use."""
+    path = os.path.abspath(os.path.expanduser(path))
+    with _memos_lock:
+        memo = _memos.get(path)
+        if memo is None:
+            memo = NodeMemo(path, ttl_seconds=ttl_seconds)
+            _memos[path] = memo
+        else:
+            memo.ttl_seconds = ttl_seconds
+        return memo
+
+def memoize_node(name: str) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """
+    Memoize an async graph node by the hash of its input state and configuration.
+
+    Memoization is active when the run configuration sets ``node_memo_path``.
+    Exceptions are never stored, so a failed node runs again on the next attempt.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(state: Any, config: RunnableConfig):
+            configurable = Configuration.from_runnable_config(config)
+            if not configurable.node_memo_path:
+                return await func(state, config)
+
+            memo = get_node_memo(configurable.node_memo_path, configurable.node_memo_ttl)
+            key = make_node_key(name, state, configurable)
+            found, output = memo.get(name, key)
+            if found:
+                return output
+            output = await func(state, config)
+            memo.set(name, key, output)
+            return output
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,335 @@
+"""Opt-in CPU and memory profiling of selected graph nodes and provider calls.
+
+With ``profile_targets`` set, every node (``traced_node``) and provider call
+(``search:<api>``, ``fetch_pages``) whose name matches one of the targets is
+profiled. Targets are names or shell-style patterns, so ``["search_web",
+"search:*"]`` or ``["*"]`` both work.
+
+- CPU: a sampling profiler. A ``SIGPROF`` interval timer fires every
+  ``profile_interval_ms`` of CPU time used by the process, and the stack of the
+  interrupted code is charged to the profiled calls running it. Calls are told
+  apart through a context variable, which asyncio tasks inherit, so concurrent
+  sections and the tasks they gather are attributed to the right node. Time a
+  node spends waiting (LLM responses, searches, slots) takes no CPU and draws no
+  samples, so the gap between wall time and sampled CPU time is the waiting.
+  Calls on other threads (sync nodes run in the executor) and platforms without
+  ``setitimer`` get their thread CPU time instead of samples.
+- Memory: ``tracemalloc`` snapshots before and after each call; the lines that
+  allocated the most memory still held at the end of the call are reported.
+  Concurrent calls share the heap, so their allocations overlap.
+
+For each run (``thread_id``), a directory under ``profile_dir`` (by default
+next to the run's trace file, otherwise ``./profiles``) receives, per target,
+``<target>.folded`` (collapsed stacks, for flamegraph.pl or speedscope) and
+``<target>.txt`` (wall and CPU time, hottest functions, top allocations), plus
+``allocations.txt`` with the top allocations of all targets. The files are
+rewritten after every profiled call, so an interrupted run keeps its profile.
+"""
+
+import contextvars
+import fnmatch
+import os
+import re
+import signal
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+from open_deep_research.configuration import Configuration
+
+DEFAULT_RUN = "default"
+DEFAULT_PROFILE_DIR = "profiles"
+MAX_RUN_PROFILES = 32
+MAX_STACK_DEPTH = 128
+TOP_FUNCTIONS = 30
+
+_IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+class ProfileCall:
+    """CPU samples and allocations of one profiled call."""
+
+    def __init__(self, target: str, interval: Optional[float], top_allocations: int):
+        self.target = target
+        # Seconds per sample, or None when the call is measured with its thread's CPU time
+        self.interval = interval
+        self.top_allocations = top_allocations
+        self.samples: Counter = Counter()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.allocations: List[Tuple[str, int, int, int]] = []
+        self._started = time.perf_counter()
+        self._thread_started = time.thread_time()
+        self._snapshot: Optional[tracemalloc.Snapshot] = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+
+    @property
+    def allocated_bytes(self) -> int:
+        return sum(size for _, _, size, _ in self.allocations)
+
+    def finish(self) -> None:
+        self.wall = time.perf_counter() - self._started
+        if self.interval is None:
+            self.cpu = time.thread_time() - self._thread_started
+        else:
+            self.cpu = sum(self.samples.values()) * self.interval
+        if self._snapshot is not None and tracemalloc.is_tracing():
+            diffs = tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno")
+            # Skip the snapshots' own allocations; cheaper than filtering the snapshots
+            diffs = [diff for diff in diffs if diff.size_diff > 0 and diff.traceback[0].filename not in _IGNORED_FILES]
+            self.allocations = [(diff.traceback[0].filename, diff.traceback[0].lineno, diff.size_diff, diff.count_diff)
+                                for diff in diffs[:self.top_allocations]]
+        self._snapshot = None
+
+_active_calls: contextvars.ContextVar[Tuple[ProfileCall, ...]] = contextvars.ContextVar(
+    "open_deep_research_profile_calls", default=())
+
+def _on_sample(signum: int, frame: Any) -> None:
+    calls = _active_calls.get()
+    if not calls or frame is None:
+        return
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(frame.f_code)
+        frame = frame.f_back
+    key = tuple(reversed(stack))
+    for call in calls:
+        call.samples[key] += 1
+
+class _Sampler:
+    """Process-wide SIGPROF interval timer, running while any profiled call on the main thread is."""
+
+    def __init__(self):
+        self.interval = 0.0
+        self._users = 0
+        self._previous: Any = None
+        self._lock = threading.Lock()
+
+    def acquire(self, interval: float) -> Optional[float]:
+        """Start sampling if needed; returns the sampling interval, or None when sampling is unavailable here."""
+        if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+            return None
+        with self._lock:
+            if self._users == 0:
+                # The first call sets the interval; the timer is shared by all calls in flight
+                self._previous = signal.signal(signal.SIGPROF, _on_sample)
+                self.interval = interval
+                signal.setitimer(signal.ITIMER_PROF, interval, interval)
+            self._users += 1
+            return self.interval
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            if self._users == 0:
+                signal.setitimer(signal.ITIMER_PROF, 0, 0)
+                signal.signal(signal.SIGPROF, self._previous if self._previous is not None else signal.SIG_DFL)
+
+_SAMPLER = _Sampler()
+
+class _Tracemalloc:
+    """Starts tracemalloc for profiled calls, and stops it after the last one unless someone else started it."""
+
+    def __init__(self):
+        self._users = 0
+        self._owned = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owned = True
+            self._users += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._owned:
+                tracemalloc.stop()
+                self._owned = False
+
+_TRACEMALLOC = _Tracemalloc()
+
+def _describe(code: Any) -> str:
+    parts = code.co_filename.replace(os.sep, "/").split("/")
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+def _file_name(target: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", target)
+
+class TargetProfile:
+    """Profiled calls of one target in one run, merged."""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.calls = 0
+        self.sampled_calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.samples: Counter = Counter()
+        self.allocations: Dict[Tuple[str, int], List[int]] = {}
+
+    def add(self, call: ProfileCall) -> None:
+        self.calls += 1
+        self.sampled_calls += call.interval is not None
+        self.wall += call.wall
+        self.cpu += call.cpu
+        self.samples.update(call.samples)
+        for filename, lineno, size, count in call.allocations:
+            totals = self.allocations.setdefault((filename, lineno), [0, 0])
+            totals[0] += size
+            totals[1] += count
+
+    def top_allocations(self, limit: int) -> List[Tuple[Tuple[str, int], List[int]]]:
+        return sorted(self.allocations.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+
+    def folded(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame count" line per distinct stack."""
+        return "".join(f"{';'.join(_describe(code) for code in stack)} {count}\n"
+                       for stack, count in self.samples.most_common())
+
+    def report(self, top_allocations: int) -> str:
+        total = sum(self.samples.values())
+        lines = [f"Profile of {self.target}: {self.calls} calls",
+                 f"  wall {self.wall:.3f} s, cpu {self.cpu:.3f} s, waiting {max(0.0, self.wall - self.cpu):.3f} s"
+                 f" ({total} samples; {self.calls - self.sampled_calls} calls measured with thread CPU time)"]
+        if total:
+            own: Counter = Counter()
+            inclusive: Counter = Counter()
+            for stack, count in self.samples.items():
+                own[stack[-1]] += count
+                for code in set(stack):
+                    inclusive[code] += count
+            lines += ["", "Hottest functions:", f"  {'self %':>7} {'total %':>8}  function"]
+            for code, count in own.most_common(TOP_FUNCTIONS):
+                lines.append(f"  {100 * count / total:>7.1f} {100 * inclusive[code] / total:>8.1f}  {_describe(code)}")
+        if self.allocations:
+            lines += ["", "Top allocations still held at the end of a call:", f"  {'KiB':>10} {'blocks':>8}  line"]
+            for (filename, lineno), (size, count) in self.top_allocations(top_allocations):
+                lines.append(f"  {size / 1024:>10.1f} {count:>8}  {filename}:{lineno}")
+        return "\n".join(lines) + "\n"
+
+class RunProfile:
+    """Profiles of one run, written to its own directory."""
+
+    def __init__(self, run: str, directory: str, top_allocations: int):
+        self.run = run
+        self.directory = directory
+        self.top_allocations = top_allocations
+        self.targets: Dict[str, TargetProfile] = {}
+        self._lock = threading.Lock()
+
+    def add(self, call: ProfileCall) -> None:
+        """Merge a finished call and rewrite the run's files for its target."""
+        with self._lock:
+            target = self.targets.setdefault(call.target, TargetProfile(call.target))
+            target.add(call)
+            os.makedirs(self.directory, exist_ok=True)
+            name = os.path.join(self.directory, _file_name(call.target))
+            with open(name + ".folded", "w", encoding="utf-8") as f:
+                f.write(target.folded())
+            with open(name + ".txt", "w", encoding="utf-8") as f:
+                f.write(target.report(self.top_allocations))
+            with open(os.path.join(self.directory, "allocations.txt"), "w", encoding="utf-8") as f:
+                f.write(self._allocations_report())
+
+    def _allocations_report(self) -> str:
+        rows = [(size, count, target.target, filename, lineno)
+                for target in self.targets.values()
+                for (filename, lineno), (size, count) in target.allocations.items()]
+        rows.sort(reverse=True)
+        lines = [f"Top allocations of run {self.run}", f"  {'KiB':>10} {'blocks':>8}  {'target':<28} line"]
+        lines += [f"  {size / 1024:>10.1f} {count:>8}  {target:<28} {filename}:{lineno}"
+                  for size, count, target, filename, lineno in rows[:self.top_allocations]]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: {"calls": target.calls, "wall_s": target.wall, "cpu_s": target.cpu,
+                           "samples": sum(target.samples.values()),
+                           "allocated_bytes": sum(size for size, _ in target.allocations.values())}
+                    for name, target in self.targets.items()}
+
+_runs: "OrderedDict[str, RunProfile]" = OrderedDict()
+_runs_lock = threading.Lock()
+
+def get_run_profile(run: str, directory: Optional[str] = None, top_allocations: int = 25) -> RunProfile:
+    """Return the profiles of a run, starting them on first use; only the most recent runs are kept."""
+    with _runs_lock:
+        profile = _runs.get(run)
+        if profile is None:
+            profile = RunProfile(run, directory or os.path.join(DEFAULT_PROFILE_DIR, _file_name(run)), top_allocations)
+            _runs[run] = profile
+            while len(_runs) > MAX_RUN_PROFILES:
+                _runs.popitem(last=False)
+        else:
+            _runs.move_to_end(run)
+        return profile
+
+def profile_summary(run: str) -> Dict[str, Dict[str, Any]]:
+    """Return calls, wall and CPU seconds, samples and allocated bytes per profiled target of a run."""
+    with _runs_lock:
+        profile = _runs.get(run)
+    return profile.summary() if profile is not None else {}
+
+def _targets(configurable: Configuration) -> Sequence[str]:
+    targets = configurable.profile_targets or []
+    # From the environment, targets arrive as one comma-separated string
+    return [t.strip() for t in targets.split(",")] if isinstance(targets, str) else targets
+
+def _profile_dir(configurable: Configuration, run: str) -> str:
+    if configurable.profile_dir:
+        base = configurable.profile_dir
+    elif configurable.trace_path:
+        base = os.path.join(os.path.dirname(os.path.abspath(configurable.trace_path)), DEFAULT_PROFILE_DIR)
+    else:
+        base = DEFAULT_PROFILE_DIR
+    return os.path.join(base, _file_name(run))
+
+@contextmanager
+def profile_scope(name: str, config: Optional[RunnableConfig] = None, span: Any = None) -> Iterator[Optional[ProfileCall]]:
+    """
+    Profile a block when its name is one of the run's profile_targets; yields None otherwise.
+
+    Args:
+        name (str): Node or provider name matched against profile_targets
+        config (Optional[RunnableConfig]): Run configuration; defaults to the current one
+        span: Trace span that gets the call's cpu_s and alloc_bytes attributes, if any
+    """
+    config = config if config is not None else ensure_config()
+    configurable = Configuration.from_runnable_config(config)
+    if not any(fnmatch.fnmatchcase(name, target) for target in _targets(configurable)):
+        yield None
+        return
+
+    run = str((config or {}).get("configurable", {}).get("thread_id") or DEFAULT_RUN)
+    profile = get_run_profile(run, _profile_dir(configurable, run), configurable.profile_top_allocations)
+    enclosing = _active_calls.get()
+    # Snapshots and reports are profiler overhead, not charged to enclosing profiled calls
+    paused = _active_calls.set(())
+    try:
+        _TRACEMALLOC.acquire()
+        interval = _SAMPLER.acquire(configurable.profile_interval_ms / 1000)
+        call = ProfileCall(name, interval, configurable.profile_top_allocations)
+    finally:
+        _active_calls.reset(paused)
+    token = _active_calls.set(enclosing + (call,))
+    try:
+        yield call
+    finally:
+        _active_calls.reset(token)
+        paused = _active_calls.set(())
+        try:
+            if interval is not None:
+                _SAMPLER.release()
+            call.finish()
+            _TRACEMALLOC.release()
+            profile.add(call)
+            if span is not None:
+                span.set(cpu_s=round(call.cpu, 6), alloc_bytes=call.allocated_bytes)
+        finally:
+            _active_calls.reset(paused)
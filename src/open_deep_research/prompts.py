@@ -104,6 +104,33 @@ query_writer_instructions = """你是一名专业的技术写作专家，负责
 </格式>
 """
 
+batch_query_writer_instructions = """你是一名专业的技术写作专家，负责为技术报告中每个需要检索的章节生成有针对性的网页检索查询，以便收集全面的信息。
+
+<报告主题>
+{topic}
+</报告主题>
+
+<章节列表>
+{sections}
+</章节列表>
+
+<任务>
+你的目标是为上面列出的每个章节分别生成 {number_of_queries} 条检索查询，用于收集全面的信息。
+
+这些查询应当：
+
+1. 与对应章节的主题密切相关
+2. 涵盖该主题的不同方面
+3. 尽量避免与其他章节的查询重复
+
+请确保查询足够具体，以便找到高质量、相关性强的资料来源。
+</任务>
+
+<格式>
+调用 SectionQueriesBatch 工具，为每个章节给出一项，section_name 必须与章节列表中的章节名称完全一致
+</格式>
+"""
+
 section_writer_instructions = """撰写研究报告的一个章节。
 
 <任务>
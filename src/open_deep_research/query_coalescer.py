@@ -0,0 +1,236 @@
+"""Run-level coalescing of near-duplicate search queries across sections.
+
+Sections researched in parallel often ask for nearly the same thing
+("X market size 2024" and "X market size in 2024"). Every query is reduced to
+its set of terms: normalized, stopwords dropped, and CJK text joined across
+spaces and particles so that segmenting a Chinese query differently does not
+matter. A query whose term set is similar enough (Jaccard) to that of a query
+already searched or in flight in the same run joins that query's cluster. Each cluster is searched once, and
+its response fans out to every section that asked.
+
+Counters of asked, searched and coalesced queries are kept per coalescer and
+for the whole process (``query_coalescer_stats``).
+"""
+
+import asyncio
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from open_deep_research.passages import tokenize
+from open_deep_research.search_cache import normalize_query
+
+DEFAULT_SIMILARITY = 0.85
+MAX_RUN_COALESCERS = 32
+
+# Words that do not change what a search query asks for
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "how", "in", "is", "of", "on",
+    "or", "the", "to", "what", "which", "with",
+})
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af"
+# Spaces and the possessive particle between CJK characters, which only change the bigrams
+_CJK_JOINER_RE = re.compile(f"(?<=[{_CJK}])(?:\\s+|的)+(?=[{_CJK}])")
+
+def query_terms(query: str) -> FrozenSet[str]:
+    """Return the term set of a query; stopwords are dropped unless the query has nothing else."""
+    terms = tokenize(_CJK_JOINER_RE.sub("", normalize_query(query)))
+    kept = frozenset(term for term in terms if term not in STOPWORDS)
+    return kept or frozenset(terms)
+
+def token_set_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two term sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class _Cluster:
+    """A searched query and the response shared by every query coalesced into it."""
+
+    __slots__ = ("query", "terms", "future")
+
+    def __init__(self, query: str, terms: FrozenSet[str], future: "asyncio.Future[Dict[str, Any]]"):
+        self.query = query
+        self.terms = terms
+        self.future = future
+
+class QueryCoalescer:
+    """Clusters near-duplicate queries of one run so each cluster is searched once."""
+
+    def __init__(self, similarity: float = DEFAULT_SIMILARITY, keep_completed: bool = True):
+        """
+        Args:
+            similarity (float): Minimum Jaccard similarity of term sets for two queries to share a search
+            keep_completed (bool): Reuse responses of completed searches; when False only searches
+                still in flight are shared
+        """
+        self.similarity = similarity
+        self.keep_completed = keep_completed
+        # Clusters and a term -> clusters index per search API and parameters
+        self._clusters: Dict[Tuple[str, str], List[_Cluster]] = {}
+        self._index: Dict[Tuple[str, str], Dict[str, List[_Cluster]]] = {}
+        self.queries = 0
+        self.searches = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _find(self, scope: Tuple[str, str], terms: FrozenSet[str]) -> Optional[_Cluster]:
+        """Return the most similar cluster at or above the similarity threshold."""
+        index = self._index.get(scope, {})
+        candidates: Set[int] = set()
+        best, best_similarity = None, 0.0
+        for term in terms:
+            for cluster in index.get(term, []):
+                if id(cluster) in candidates:
+                    continue
+                candidates.add(id(cluster))
+                similarity = token_set_similarity(terms, cluster.terms)
+                if similarity > best_similarity:
+                    best, best_similarity = cluster, similarity
+        if best is None and not terms:
+            # Queries without any term only match each other
+            best = next((c for c in self._clusters.get(scope, []) if not c.terms), None)
+            best_similarity = 1.0
+        return best if best is not None and best_similarity >= self.similarity else None
+
+    def _add(self, scope: Tuple[str, str], cluster: _Cluster) -> None:
+        self._clusters.setdefault(scope, []).append(cluster)
+        index = self._index.setdefault(scope, {})
+        for term in cluster.terms:
+            index.setdefault(term, []).append(cluster)
+
+    def _remove(self, scope: Tuple[str, str], cluster: _Cluster) -> None:
+        clusters = self._clusters.get(scope, [])
+        if cluster in clusters:
+            clusters.remove(cluster)
+        index = self._index.get(scope, {})
+        for term in cluster.terms:
+            members = index.get(term, [])
+            if cluster in members:
+                members.remove(cluster)
+
+    async def search(self, search_api: str, queries: Sequence[str], params: Optional[Dict[str, Any]],
+                     fetch: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Search a list of queries, sharing searches with near-duplicate queries of the run.
+
+        Args:
+            search_api (str): Search API the queries go to; only queries of the same API and parameters are coalesced
+            queries (Sequence[str]): Queries to search
+            params (Optional[Dict[str, Any]]): Search API parameters
+            fetch: Searches a list of queries and returns one response per query, in order
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[str]]: One response per query, in order, where coalesced
+            queries get a copy of the response to the query that was searched; and the queries this
+            call searched itself, the only ones whose response answers exactly that query
+        """
+        scope = (search_api, json.dumps(params or {}, sort_keys=True, default=str))
+        loop = asyncio.get_running_loop()
+        assigned: List[_Cluster] = []
+        new: List[_Cluster] = []
+        exact = near = 0
+        for query in queries:
+            terms = query_terms(query)
+            cluster = self._find(scope, terms)
+            if cluster is None:
+                cluster = _Cluster(query, terms, loop.create_future())
+                self._add(scope, cluster)
+                new.append(cluster)
+            elif normalize_query(query) == normalize_query(cluster.query):
+                exact += 1
+            else:
+                near += 1
+            assigned.append(cluster)
+
+        self.queries += len(assigned)
+        self.searches += len(new)
+        self.exact_duplicates += exact
+        self.near_duplicates += near
+        _record(len(assigned), len(new), exact, near)
+
+        if new:
+            try:
+                fetched = await fetch([cluster.query for cluster in new])
+                if len(fetched) != len(new):
+                    raise ValueError(f"Expected {len(new)} search responses, got {len(fetched)}")
+            except BaseException as e:
+                for cluster in new:
+                    self._remove(scope, cluster)
+                    if isinstance(e, asyncio.CancelledError):
+                        cluster.future.cancel()
+                    else:
+                        cluster.future.set_exception(e)
+                        # Mark the exception as retrieved when nobody else was waiting on it
+                        cluster.future.exception()
+                raise
+            for cluster, response in zip(new, fetched):
+                cluster.future.set_result(response)
+                # Failed lookups are retried by the next query that asks
+                if response.get("error") or not self.keep_completed:
+                    self._remove(scope, cluster)
+
+        responses = []
+        for cluster in assigned:
+            # Shielded so a cancelled section does not cancel the search other sections wait for
+            responses.append(dict(await asyncio.shield(cluster.future)))
+        return responses, [cluster.query for cluster in new]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return asked, searched and coalesced query counters of this coalescer."""
+        return _stats_dict(self.queries, self.searches, self.exact_duplicates, self.near_duplicates)
+
+def _stats_dict(queries: int, searches: int, exact: int, near: int) -> Dict[str, Any]:
+    return {
+        "queries": queries,
+        "searches": searches,
+        "exact_duplicates": exact,
+        "near_duplicates": near,
+        "dedup_ratio": (exact + near) / queries if queries else 0.0,
+    }
+
+_stats_lock = threading.Lock()
+_totals = [0, 0, 0, 0]
+
+def _record(queries: int, searches: int, exact: int, near: int) -> None:
+    with _stats_lock:
+        for i, value in enumerate((queries, searches, exact, near)):
+            _totals[i] += value
+
+def query_coalescer_stats() -> Dict[str, Any]:
+    """Return asked, searched and coalesced query counters of every coalescer in the process."""
+    with _stats_lock:
+        return _stats_dict(*_totals)
+
+_shared_coalescers: Dict[float, QueryCoalescer] = {}
+_run_coalescers: "OrderedDict[Tuple[str, float], QueryCoalescer]" = OrderedDict()
+_coalescers_lock = threading.Lock()
+
+def get_query_coalescer(run_key: Optional[str] = None, similarity: float = DEFAULT_SIMILARITY) -> QueryCoalescer:
+    """
+    Return the coalescer of a run, creating it on first use.
+
+    Without a run key, a process-wide coalescer is returned that only shares searches
+    still in flight. Only the most recently used MAX_RUN_COALESCERS run coalescers are kept.
+    """
+    with _coalescers_lock:
+        if run_key is None:
+            coalescer = _shared_coalescers.get(similarity)
+            if coalescer is None:
+                coalescer = QueryCoalescer(similarity, keep_completed=False)
+                _shared_coalescers[similarity] = coalescer
+            return coalescer
+
+        key = (run_key, similarity)
+        coalescer = _run_coalescers.get(key)
+        if coalescer is None:
+            coalescer = QueryCoalescer(similarity)
+            _run_coalescers[key] = coalescer
+            while len(_run_coalescers) > MAX_RUN_COALESCERS:
+                _run_coalescers.popitem(last=False)
+        else:
+            _run_coalescers.move_to_end(key)
+        return coalescer
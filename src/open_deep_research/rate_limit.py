@@ -0,0 +1,198 @@
+"""Shared per-provider token-bucket rate limiting for search backends.
+
+Every provider call takes a token from the bucket of its provider before it
+goes out, so parallel section branches share one budget instead of each
+sleeping on its own. A 429 response (or any rate-limit error) reported back to
+the bucket pauses it for the Retry-After interval and halves the refill rate,
+which then recovers linearly towards the configured rate.
+
+The buckets are guarded by a thread lock rather than asyncio primitives so they
+can be shared by every event loop and by executor threads in the process.
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+# Requests per second and burst capacity for each provider
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "tavily": {"rate": 10.0, "burst": 10},
+    "perplexity": {"rate": 1.0, "burst": 5},
+    "exa": {"rate": 4.0, "burst": 4},          # Exa allows 5 requests/s
+    "arxiv": {"rate": 1 / 3, "burst": 1},      # arXiv asks for one request every 3 seconds
+    "pubmed": {"rate": 3.0, "burst": 3},       # NCBI allows 3 requests/s without an API key
+    "linkup": {"rate": 10.0, "burst": 10},
+    "duckduckgo": {"rate": 1 / 3, "burst": 1},
+    "googlesearch": {"rate": 5.0, "burst": 5},
+    "googlesearch_scrape": {"rate": 0.5, "burst": 1},
+}
+FALLBACK_RATE_LIMIT = {"rate": 5.0, "burst": 5}
+
+# Fraction of the configured rate regained per second after a rate-limit penalty
+RECOVERY_PER_SECOND = 0.05
+MIN_RATE_FRACTION = 0.05
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """
+    Parse a Retry-After header value into seconds.
+
+    Args:
+        value: Header value, either delta-seconds or an HTTP date
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def is_rate_limit_error(error: Any) -> bool:
+    """Return True if an exception or error message looks like a rate-limit rejection."""
+    message = str(error)
+    return "429" in message or "Too Many Requests" in message or "Ratelimit" in message or "rate limit" in message.lower()
+
+class TokenBucket:
+    """Token bucket with burst capacity and multiplicative backoff on rate-limit feedback."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self._lock = threading.Lock()
+        self.base_rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._rate = self.base_rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self.acquired = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+
+    def configure(self, rate: float, burst: float) -> None:
+        """Change the configured rate and burst capacity."""
+        with self._lock:
+            self.base_rate = float(rate)
+            self.burst = max(1.0, float(burst))
+            self._rate = self.base_rate
+            self._tokens = min(self._tokens, self.burst)
+
+    @property
+    def rate(self) -> float:
+        """The current, possibly reduced, refill rate in requests per second."""
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self._rate < self.base_rate:
+            self._rate = min(self.base_rate, self._rate + self.base_rate * RECOVERY_PER_SECOND * elapsed)
+        self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Take tokens if available and return 0, otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.acquired += 1
+                return 0.0
+            return (tokens - self._tokens) / self._rate
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Wait until tokens are available and take them; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        with self._lock:
+            self.total_wait += waited
+        return waited
+
+    def acquire_sync(self, tokens: float = 1.0) -> float:
+        """Blocking variant of acquire for code running in executor threads."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        with self._lock:
+            self.total_wait += waited
+        return waited
+
+    def report_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """
+        Feed back a rate-limit rejection from the provider.
+
+        Pauses the bucket for retry_after seconds (or one refill interval when the
+        provider did not say) and halves the refill rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_limited += 1
+            self._rate = max(self.base_rate * MIN_RATE_FRACTION, self._rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / self._rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+            self._tokens = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters and the current rate of the bucket."""
+        with self._lock:
+            return {
+                "rate": self._rate,
+                "base_rate": self.base_rate,
+                "burst": self.burst,
+                "acquired": self.acquired,
+                "rate_limited": self.rate_limited,
+                "total_wait": self.total_wait,
+            }
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """Return the process-wide token bucket of a provider."""
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            limits = DEFAULT_RATE_LIMITS.get(provider, FALLBACK_RATE_LIMIT)
+            bucket = TokenBucket(limits["rate"], limits["burst"])
+            _buckets[provider] = bucket
+        return bucket
+
+def configure_rate_limits(overrides: Optional[Dict[str, Dict[str, float]]]) -> None:
+    """
+    Apply per-provider overrides, e.g. {"exa": {"rate": 2, "burst": 2}}.
+
+    Args:
+        overrides (Optional[Dict[str, Dict[str, float]]]): Mapping of provider name to
+            rate (requests per second) and burst capacity
+    """
+    for provider, limits in (overrides or {}).items():
+        defaults = DEFAULT_RATE_LIMITS.get(provider, FALLBACK_RATE_LIMIT)
+        bucket = get_rate_limiter(provider)
+        rate = float(limits.get("rate", defaults["rate"]))
+        burst = float(limits.get("burst", defaults["burst"]))
+        if rate != bucket.base_rate or burst != bucket.burst:
+            bucket.configure(rate, burst)
+
+def rate_limit_stats() -> Dict[str, Dict[str, float]]:
+    """Return the stats of every bucket created so far."""
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {provider: bucket.stats() for provider, bucket in buckets.items()}
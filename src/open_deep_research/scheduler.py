@@ -0,0 +1,215 @@
+"""Process-wide scheduling of section branches and LLM calls.
+
+Every approved research section used to start at once, and every branch hit the
+model endpoint without limit. A 12-section plan sent 12+ concurrent requests to
+one vLLM server and starved other users' reports. Two kinds of limiter now
+bound the work:
+
+- one section limiter caps how many section branches run at the same time
+- one LLM limiter per model endpoint caps the requests in flight to it
+
+Waiters are served by priority, then in arrival order. Sections are given their
+estimated amount of work as priority, so long sections start first and the
+critical path of the report shrinks.
+
+Like the rate limiters, the limiters use a thread lock and wake waiters on
+their own event loop, so one limiter is shared by every loop in the process.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from open_deep_research.tracing import LLM, set_on_current_span, span
+
+DEFAULT_MAX_CONCURRENT_SECTIONS = 4
+DEFAULT_MAX_CONCURRENT_LLM_CALLS = 8
+
+class PriorityLimiter:
+    """Counting semaphore whose waiters are served highest priority first."""
+
+    def __init__(self, capacity: int):
+        self._lock = threading.Lock()
+        self.capacity = max(1, int(capacity))
+        self._in_flight = 0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._queued = 0
+        self.max_queue_depth = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def configure(self, capacity: int) -> None:
+        """Change the number of concurrent holders, waking waiters if it grew."""
+        with self._lock:
+            self.capacity = max(1, int(capacity))
+            while self._in_flight < self.capacity and self._grant_next():
+                self._in_flight += 1
+
+    def _grant_next(self) -> bool:
+        """Hand a slot to the best waiter; returns False if nobody is waiting. Call with the lock held."""
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            future, loop = entry[2], entry[3]
+            if future is None:
+                # Waiter was cancelled while queued
+                continue
+            entry[2] = None
+            self._queued -= 1
+            loop.call_soon_threadsafe(self._resolve, future)
+            return True
+        return False
+
+    def _resolve(self, future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+        else:
+            # The waiter was cancelled after the slot was handed over; pass it on
+            self.release()
+
+    def _record_wait(self, wait: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    async def acquire(self, priority: float = 0.0) -> float:
+        """
+        Wait for a slot.
+
+        Args:
+            priority (float): Higher values are served first
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.capacity and not self._queued:
+                self._in_flight += 1
+                entry = None
+            else:
+                future = loop.create_future()
+                entry = [-priority, next(self._sequence), future, loop]
+                heapq.heappush(self._waiters, entry)
+                self._queued += 1
+                self.max_queue_depth = max(self.max_queue_depth, self._queued)
+
+        if entry is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    queued = entry[2] is not None
+                    if queued:
+                        entry[2] = None
+                        self._queued -= 1
+                if not queued and future.done() and not future.cancelled():
+                    # The slot was granted before the cancellation arrived
+                    self.release()
+                raise
+
+        wait = time.monotonic() - start
+        self._record_wait(wait)
+        return wait
+
+    def release(self) -> None:
+        """Give the slot back, handing it straight to the next waiter if there is one."""
+        with self._lock:
+            if not (self._in_flight <= self.capacity and self._grant_next()):
+                self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: float = 0.0) -> AsyncIterator[float]:
+        """Hold a slot for the duration of the block; yields the seconds waited."""
+        waited = await self.acquire(priority)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Return queue depth, in-flight count and wait-time metrics."""
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "max_queue_depth": self.max_queue_depth,
+                "acquired": self.acquired,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            }
+
+_section_limiter = PriorityLimiter(DEFAULT_MAX_CONCURRENT_SECTIONS)
+_llm_limiters: Dict[str, PriorityLimiter] = {}
+_llm_limiters_lock = threading.Lock()
+
+def endpoint_key(model: str, model_provider: Optional[str] = None, base_url: Optional[str] = None) -> str:
+    """
+    Identify the endpoint serving a model.
+
+    Uses the explicit base_url, else the provider's ``<PROVIDER>_BASE_URL``
+    environment variable, else the provider and model name.
+    """
+    provider = model_provider or (model.split(":", 1)[0] if ":" in model else "")
+    if base_url:
+        return base_url
+    env_url = os.getenv(f"{provider.upper()}_BASE_URL") if provider else None
+    return env_url or f"{provider}:{model.split(':', 1)[-1]}"
+
+def get_section_limiter(max_concurrency: Optional[int] = None) -> PriorityLimiter:
+    """Return the process-wide section limiter, resizing it if max_concurrency changed."""
+    if max_concurrency is not None and int(max_concurrency) != _section_limiter.capacity:
+        _section_limiter.configure(max_concurrency)
+    return _section_limiter
+
+def get_llm_limiter(endpoint: str, max_concurrency: Optional[int] = None) -> PriorityLimiter:
+    """Return the process-wide limiter of an endpoint, resizing it if max_concurrency changed."""
+    with _llm_limiters_lock:
+        limiter = _llm_limiters.get(endpoint)
+        if limiter is None:
+            limiter = PriorityLimiter(max_concurrency or DEFAULT_MAX_CONCURRENT_LLM_CALLS)
+            _llm_limiters[endpoint] = limiter
+    if max_concurrency is not None and int(max_concurrency) != limiter.capacity:
+        limiter.configure(max_concurrency)
+    return limiter
+
+def section_priority(section: Any) -> float:
+    """Estimate the amount of work of a section (a Section or a plain description), used to start long sections first."""
+    if isinstance(section, str):
+        return float(len(section))
+    return float(len(getattr(section, "description", "") or "") + len(getattr(section, "content", "") or ""))
+
+@asynccontextmanager
+async def llm_slot(endpoint: str, max_concurrency: Optional[int] = None, priority: float = 0.0) -> AsyncIterator[float]:
+    """Hold one LLM request slot of an endpoint for the block, traced as an llm span; yields the seconds waited."""
+    with span("llm", LLM, endpoint=endpoint) as current:
+        async with get_llm_limiter(endpoint, max_concurrency).slot(priority) as waited:
+            if current is not None:
+                current.set(queue_wait=waited)
+            yield waited
+
+@asynccontextmanager
+async def section_slot(max_concurrency: Optional[int] = None, priority: float = 0.0) -> AsyncIterator[float]:
+    """Hold one section branch slot for the block, recording the wait on the current span; yields the seconds waited."""
+    async with get_section_limiter(max_concurrency).slot(priority) as waited:
+        set_on_current_span(queue_wait=waited)
+        yield waited
+
+def scheduler_stats() -> Dict[str, Any]:
+    """Return the metrics of the section limiter and of every endpoint limiter."""
+    with _llm_limiters_lock:
+        limiters = dict(_llm_limiters)
+    return {
+        "sections": _section_limiter.stats(),
+        "llm": {endpoint: limiter.stats() for endpoint, limiter in limiters.items()},
+    }
@@ -0,0 +1,174 @@
+"""On-disk cache for search provider responses.
+
+Responses are stored per query in a local SQLite file, content-addressed by a
+hash of the provider name, the normalized query string and the filtered search
+parameters (the output of ``get_search_params``). Entries expire after a TTL and
+the least recently used entries are evicted once the cache exceeds its size bound.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10_000
+
+def normalize_query(query: str) -> str:
+    """Normalize a query string so trivially different spellings share a cache entry."""
+    return " ".join(query.casefold().split())
+
+def make_cache_key(search_api: str, query: str, params: Optional[Dict[str, Any]]) -> str:
+    """
+    Build the content address for a single search request.
+
+    Args:
+        search_api (str): The search API identifier (e.g., "exa", "tavily")
+        query (str): The raw query string
+        params (Optional[Dict[str, Any]]): Filtered parameters passed to the provider
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps(
+        {"api": search_api, "query": normalize_query(query), "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SearchCache:
+    """SQLite-backed, TTL and size bounded cache of search responses.
+
+    The cache is safe to share between concurrently running graph branches; all
+    access to the underlying connection is serialized with a lock.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                search_api TEXT NOT NULL,
+                query TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_last_access ON search_cache(last_access)")
+        self._conn.commit()
+
+    def get(self, search_api: str, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a query, or None on a miss or expired entry."""
+        key = make_cache_key(search_api, query, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, payload FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            created_at, payload = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+    def set(self, search_api: str, query: str, params: Optional[Dict[str, Any]], response: Dict[str, Any]) -> None:
+        """Store a provider response for a query and evict entries beyond the size bound."""
+        key = make_cache_key(search_api, query, params)
+        payload = zlib.compress(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, search_api, query, created_at, last_access, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, search_api, normalize_query(query), now, now, payload),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used ones above max_entries."""
+        cursor = self._conn.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += max(cursor.rowcount, 0)
+
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN "
+                "(SELECT key FROM search_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of stored entries."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+_caches: Dict[str, SearchCache] = {}
+_caches_lock = threading.Lock()
+
+def get_search_cache(path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES) -> SearchCache:
+    """Return the process-wide cache for a given file path, creating it on first use."""
+    path = os.path.abspath(os.path.expanduser(path))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = SearchCache(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+            _caches[path] = cache
+        else:
+            cache.ttl_seconds = ttl_seconds
+            cache.max_entries = max_entries
+        return cache
@@ -0,0 +1,109 @@
+"""Dependency-aware scheduling of sections that are written without research.
+
+A ``Section`` may list the sections it builds on in ``depends_on``. When the
+field is omitted, the section depends on every research section, which was the
+only behaviour before. An empty list means the section depends on nothing.
+
+Research branches publish each finished section on a run-scoped
+``SectionBoard``. The dependent writer runs next to them and starts every
+non-research section as soon as the sections it depends on are on the board.
+A section whose dependencies failed, time out or form a cycle is left to the
+regular write_final_sections pass after all research is gathered.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from open_deep_research.state import Section
+
+MAX_BOARDS = 32
+
+def dependencies_of(section: Section, sections: Iterable[Section]) -> List[str]:
+    """Return the names of the plan's sections that a section depends on, in plan order."""
+    sections = list(sections)
+    if section.depends_on is None:
+        return [s.name for s in sections if s.research and s.name != section.name]
+    wanted = set(section.depends_on)
+    return [s.name for s in sections if s.name in wanted and s.name != section.name]
+
+def cyclic_sections(sections: Iterable[Section]) -> Set[str]:
+    """Return the names of sections that depend on themselves through a chain of dependencies."""
+    sections = list(sections)
+    graph = {s.name: dependencies_of(s, sections) for s in sections}
+    cyclic: Set[str] = set()
+    for start in graph:
+        stack = list(graph[start])
+        seen: Set[str] = set()
+        while stack:
+            name = stack.pop()
+            if name == start:
+                cyclic.add(start)
+                break
+            if name in seen:
+                continue
+            seen.add(name)
+            stack.extend(graph.get(name, []))
+    return cyclic
+
+class SectionBoard:
+    """Completed and failed sections of one run, with waiters for their dependencies."""
+
+    def __init__(self):
+        self._done: Dict[str, Section] = {}
+        self._failed: Set[str] = set()
+        self._changed = asyncio.Condition()
+
+    async def publish(self, section: Section) -> None:
+        """Record a completed section and wake the sections waiting for it."""
+        async with self._changed:
+            self._done[section.name] = section
+            self._changed.notify_all()
+
+    async def fail(self, name: str) -> None:
+        """Record that a section will not complete in this pass."""
+        async with self._changed:
+            self._failed.add(name)
+            self._changed.notify_all()
+
+    async def wait_for(self, names: List[str], timeout: Optional[float] = None) -> Optional[List[Section]]:
+        """
+        Wait until every named section is completed.
+
+        Returns:
+            Optional[List[Section]]: The sections in the order of names, or None if one
+            of them failed or the timeout expired
+        """
+        def settled() -> bool:
+            return all(name in self._done for name in names) or any(name in self._failed for name in names)
+
+        try:
+            async with self._changed:
+                await asyncio.wait_for(self._changed.wait_for(settled), timeout)
+                if any(name in self._failed for name in names):
+                    return None
+                return [self._done[name] for name in names]
+        except asyncio.TimeoutError:
+            return None
+
+_boards: "OrderedDict[str, SectionBoard]" = OrderedDict()
+_boards_lock = threading.Lock()
+
+def get_section_board(run_id: str) -> SectionBoard:
+    """Return the board of a run, creating it on first use; only the most recent runs are kept."""
+    with _boards_lock:
+        board = _boards.get(run_id)
+        if board is None:
+            board = SectionBoard()
+            _boards[run_id] = board
+            while len(_boards) > MAX_BOARDS:
+                _boards.popitem(last=False)
+        else:
+            _boards.move_to_end(run_id)
+        return board
+
+def release_section_board(run_id: Optional[str]) -> None:
+    """Drop the board of a finished run."""
+    with _boards_lock:
+        _boards.pop(run_id, None)
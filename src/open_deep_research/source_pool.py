@@ -0,0 +1,91 @@
+"""Run-scoped pool of planning-phase sources used as a warm cache for sections.
+
+``generate_report_plan`` searches the topic before any section exists, and the
+sections then tend to search near-identical queries. The planning results
+travel with each section's input. In its first search round, a section checks
+every query against the pool. A query is covered when enough pooled documents
+contain most of its terms. Covered queries are not sent to the search API, and
+the matching pooled documents join the section's sources instead.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from open_deep_research.passages import tokenize
+
+DEFAULT_MIN_COVERAGE = 0.8
+DEFAULT_MIN_SOURCES = 1
+
+class SourcePool:
+    """Term index over pooled search results answering "is this query already covered?"."""
+
+    def __init__(self, search_docs: Optional[List[Dict[str, Any]]] = None,
+                 min_coverage: float = DEFAULT_MIN_COVERAGE, min_sources: int = DEFAULT_MIN_SOURCES):
+        self.min_coverage = min_coverage
+        self.min_sources = min_sources
+        self._responses: List[Dict[str, Any]] = []
+        self._terms: List[List[Set[str]]] = []
+        seen: Set[str] = set()
+        for response in search_docs or []:
+            if response.get('error'):
+                continue
+            results = []
+            for result in response.get('results') or []:
+                url = result.get('url')
+                if url is None or url in seen:
+                    continue
+                seen.add(url)
+                results.append(result)
+            if results:
+                self._responses.append({**response, 'results': results})
+                self._terms.append([
+                    set(tokenize(f"{r.get('title', '')} {r.get('content') or ''} {r.get('raw_content') or ''}"))
+                    for r in results
+                ])
+
+    def __len__(self) -> int:
+        return sum(len(response['results']) for response in self._responses)
+
+    def _coverage(self, query: str) -> List[List[float]]:
+        """Return, for every pooled result, the fraction of the query's terms it contains."""
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return [[0.0] * len(terms) for terms in self._terms]
+        return [[len(query_terms & doc_terms) / len(query_terms) for doc_terms in terms] for terms in self._terms]
+
+    def covers(self, query: str) -> bool:
+        """Return True if at least min_sources pooled results contain min_coverage of the query's terms."""
+        matching = sum(1 for row in self._coverage(query) for value in row if value >= self.min_coverage)
+        hit = matching >= self.min_sources
+        _record_lookup(hit)
+        return hit
+
+    def relevant_docs(self, queries: Sequence[str]) -> List[Dict[str, Any]]:
+        """Return the pooled results that cover at least one of the queries, grouped by their original response."""
+        keep = [[False] * len(terms) for terms in self._terms]
+        for query in queries:
+            for i, row in enumerate(self._coverage(query)):
+                for j, value in enumerate(row):
+                    if value >= self.min_coverage:
+                        keep[i][j] = True
+        relevant = []
+        for response, flags in zip(self._responses, keep):
+            results = [result for result, flag in zip(response['results'], flags) if flag]
+            if results:
+                relevant.append({**response, 'results': results})
+        return relevant
+
+_stats_lock = threading.Lock()
+_lookups = 0
+_hits = 0
+
+def _record_lookup(hit: bool) -> None:
+    global _lookups, _hits
+    with _stats_lock:
+        _lookups += 1
+        _hits += int(hit)
+
+def warm_cache_stats() -> Dict[str, Any]:
+    """Return how many section queries were answered from planning sources."""
+    with _stats_lock:
+        return {"lookups": _lookups, "hits": _hits, "hit_rate": _hits / _lookups if _lookups else 0.0}
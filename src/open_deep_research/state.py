@@ -1,4 +1,4 @@
-from typing import Annotated, List, TypedDict, Literal
+from typing import Annotated, List, Optional, TypedDict, Literal
 from pydantic import BaseModel, Field
 import operator
 
@@ -15,6 +15,10 @@ class Section(BaseModel):
     content: str = Field(
         description="The content of the section."
     )   
+    depends_on: Optional[List[str]] = Field(
+        default=None,
+        description="Names of the sections this section builds on. Only for sections without research; omit to build on all research sections, or use an empty list if it needs none.",
+    )
 
 class Sections(BaseModel):
     sections: List[Section] = Field(
@@ -29,6 +33,19 @@ class Queries(BaseModel):
         description="List of search queries.",
     )
 
+class SectionQueries(BaseModel):
+    section_name: str = Field(
+        description="Name of the section these queries are for, exactly as given in the report plan.",
+    )
+    queries: List[SearchQuery] = Field(
+        description="List of search queries for this section.",
+    )
+
+class SectionQueriesBatch(BaseModel):
+    sections: List[SectionQueries] = Field(
+        description="Search queries for every section of the report.",
+    )
+
 class Feedback(BaseModel):
     grade: Literal["pass","fail"] = Field(
         description="评估结果，'pass' 表示内容合格，'fail' 表示需要补充或修订。"
@@ -47,6 +64,8 @@ class ReportState(TypedDict):
     topic: str # 报告主题
     feedback_on_report_plan: str # 针对报告计划的反馈
     sections: list[Section] # 报告各部分的列表
+    planning_docs: list[dict] # 规划阶段的原始检索结果，作为章节检索的预热来源池
+    dag_run_id: str # 章节依赖调度所用的运行标识
     completed_sections: Annotated[list, operator.add] # Send() API 键
     report_sections_from_research: str # 由研究完成的部分内容字符串，用于撰写最终部分
     final_report: str # 最终报告
@@ -57,8 +76,17 @@ class SectionState(TypedDict):
     search_iterations: int # Number of search iterations done
     search_queries: list[SearchQuery] # List of search queries
     source_str: str # String of formatted source content from web search
+    source_docs: list[dict] # Deduplicated search results accumulated across search iterations
+    searched_queries: list[str] # Queries already searched for this section
+    novelty: list[dict] # What each search iteration added to the section's sources
+    planning_docs: list[dict] # Search results of the planning phase, checked before searching
     report_sections_from_research: str # String of any completed sections from research to write final sections
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
 
+class DependentSectionsState(TypedDict):
+    topic: str # Report topic
+    sections: list[Section] # All sections of the approved plan
+    dag_run_id: str # Run whose section board announces completed sections
+
 class SectionOutputState(TypedDict):
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
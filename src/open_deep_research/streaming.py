@@ -0,0 +1,114 @@
+"""Streaming of report sections as soon as they are written.
+
+Nodes publish events on LangGraph's custom stream:
+
+- ``report_plan``: the approved plan, with the section names in report order
+- ``section_ready``: a section was completed (events arrive out of order)
+
+``astream_report`` runs a graph and reassembles ``section_ready`` events in
+plan order through an ``OrderedSectionBuffer``. A ``section`` event is yielded
+once a section and every section before it are done. The raw out-of-order
+events are passed through as well, for clients that subscribe to them.
+"""
+
+import functools
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from langgraph.config import get_stream_writer
+from langgraph.types import Command
+
+REPORT_PLAN = "report_plan"
+SECTION_READY = "section_ready"
+SECTION = "section"
+INTERRUPT = "interrupt"
+FINAL_REPORT = "final_report"
+
+def emit_event(event: Dict[str, Any]) -> None:
+    """Write an event to the custom stream of the running graph; a no-op outside a graph run."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(event)
+
+def publishes_sections(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Emit a section_ready event for every section a node adds to completed_sections."""
+    @functools.wraps(func)
+    async def wrapper(state: Any, config: Any):
+        output = await func(state, config)
+        update = output.update if isinstance(output, Command) else output
+        for section in (update or {}).get("completed_sections", []) if isinstance(update, dict) else []:
+            emit_event({"event": SECTION_READY, "name": section.name, "content": section.content})
+        return output
+
+    return wrapper
+
+class OrderedSectionBuffer:
+    """Reassembles sections completed in any order into plan order."""
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = list(names)
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self._pending: Dict[int, str] = {}
+        self.next_index = 0
+
+    @property
+    def complete(self) -> bool:
+        """True once every section of the plan has been released."""
+        return self.next_index >= len(self.names)
+
+    def add(self, name: str, content: str) -> List[Dict[str, Any]]:
+        """
+        Record a completed section and release every section that is now in order.
+
+        Args:
+            name (str): Section name from the plan; unknown or repeated names are ignored
+            content (str): Section content
+
+        Returns:
+            List[Dict[str, Any]]: Released sections with index, name and content, in plan order
+        """
+        index = self._positions.get(name)
+        if index is None or index < self.next_index or index in self._pending:
+            return []
+        self._pending[index] = content
+        released = []
+        while self.next_index in self._pending:
+            released.append({"index": self.next_index, "name": self.names[self.next_index],
+                             "content": self._pending.pop(self.next_index)})
+            self.next_index += 1
+        return released
+
+async def astream_report(graph: Any, input: Any, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run a report graph and yield section events as soon as they are available.
+
+    Yields dicts with an "event" key:
+        report_plan: {"sections": [names]} once the plan is approved
+        section_ready: {"name", "content"} for each completed section, out of order
+        section: {"index", "name", "content"} in plan order
+        interrupt: {"value": [...]} when the graph waits for human feedback
+        final_report: {"content"} when compile_final_report is done
+
+    Args:
+        graph: Compiled graph (graph.graph or a graph compiled with a checkpointer)
+        input: Graph input, or a Command resuming an interrupted run
+        config (Optional[Dict[str, Any]]): Run configuration
+    """
+    buffer: Optional[OrderedSectionBuffer] = None
+    async for namespace, mode, data in graph.astream(input, config, stream_mode=["custom", "updates"], subgraphs=True):
+        if mode == "custom" and isinstance(data, dict):
+            if data.get("event") == REPORT_PLAN:
+                buffer = OrderedSectionBuffer(data["sections"])
+                yield data
+            elif data.get("event") == SECTION_READY:
+                yield data
+                if buffer is not None:
+                    for released in buffer.add(data["name"], data["content"]):
+                        yield {"event": SECTION, **released}
+        elif mode == "updates" and not namespace:
+            if "__interrupt__" in data:
+                yield {"event": INTERRUPT, "value": [item.value for item in data["__interrupt__"]]}
+            final = data.get("compile_final_report")
+            if final and "final_report" in final:
+                yield {"event": FINAL_REPORT, "content": final["final_report"]}
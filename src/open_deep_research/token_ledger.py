@@ -0,0 +1,292 @@
+"""Per-run accounting of prompt and completion tokens, with budgets that degrade gracefully.
+
+Every chat model call made by the graphs is charged to the ledger of its run
+(``thread_id``, or the graph invocation when there is none). The entry records
+the node, the role of the call in that node (``planner``, ``query_writer``,
+``writer``, ``grader``, ``final_writer``, ``supervisor`` or ``researcher``)
+and the section it served. Usage is taken from the model response metadata.
+When an endpoint reports none, prompt and completion are counted locally with
+the configured ``token_counter``, and the entry is flagged as estimated.
+
+With ``run_token_budget`` set, nodes ask the ledger how much of the budget is
+spent. Once a run passes ``token_budget_degrade_at`` of its budget, sections
+generate a single search query and skip grading, so the run finishes with the
+sections it has instead of overrunning.
+"""
+
+import contextvars
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig, ensure_config
+from langchain_core.tracers.context import register_configure_hook
+
+from open_deep_research.configuration import Configuration
+from open_deep_research.token_budget import get_token_counter
+
+DEFAULT_RUN = "default"
+MAX_RUN_LEDGERS = 32
+
+@dataclass
+class LedgerEntry:
+    """Token usage of one chat model call."""
+    node: Optional[str]
+    role: Optional[str]
+    section: Optional[str]
+    model: Optional[str]
+    input_tokens: int
+    output_tokens: int
+    estimated: bool
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "estimated_calls": 0, "cost": 0.0}
+
+class TokenLedger:
+    """Token usage of one run, aggregated per node, role, section and model."""
+
+    def __init__(self, run: str, budget: Optional[int] = None, prices: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Start an empty ledger for a run.
+
+        Args:
+            run (str): Run identifier
+            budget (Optional[int]): Total tokens the run may spend, or None for no budget
+            prices (Optional[Dict[str, Dict[str, float]]]): Price per million input and output tokens
+                per model name, e.g. {"gpt-4.1": {"input": 2.0, "output": 8.0}}
+        """
+        self.run = run
+        self.budget = budget
+        self.prices = prices or {}
+        self.entries: List[LedgerEntry] = []
+        self._lock = threading.Lock()
+        self._total = 0
+
+    def record(self, entry: LedgerEntry) -> None:
+        """Charge one chat model call to the run."""
+        with self._lock:
+            self.entries.append(entry)
+            self._total += entry.input_tokens + entry.output_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        """Input and output tokens spent by the run so far."""
+        return self._total
+
+    def used_fraction(self) -> float:
+        """Return the share of the budget spent so far (0 without a budget)."""
+        if not self.budget:
+            return 0.0
+        return self._total / self.budget
+
+    def cost(self, entry: LedgerEntry) -> float:
+        """Return the price of one entry from the per-million prices of its model (0 for unpriced models)."""
+        price = self.prices.get(entry.model or "", {})
+        return (entry.input_tokens * price.get("input", 0.0) + entry.output_tokens * price.get("output", 0.0)) / 1e6
+
+    def summary(self) -> Dict[str, Any]:
+        """Return totals for the run and per node, role, section and model."""
+        with self._lock:
+            entries = list(self.entries)
+        total = _empty_totals()
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {key: defaultdict(_empty_totals)
+                                                        for key in ("node", "role", "section", "model")}
+        for entry in entries:
+            buckets = [total] + [groups[key][str(getattr(entry, key))] for key in groups if getattr(entry, key) is not None]
+            for bucket in buckets:
+                bucket["calls"] += 1
+                bucket["input_tokens"] += entry.input_tokens
+                bucket["output_tokens"] += entry.output_tokens
+                bucket["total_tokens"] += entry.input_tokens + entry.output_tokens
+                bucket["estimated_calls"] += int(entry.estimated)
+                bucket["cost"] += self.cost(entry)
+        return {
+            "run": self.run,
+            "budget": self.budget,
+            "used_fraction": total["total_tokens"] / self.budget if self.budget else None,
+            "total": total,
+            **{f"by_{key}": dict(values) for key, values in groups.items()},
+        }
+
+    def clear(self) -> None:
+        """Forget every entry, e.g. when the run's thread starts a new report."""
+        with self._lock:
+            self.entries.clear()
+            self._total = 0
+
+_ledgers: "OrderedDict[str, TokenLedger]" = OrderedDict()
+_ledgers_lock = threading.Lock()
+
+# Root run id of the graph invocation in progress, for runs without a thread_id
+_invocation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "open_deep_research_ledger_invocation", default=None)
+
+def current_invocation() -> Optional[str]:
+    """Return the root run id of the graph invocation in progress, or None outside one."""
+    return _invocation.get()
+
+def _run_key(config: Optional[RunnableConfig]) -> str:
+    """Key a run by its thread_id, else by the invocation it belongs to, so concurrent runs never share a ledger."""
+    return str((config or {}).get("configurable", {}).get("thread_id") or current_invocation() or DEFAULT_RUN)
+
+def get_run_ledger(config: Optional[RunnableConfig] = None) -> TokenLedger:
+    """Return the ledger of the run a config belongs to, creating it on first use; only recent runs are kept."""
+    config = config if config is not None else ensure_config()
+    configurable = Configuration.from_runnable_config(config)
+    run = _run_key(config)
+    with _ledgers_lock:
+        ledger = _ledgers.get(run)
+        if ledger is None:
+            ledger = TokenLedger(run)
+            _ledgers[run] = ledger
+            while len(_ledgers) > MAX_RUN_LEDGERS:
+                _ledgers.popitem(last=False)
+        else:
+            _ledgers.move_to_end(run)
+    ledger.budget = configurable.run_token_budget
+    ledger.prices = configurable.token_prices or {}
+    return ledger
+
+def start_run_ledger(config: Optional[RunnableConfig] = None) -> TokenLedger:
+    """Clear the ledger of a run that starts a new report, so earlier reports on the same thread do not count."""
+    ledger = get_run_ledger(config)
+    ledger.clear()
+    return ledger
+
+def token_ledger_summary(run: str = DEFAULT_RUN) -> Optional[Dict[str, Any]]:
+    """Return the summary of a run's ledger, or None if the run has none."""
+    with _ledgers_lock:
+        ledger = _ledgers.get(run)
+    return ledger.summary() if ledger is not None else None
+
+def over_budget(config: Optional[RunnableConfig] = None) -> bool:
+    """Return True once the run has spent token_budget_degrade_at of run_token_budget."""
+    config = config if config is not None else ensure_config()
+    configurable = Configuration.from_runnable_config(config)
+    if not configurable.run_token_budget:
+        return False
+    return get_run_ledger(config).used_fraction() >= configurable.token_budget_degrade_at
+
+_scope: contextvars.ContextVar[Tuple[Optional[str], Optional[str]]] = contextvars.ContextVar(
+    "open_deep_research_ledger_scope", default=(None, None))
+
+class ledger_scope:
+    """
+    Charge the chat model calls made in a block to a role and section; unset values are inherited.
+
+    Usable with ``with`` and ``async with``, so it can share a statement with ``llm_slot``.
+    """
+
+    def __init__(self, role: Optional[str] = None, section: Optional[str] = None):
+        self.role = role
+        self.section = section
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> "ledger_scope":
+        current_role, current_section = _scope.get()
+        self._token = _scope.set((self.role or current_role, self.section or current_section))
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _scope.reset(self._token)
+
+    async def __aenter__(self) -> "ledger_scope":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.__exit__(*exc_info)
+
+def _message_text(message: Any) -> str:
+    text = message.content if isinstance(message.content, str) else str(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    return text + (str(tool_calls) if tool_calls else "")
+
+class _LedgerCallbackHandler(BaseCallbackHandler):
+    """Charges every chat model call to the ledger of the run it belongs to."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._pending: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       **kwargs: Any) -> None:
+        # Runs inline in the invoking task, so the nodes' tasks started after it inherit the id
+        if parent_run_id is None:
+            _invocation.set(str(run_id))
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        if parent_run_id is None and _invocation.get() == str(run_id):
+            _invocation.set(None)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       **kwargs: Any) -> None:
+        self.on_chain_end(None, run_id=run_id, parent_run_id=parent_run_id)
+
+    def on_chat_model_start(self, serialized: Any, messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        config = ensure_config()
+        configurable = Configuration.from_runnable_config(config)
+        role, section = _scope.get()
+        params = kwargs.get("invocation_params") or {}
+        with self._lock:
+            self._pending[run_id] = {
+                "ledger": get_run_ledger(config),
+                "node": (metadata or {}).get("langgraph_node"),
+                "role": role,
+                "section": section,
+                "model": params.get("model") or params.get("model_name"),
+                "count": get_token_counter(configurable.token_counter),
+                "prompt": "\n".join(_message_text(m) for batch in messages for m in batch),
+            }
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        input_tokens = output_tokens = 0
+        reported = False
+        completion = []
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                completion.append(_message_text(message) if message is not None else generation.text)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    reported = True
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        if not reported:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            if usage:
+                reported = True
+                input_tokens = usage.get("prompt_tokens", 0)
+                output_tokens = usage.get("completion_tokens", 0)
+        if not reported:
+            # The endpoint reported no usage; count locally
+            input_tokens = pending["count"](pending["prompt"])
+            output_tokens = sum(pending["count"](text) for text in completion)
+        pending["ledger"].record(LedgerEntry(node=pending["node"], role=pending["role"], section=pending["section"],
+                                             model=pending["model"], input_tokens=input_tokens,
+                                             output_tokens=output_tokens, estimated=not reported))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._pending.pop(run_id, None)
+
+_HANDLER = _LedgerCallbackHandler()
+# Set by default, so every chat model call in the process is charged without passing callbacks around
+_handler_var: contextvars.ContextVar[Optional[_LedgerCallbackHandler]] = contextvars.ContextVar(
+    "open_deep_research_ledger_handler", default=_HANDLER)
+register_configure_hook(_handler_var, inheritable=True)
+
+def ledger_entries(run: str = DEFAULT_RUN) -> List[Dict[str, Any]]:
+    """Return the entries of a run's ledger as dicts."""
+    with _ledgers_lock:
+        ledger = _ledgers.get(run)
+    return [asdict(entry) for entry in ledger.entries] if ledger is not None else []
@@ -0,0 +1,397 @@
+"""Local tracing of graph nodes, LLM calls and search provider calls.
+
+Spans are recorded around every node of ``graph.py`` and ``multi_agent.py``
+(``traced_node``), every LLM request (opened by ``scheduler.llm_slot``) and
+every search provider and page fetch call in ``utils.py``. A span records its
+duration and, where they apply, these attributes:
+
+- ``queue_wait``: seconds spent waiting for an LLM or section slot
+- ``bytes_out`` / ``bytes_in``: request and response payload sizes
+- ``input_tokens`` / ``output_tokens``: token usage reported by the model
+- ``retries``: retried provider requests
+
+Tracing is enabled by setting ``trace_path`` in the run configuration, or by
+running a graph inside ``trace_run``. Spans are appended to the file as they
+end, either as JSON lines (``trace_format="jsonl"``) or as OTLP/JSON export
+requests (``trace_format="otlp"``), so no collector, LangSmith or network
+access is needed. Runs are told apart by their ``thread_id``, or by the graph
+invocation when there is none. When the last node of a run finishes, a
+critical-path summary of the run is printed.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig, ensure_config
+from langchain_core.tracers.context import register_configure_hook
+from langgraph.errors import GraphBubbleUp
+
+from open_deep_research.configuration import Configuration
+from open_deep_research.profiling import profile_scope
+from open_deep_research.token_ledger import current_invocation
+
+DEFAULT_TRACE_ID = "default"
+MAX_OPEN_TRACES = 32
+
+NODE = "node"
+LLM = "llm"
+PROVIDER = "provider"
+
+class Span:
+    """One timed operation of a run."""
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start", "duration", "status", "attributes", "_started")
+
+    def __init__(self, name: str, kind: str, parent_id: Optional[str] = None, **attributes: Any):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self._started = time.perf_counter()
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def set(self, **attributes: Any) -> None:
+        """Set attributes of the span."""
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float) -> None:
+        """Add to a numeric attribute of the span."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"span_id": self.span_id, "parent_id": self.parent_id, "name": self.name, "kind": self.kind,
+                "start": self.start, "end": self.end, "duration": self.duration, "status": self.status,
+                "attributes": self.attributes}
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Trace:
+    """Spans of one run and the file they are exported to."""
+
+    def __init__(self, run: str, path: Optional[str] = None, format: str = "jsonl"):
+        if format not in ("jsonl", "otlp"):
+            raise ValueError(f"Unsupported trace format: {format}")
+        self.run = run
+        self.trace_id = uuid.uuid4().hex
+        self.path = path
+        self.format = format
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        """Keep an ended span and append it to the export file."""
+        line = json.dumps(self._export(span), ensure_ascii=False, default=str) if self.path else None
+        with self._lock:
+            self.spans.append(span)
+            if line is not None:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def _export(self, span: Span) -> Dict[str, Any]:
+        if self.format == "jsonl":
+            return {"trace_id": self.trace_id, "run": self.run, **span.to_dict()}
+        otlp_span = {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL for nodes, SPAN_KIND_CLIENT for calls to models and providers
+            "kind": 1 if span.kind == NODE else 3,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int(span.end * 1e9)),
+            "attributes": [{"key": key, "value": _otlp_value(value)}
+                           for key, value in {"span.kind": span.kind, **span.attributes}.items()],
+            "status": {"code": 1 if span.status != "error" else 2},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "open_deep_research"}},
+                                        {"key": "run", "value": {"stringValue": self.run}}]},
+            "scopeSpans": [{"scope": {"name": "open_deep_research.tracing"}, "spans": [otlp_span]}],
+        }]}
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("open_deep_research_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("open_deep_research_span", default=None)
+
+class _SpanCallbackHandler(BaseCallbackHandler):
+    """Adds payload sizes and token usage of chat model calls to the current span."""
+
+    run_inline = True
+
+    def on_chat_model_start(self, serialized: Any, messages: List[List[Any]], **kwargs: Any) -> None:
+        add_to_current_span("bytes_out", sum(len(str(m.content).encode("utf-8")) for batch in messages for m in batch))
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        reported = False
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                text = generation.text or (str(message.content) if message is not None else "")
+                extra = json.dumps(message.additional_kwargs, default=str) if message is not None and message.additional_kwargs else ""
+                add_to_current_span("bytes_in", len(text.encode("utf-8")) + len(extra.encode("utf-8")))
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    reported = True
+                    add_to_current_span("input_tokens", usage.get("input_tokens", 0))
+                    add_to_current_span("output_tokens", usage.get("output_tokens", 0))
+        usage = (response.llm_output or {}).get("token_usage") if not reported else None
+        if usage:
+            add_to_current_span("input_tokens", usage.get("prompt_tokens", 0))
+            add_to_current_span("output_tokens", usage.get("completion_tokens", 0))
+
+_HANDLER = _SpanCallbackHandler()
+# Every LangChain run started while this variable is set gets the handler, without passing callbacks around
+_handler_var: contextvars.ContextVar[Optional[_SpanCallbackHandler]] = contextvars.ContextVar(
+    "open_deep_research_span_handler", default=None)
+register_configure_hook(_handler_var, inheritable=True)
+
+_traces: "OrderedDict[str, Trace]" = OrderedDict()
+_traces_lock = threading.Lock()
+
+def get_trace(run: str, path: Optional[str] = None, format: str = "jsonl") -> Trace:
+    """Return the open trace of a run, starting it on first use; only the most recent runs are kept open."""
+    with _traces_lock:
+        trace = _traces.get(run)
+        if trace is None:
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            trace = Trace(run, path, format)
+            _traces[run] = trace
+            while len(_traces) > MAX_OPEN_TRACES:
+                _traces.popitem(last=False)
+        else:
+            _traces.move_to_end(run)
+        return trace
+
+def trace_for_config(config: Optional[RunnableConfig]) -> Optional[Trace]:
+    """Return the trace a node should record into, or None when tracing is off."""
+    current = _current_trace.get()
+    if current is not None:
+        return current
+    configurable = Configuration.from_runnable_config(config)
+    if not configurable.trace_path:
+        return None
+    # Without a thread_id, each graph invocation gets its own trace so concurrent runs never share one
+    run = (config or {}).get("configurable", {}).get("thread_id") or current_invocation() or DEFAULT_TRACE_ID
+    return get_trace(str(run), configurable.trace_path, configurable.trace_format)
+
+def finish_trace(trace: Optional[Trace], echo: bool = True) -> Optional[str]:
+    """Close a run's trace and print its critical-path summary unless echo is False; returns the summary."""
+    if trace is None:
+        return None
+    with _traces_lock:
+        if _traces.get(trace.run) is trace:
+            del _traces[trace.run]
+    summary = summarize(trace.spans, title=f"Trace of run {trace.run}")
+    if echo:
+        print(summary)
+    return summary
+
+@contextmanager
+def span(name: str, kind: str = NODE, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of the current span; yields None when no trace is active.
+
+    Exceptions are recorded as an error status and re-raised. Graph interrupts are not errors.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(name, kind, parent.span_id if parent is not None else None, **attributes)
+    span_token = _current_span.set(current)
+    handler_token = _handler_var.set(_HANDLER)
+    try:
+        yield current
+    except GraphBubbleUp:
+        current.status = "interrupted"
+        raise
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._started
+        _handler_var.reset(handler_token)
+        _current_span.reset(span_token)
+        trace.record(current)
+
+def add_to_current_span(key: str, value: float) -> None:
+    """Add to a numeric attribute of the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(key, value)
+
+def set_on_current_span(**attributes: Any) -> None:
+    """Set attributes of the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+@contextmanager
+def _trace_scope(trace: Optional[Trace]) -> Iterator[None]:
+    if trace is None or _current_trace.get() is trace:
+        yield
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+def traced_node(name: str, final: Union[bool, Callable[[Any], bool]] = False) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Record a span around a graph node (sync or async), and profile it when profile_targets selects it.
+
+    Args:
+        name (str): Node name
+        final: The node ends the run (or, given a predicate, ends it when the predicate holds for
+            the node's output); the run's trace is then closed and summarized, unless it belongs
+            to an enclosing trace_run
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        takes_config = len(inspect.signature(func).parameters) > 1
+
+        def call(state: Any, config: Optional[RunnableConfig]) -> Any:
+            return func(state, config) if takes_config else func(state)
+
+        def ends_run(output: Any) -> bool:
+            return final(output) if callable(final) else final
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(state: Any, config: Optional[RunnableConfig] = None):
+                owned = _current_trace.get() is None
+                trace = trace_for_config(config if config is not None else ensure_config())
+                with _trace_scope(trace):
+                    with span(name, NODE) as current, profile_scope(name, config, current):
+                        output = await call(state, config)
+                if owned and ends_run(output):
+                    finish_trace(trace)
+                return output
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(state: Any, config: Optional[RunnableConfig] = None):
+            owned = _current_trace.get() is None
+            trace = trace_for_config(config if config is not None else ensure_config())
+            with _trace_scope(trace):
+                with span(name, NODE) as current, profile_scope(name, config, current):
+                    output = call(state, config)
+            if owned and ends_run(output):
+                finish_trace(trace)
+            return output
+
+        return wrapper
+
+    return decorator
+
+@asynccontextmanager
+async def trace_run(run: Optional[str] = None, path: Optional[str] = None, format: str = "jsonl",
+                    echo: bool = True) -> AsyncIterator[Trace]:
+    """
+    Trace everything run inside the block as one run, then print its summary unless echo is False.
+
+    Example:
+        async with trace_run(path="traces.jsonl"):
+            await graph.ainvoke({"topic": topic}, config)
+    """
+    trace = Trace(run or uuid.uuid4().hex, path, format)
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        finish_trace(trace, echo)
+
+def critical_path(spans: List[Span]) -> List[Tuple[int, Span]]:
+    """
+    Return the chain of spans that determined the run's wall time, with their nesting depth.
+
+    At each level, the path starts from the span that ended last and walks back to the
+    span that ended last before it started; each span on the path is expanded the same way.
+    """
+    ids = {s.span_id for s in spans}
+    children: Dict[Optional[str], List[Span]] = defaultdict(list)
+    for s in spans:
+        children[s.parent_id if s.parent_id in ids else None].append(s)
+
+    def chain(candidates: List[Span]) -> List[Span]:
+        if not candidates:
+            return []
+        current = max(candidates, key=lambda s: s.end)
+        path = [current]
+        while True:
+            earlier = [s for s in candidates if s.end <= current.start + 1e-6 and s is not current]
+            if not earlier:
+                break
+            current = max(earlier, key=lambda s: s.end)
+            path.append(current)
+        return path[::-1]
+
+    result: List[Tuple[int, Span]] = []
+
+    def expand(candidates: List[Span], depth: int) -> None:
+        for s in chain(candidates):
+            result.append((depth, s))
+            expand(children.get(s.span_id, []), depth + 1)
+
+    expand(children.get(None, []), 0)
+    return result
+
+def summarize(spans: List[Span], title: str = "Trace") -> str:
+    """Format the critical path and per-kind totals of a run's spans."""
+    if not spans:
+        return f"{title}: no spans"
+    wall = max(s.end for s in spans) - min(s.start for s in spans)
+    lines = [f"{title}: {len(spans)} spans, wall time {wall:.2f}s", "Critical path:"]
+    for depth, s in critical_path(spans):
+        details = []
+        if s.attributes.get("queue_wait"):
+            details.append(f"queued {s.attributes['queue_wait']:.2f}s")
+        if s.attributes.get("input_tokens") or s.attributes.get("output_tokens"):
+            details.append(f"tokens {s.attributes.get('input_tokens', 0)}/{s.attributes.get('output_tokens', 0)}")
+        if s.status != "ok":
+            details.append(s.status)
+        label = "  " * (depth + 1) + (s.name if s.kind == NODE else f"[{s.kind}] {s.name}")
+        lines.append(f"{label:<60} {s.duration:8.2f}s" + (f"  ({', '.join(details)})" if details else ""))
+
+    lines.append("Totals:")
+    for kind in sorted({s.kind for s in spans}):
+        of_kind = [s for s in spans if s.kind == kind]
+        lines.append(f"  {kind:<10} {len(of_kind):5d} spans {sum(s.duration for s in of_kind):10.2f}s"
+                     f"  queued {_total(of_kind, 'queue_wait'):.2f}s"
+                     f"  bytes {_total(of_kind, 'bytes_out')}/{_total(of_kind, 'bytes_in')}"
+                     f"  tokens {_total(of_kind, 'input_tokens')}/{_total(of_kind, 'output_tokens')}"
+                     f"  retries {_total(of_kind, 'retries')}")
+    return "\n".join(lines)
+
+def _total(spans: List[Span], key: str) -> float:
+    return sum(s.attributes.get(key, 0) for s in spans)
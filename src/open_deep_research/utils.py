@@ -1,28 +1,65 @@
 import os
+import json
 import asyncio
-import requests
 import random 
 import concurrent
-import aiohttp
 import httpx
 import time
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Sequence, Union
 from urllib.parse import unquote
 
-from exa_py import Exa
-from linkup import LinkupClient
-from tavily import AsyncTavilyClient
-from duckduckgo_search import DDGS 
 from bs4 import BeautifulSoup
 from markdownify import markdownify
 
 from langchain_community.retrievers import ArxivRetriever
 from langchain_community.utilities.pubmed import PubMedAPIWrapper
+from langchain_core.runnables import RunnableConfig, ensure_config
 from langchain_core.tools import tool
 
 from langsmith import traceable
 
-from open_deep_research.state import Section
+from open_deep_research.configuration import Configuration
+from open_deep_research.state import SearchQuery, Section, SectionQueriesBatch
+from open_deep_research.page_store import PageStore, get_page_store, release_page_store
+from open_deep_research.fetching import FetchStats, fetch_concurrently
+from open_deep_research.clients import (
+    aclose_clients,
+    get_aiohttp_session,
+    get_ddgs_client,
+    get_exa_client,
+    get_http_client,
+    get_linkup_client,
+    get_requests_session,
+    get_tavily_client,
+)
+from open_deep_research.search_cache import SearchCache, get_search_cache
+from open_deep_research.query_coalescer import QueryCoalescer, get_query_coalescer
+from open_deep_research.tracing import PROVIDER, add_to_current_span, span
+from open_deep_research.cassettes import cassette_call, cassette_search
+from open_deep_research.profiling import profile_scope
+from open_deep_research.formatting import (
+    NO_RESULTS_MESSAGE,
+    first_sources_by_url,
+    iter_search_result_segments,
+    iter_section_segments,
+    iter_source_segments,
+    render,
+    unique_sources_by_url,
+)
+from open_deep_research.token_budget import (
+    ASCII_CHARS_PER_TOKEN,
+    TokenCounter,
+    estimate_tokens,
+    pack_sources,
+    truncate_to_tokens,
+)
+from open_deep_research.passages import select_passages
+from open_deep_research.rate_limit import (
+    configure_rate_limits,
+    get_rate_limiter,
+    is_rate_limit_error,
+    parse_retry_after,
+)
     
 def get_config_value(value):
     """
@@ -66,6 +103,64 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
     # Filter the config to only include accepted parameters
     return {k: v for k, v in search_api_config.items() if k in accepted_params}
 
+def get_search_cache_from_config(configurable) -> Optional[SearchCache]:
+    """
+    Returns the persistent search cache described by a Configuration, or None when caching is disabled.
+
+    Args:
+        configurable (Configuration): The run configuration
+
+    Returns:
+        Optional[SearchCache]: The shared cache for the configured path
+    """
+    if not configurable.search_cache_path:
+        return None
+    return get_search_cache(
+        configurable.search_cache_path,
+        ttl_seconds=float(configurable.search_cache_ttl),
+        max_entries=int(configurable.search_cache_max_entries),
+    )
+
+def get_current_query_coalescer() -> Optional[QueryCoalescer]:
+    """
+    Returns the query coalescer for the run currently executing, or None when coalescing is disabled.
+
+    Runs are identified by the thread_id of the LangGraph config in context. Without a
+    thread_id, only searches still in flight are shared.
+    """
+    config = ensure_config()
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.query_coalescing_similarity > 1:
+        return None
+    return get_query_coalescer(config.get("configurable", {}).get("thread_id"),
+                               similarity=float(configurable.query_coalescing_similarity))
+
+def get_current_page_store() -> PageStore:
+    """
+    Returns the page store for the run currently executing.
+
+    Runs are identified by the thread_id of the LangGraph config in context. Outside of a
+    run, without a thread_id, or when page_store_scope is "process", the process-wide
+    store is returned so pages are shared across runs.
+    """
+    config = ensure_config()
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.page_store_scope == "process":
+        return get_page_store()
+    return get_page_store(config.get("configurable", {}).get("thread_id"))
+
+def release_current_page_store(config: RunnableConfig) -> None:
+    """
+    Frees the page store of a run that has finished, with the page bodies it holds.
+
+    The process-wide store, used without a thread_id or when page_store_scope is
+    "process", is kept.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if configurable.page_store_scope != "process" and thread_id is not None:
+        release_page_store(thread_id)
+
 def deduplicate_and_format_sources(search_response, max_tokens_per_source=5000, include_raw_content=True):
     """
     Takes a list of search responses and formats them into a readable string.
@@ -86,55 +181,13 @@ def deduplicate_and_format_sources(search_response, max_tokens_per_source=5000,
     Returns:
         str: Formatted string with deduplicated sources
     """
-     # Collect all results
-    sources_list = []
-    for response in search_response:
-        sources_list.extend(response['results'])
-    
-    # Deduplicate by URL
-    unique_sources = {source['url']: source for source in sources_list}
-
-    # Format output
-    formatted_text = "Content from sources:\n"
-    for i, source in enumerate(unique_sources.values(), 1):
-        formatted_text += f"{'='*80}\n"  # Clear section separator
-        formatted_text += f"Source: {source['title']}\n"
-        formatted_text += f"{'-'*80}\n"  # Subsection separator
-        formatted_text += f"URL: {source['url']}\n===\n"
-        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
-        if include_raw_content:
-            # Using rough estimate of 4 characters per token
-            char_limit = max_tokens_per_source * 4
-            # Handle None raw_content
-            raw_content = source.get('raw_content', '')
-            if raw_content is None:
-                raw_content = ''
-                print(f"Warning: No raw_content found for source {source['url']}")
-            if len(raw_content) > char_limit:
-                raw_content = raw_content[:char_limit] + "... [truncated]"
-            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
-        formatted_text += f"{'='*80}\n\n" # End section separator
-                
-    return formatted_text.strip()
+    # Deduplicate by URL, then stream the formatted segments into one string
+    sources = unique_sources_by_url(search_response)
+    return render(iter_source_segments(sources, max_tokens_per_source, include_raw_content)).strip()
 
 def format_sections(sections: list[Section]) -> str:
     """ Format a list of sections into a string """
-    formatted_str = ""
-    for idx, section in enumerate(sections, 1):
-        formatted_str += f"""
-{'='*60}
-Section {idx}: {section.name}
-{'='*60}
-Description:
-{section.description}
-Requires Research: 
-{section.research}
-
-Content:
-{section.content if section.content else '[Not yet written]'}
-
-"""
-    return formatted_str
+    return render(iter_section_segments(sections))
 
 @traceable
 async def tavily_search_async(search_queries, max_results: int = 5, topic: str = "general", include_raw_content: bool = True):
@@ -163,28 +216,78 @@ async def tavily_search_async(search_queries, max_results: int = 5, topic: str =
                     ]
                 }
     """
-    tavily_async_client = AsyncTavilyClient()
-    search_tasks = []
-    for query in search_queries:
-            search_tasks.append(
-                tavily_async_client.search(
-                    query,
-                    max_results=max_results,
-                    include_raw_content=include_raw_content,
-                    topic=topic
-                )
+    tavily_async_client = get_tavily_client()
+    rate_limiter = get_rate_limiter("tavily")
+
+    async def search_single_query(query):
+        await rate_limiter.acquire()
+        try:
+            return await tavily_async_client.search(
+                query,
+                max_results=max_results,
+                include_raw_content=include_raw_content,
+                topic=topic
             )
+        except Exception as e:
+            if is_rate_limit_error(e):
+                rate_limiter.report_rate_limited()
+            raise
+
+    search_tasks = [search_single_query(query) for query in search_queries]
 
     # Execute all searches concurrently
     search_docs = await asyncio.gather(*search_tasks)
     return search_docs
 
+PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
+
+def _format_perplexity_response(query: str, data: dict) -> dict:
+    """Convert a Perplexity chat completion into the Tavily response format."""
+    content = data["choices"][0]["message"]["content"]
+    citations = data.get("citations", ["https://perplexity.ai"])
+    
+    # Create results list for this query
+    results = []
+    
+    # First citation gets the full content
+    results.append({
+        "title": "Perplexity Search, Source 1",
+        "url": citations[0],
+        "content": content,
+        "raw_content": content,
+        "score": 1.0  # Adding score to match Tavily format
+    })
+    
+    # Add additional citations without duplicating content
+    for i, citation in enumerate(citations[1:], start=2):
+        results.append({
+            "title": f"Perplexity Search, Source {i}",
+            "url": citation,
+            "content": "See primary source for full content",
+            "raw_content": None,
+            "score": 0.5  # Lower score for secondary sources
+        })
+    
+    # Format response to match Tavily structure
+    return {
+        "query": query,
+        "follow_up_questions": None,
+        "answer": None,
+        "images": [],
+        "results": results
+    }
+
 @traceable
-def perplexity_search(search_queries):
-    """Search the web using the Perplexity API.
+async def perplexity_search_async(search_queries, timeout: float = 60.0, max_retries: int = 3):
+    """Search the web concurrently using the Perplexity API.
     
+    Queries share the pooled HTTP client and the Perplexity rate limiter. Rate-limited,
+    server-side and network failures are retried with exponential backoff.
+
     Args:
         search_queries (List[SearchQuery]): List of search queries to process
+        timeout (float): Timeout in seconds for each request. Defaults to 60.
+        max_retries (int): Number of retries after the first attempt. Defaults to 3.
   
     Returns:
         List[dict]: List of search responses from Perplexity API, one per query. Each response has format:
@@ -204,6 +307,9 @@ def perplexity_search(search_queries):
                     ...
                 ]
             }
+
+    Raises:
+        httpx.HTTPError: If a query still fails after all retries
     """
 
     headers = {
@@ -211,10 +317,10 @@ def perplexity_search(search_queries):
         "content-type": "application/json",
         "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}"
     }
-    
-    search_docs = []
-    for query in search_queries:
+    client = get_http_client()
+    rate_limiter = get_rate_limiter("perplexity")
 
+    async def search_single_query(query):
         payload = {
             "model": "sonar-pro",
             "messages": [
@@ -228,51 +334,44 @@ def perplexity_search(search_queries):
                 }
             ]
         }
-        
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()  # Raise exception for bad status codes
-        
-        # Parse the response
-        data = response.json()
-        content = data["choices"][0]["message"]["content"]
-        citations = data.get("citations", ["https://perplexity.ai"])
-        
-        # Create results list for this query
-        results = []
-        
-        # First citation gets the full content
-        results.append({
-            "title": f"Perplexity Search, Source 1",
-            "url": citations[0],
-            "content": content,
-            "raw_content": content,
-            "score": 1.0  # Adding score to match Tavily format
-        })
-        
-        # Add additional citations without duplicating content
-        for i, citation in enumerate(citations[1:], start=2):
-            results.append({
-                "title": f"Perplexity Search, Source {i}",
-                "url": citation,
-                "content": "See primary source for full content",
-                "raw_content": None,
-                "score": 0.5  # Lower score for secondary sources
-            })
-        
-        # Format response to match Tavily structure
-        search_docs.append({
-            "query": query,
-            "follow_up_questions": None,
-            "answer": None,
-            "images": [],
-            "results": results
-        })
-    
-    return search_docs
+
+        for attempt in range(max_retries + 1):
+            await rate_limiter.acquire()
+            retry_after = None
+            try:
+                response = await client.post(PERPLEXITY_API_URL, headers=headers, json=payload, timeout=timeout)
+                if response.status_code == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    rate_limiter.report_rate_limited(retry_after)
+                response.raise_for_status()  # Raise exception for bad status codes
+                return _format_perplexity_response(query, response.json())
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) or e.response.status_code == 429 or e.response.status_code >= 500
+                if not retryable or attempt == max_retries:
+                    raise
+                delay = retry_after if retry_after is not None else 2 ** attempt + random.random()
+                print(f"Perplexity request for '{query}' failed ({str(e) or type(e).__name__}), retrying in {delay:.2f}s")
+                add_to_current_span("retries", 1)
+                await asyncio.sleep(delay)
+
+    return list(await asyncio.gather(*[search_single_query(query) for query in search_queries]))
+
+def perplexity_search(search_queries):
+    """Synchronous wrapper around perplexity_search_async for use outside an event loop.
+
+    Args:
+        search_queries (List[SearchQuery]): List of search queries to process
+
+    Returns:
+        List[dict]: List of search responses from Perplexity API, one per query
+    """
+    async def run():
+        try:
+            return await perplexity_search_async(search_queries)
+        finally:
+            await aclose_clients()
+
+    return asyncio.run(run())
 
 @traceable
 async def exa_search(search_queries, max_characters: Optional[int] = None, num_results=5, 
@@ -315,8 +414,8 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
     if include_domains and exclude_domains:
         raise ValueError("Cannot specify both include_domains and exclude_domains")
     
-    # Initialize Exa client (API key should be configured in your .env file)
-    exa = Exa(api_key = f"{os.getenv('EXA_API_KEY')}")
+    # Shared Exa client (API key should be configured in your .env file)
+    exa = get_exa_client()
     
     # Define the function to process a single query
     async def process_query(query):
@@ -447,35 +546,32 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
             "results": formatted_results
         }
     
-    # Process all queries sequentially with delay to respect rate limit
-    search_docs = []
-    for i, query in enumerate(search_queries):
+    rate_limiter = get_rate_limiter("exa")
+
+    async def process_query_with_rate_limit(query):
+        # Wait for a token from the shared Exa bucket (the limit is 5 requests per second)
+        await rate_limiter.acquire()
         try:
-            # Add delay between requests (0.25s = 4 requests per second, well within the 5/s limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(0.25)
-            
-            result = await process_query(query)
-            search_docs.append(result)
+            return await process_query(query)
         except Exception as e:
             # Handle exceptions gracefully
             print(f"Error processing query '{query}': {str(e)}")
+            if is_rate_limit_error(e):
+                print("Rate limit exceeded. Backing off...")
+                rate_limiter.report_rate_limited()
             # Add a placeholder result for failed queries to maintain index alignment
-            search_docs.append({
+            return {
                 "query": query,
                 "follow_up_questions": None,
                 "answer": None,
                 "images": [],
                 "results": [],
                 "error": str(e)
-            })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e):
-                print("Rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(1.0)  # Add a longer delay if we hit a rate limit
-    
-    return search_docs
+            }
+
+    # Process all queries concurrently, paced by the rate limiter
+    search_docs = await asyncio.gather(*[process_query_with_rate_limit(query) for query in search_queries])
+    return list(search_docs)
 
 @traceable
 async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents=True, load_all_available_meta=True):
@@ -605,34 +701,20 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
                 'error': str(e)
             }
     
-    # Process queries sequentially with delay to respect arXiv rate limit (1 request per 3 seconds)
-    search_docs = []
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests (3 seconds per ArXiv's rate limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(3.0)
-            
-            result = await process_single_query(query)
-            search_docs.append(result)
-        except Exception as e:
-            # Handle exceptions gracefully
-            print(f"Error processing arXiv query '{query}': {str(e)}")
-            search_docs.append({
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e) or "Too Many Requests" in str(e):
-                print("ArXiv rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(5.0)  # Add a longer delay if we hit a rate limit
-    
-    return search_docs
+    rate_limiter = get_rate_limiter("arxiv")
+
+    async def process_query_with_rate_limit(query):
+        # Wait for a token from the shared arXiv bucket (1 request per 3 seconds)
+        await rate_limiter.acquire()
+        result = await process_single_query(query)
+        if result.get('error') and is_rate_limit_error(result['error']):
+            print("ArXiv rate limit exceeded. Backing off...")
+            rate_limiter.report_rate_limited()
+        return result
+
+    # Process queries concurrently, paced by the rate limiter
+    search_docs = await asyncio.gather(*[process_query_with_rate_limit(query) for query in search_queries])
+    return list(search_docs)
 
 @traceable
 async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_key=None, doc_content_chars_max=4000):
@@ -743,44 +825,19 @@ async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_k
                 'error': str(e)
             }
     
-    # Process all queries with a reasonable delay between them
-    search_docs = []
-    
-    # Start with a small delay that increases if we encounter rate limiting
-    delay = 1.0  # Start with a more conservative delay
-    
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests
-            if i > 0:  # Don't delay the first request
-                # print(f"Waiting {delay} seconds before next query...")
-                await asyncio.sleep(delay)
-            
-            result = await process_single_query(query)
-            search_docs.append(result)
-            
-            # If query was successful with results, we can slightly reduce delay (but not below minimum)
-            if result.get('results') and len(result['results']) > 0:
-                delay = max(0.5, delay * 0.9)  # Don't go below 0.5 seconds
-            
-        except Exception as e:
-            # Handle exceptions gracefully
-            error_msg = f"Error in main loop processing PubMed query '{query}': {str(e)}"
-            print(error_msg)
-            
-            search_docs.append({
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            })
-            
-            # If we hit an exception, increase delay for next query
-            delay = min(5.0, delay * 1.5)  # Don't exceed 5 seconds
-    
-    return search_docs
+    rate_limiter = get_rate_limiter("pubmed")
+
+    async def process_query_with_rate_limit(query):
+        # Wait for a token from the shared PubMed bucket; it slows down by itself on rate-limit errors
+        await rate_limiter.acquire()
+        result = await process_single_query(query)
+        if result.get('error') and is_rate_limit_error(result['error']):
+            rate_limiter.report_rate_limited()
+        return result
+
+    # Process queries concurrently, paced by the rate limiter
+    search_docs = await asyncio.gather(*[process_query_with_rate_limit(query) for query in search_queries])
+    return list(search_docs)
 
 @traceable
 async def linkup_search(search_queries, depth: Optional[str] = "standard"):
@@ -804,16 +861,23 @@ async def linkup_search(search_queries, depth: Optional[str] = "standard"):
                 ]
             }
     """
-    client = LinkupClient()
-    search_tasks = []
-    for query in search_queries:
-        search_tasks.append(
-                client.async_search(
-                    query,
-                    depth,
-                    output_type="searchResults",
-                )
+    client = get_linkup_client()
+    rate_limiter = get_rate_limiter("linkup")
+
+    async def search_single_query(query):
+        await rate_limiter.acquire()
+        try:
+            return await client.async_search(
+                query,
+                depth,
+                output_type="searchResults",
             )
+        except Exception as e:
+            if is_rate_limit_error(e):
+                rate_limiter.report_rate_limited()
+            raise
+
+    search_tasks = [search_single_query(query) for query in search_queries]
 
     search_results = []
     for response in await asyncio.gather(*search_tasks):
@@ -867,6 +931,10 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
     
     # Use a semaphore to limit concurrent requests
     semaphore = asyncio.Semaphore(5 if use_api else 2)
+
+    # Shared token buckets pace requests across all concurrently running searches
+    api_rate_limiter = get_rate_limiter("googlesearch")
+    scrape_rate_limiter = get_rate_limiter("googlesearch_scrape")
     
     async def search_single_query(query):
         async with semaphore:
@@ -890,28 +958,28 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                         }
                         print(f"Requesting {num} results for '{query}' from Google API...")
 
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
-                                if response.status != 200:
-                                    error_text = await response.text()
-                                    print(f"API error: {response.status}, {error_text}")
-                                    break
-                                    
-                                data = await response.json()
+                        await api_rate_limiter.acquire()
+                        session = get_aiohttp_session()
+                        async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
+                            if response.status != 200:
+                                error_text = await response.text()
+                                print(f"API error: {response.status}, {error_text}")
+                                if response.status == 429:
+                                    api_rate_limiter.report_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
+                                break
                                 
-                                # Process search results
-                                for item in data.get('items', []):
-                                    result = {
-                                        "title": item.get('title', ''),
-                                        "url": item.get('link', ''),
-                                        "content": item.get('snippet', ''),
-                                        "score": None,
-                                        "raw_content": item.get('snippet', '')
-                                    }
-                                    results.append(result)
-                        
-                        # Respect API quota with a small delay
-                        await asyncio.sleep(0.2)
+                            data = await response.json()
+                            
+                            # Process search results
+                            for item in data.get('items', []):
+                                result = {
+                                    "title": item.get('title', ''),
+                                    "url": item.get('link', ''),
+                                    "content": item.get('snippet', ''),
+                                    "score": None,
+                                    "raw_content": item.get('snippet', '')
+                                }
+                                results.append(result)
                         
                         # If we didn't get a full page of results, no need to request more
                         if not data.get('items') or len(data.get('items', [])) < num:
@@ -919,8 +987,8 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                 
                 # Web scraping based search
                 else:
-                    # Add delay between requests
-                    await asyncio.sleep(0.5 + random.random() * 1.5)
+                    # Wait for the shared scraping budget
+                    await scrape_rate_limiter.acquire()
                     print(f"Scraping Google for '{query}'...")
 
                     # Define scraping function
@@ -935,7 +1003,7 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                             
                             while fetched_results < max_results:
                                 # Send request to Google
-                                resp = requests.get(
+                                resp = get_requests_session().get(
                                     url="https://www.google.com/search",
                                     headers={
                                         "User-Agent": get_useragent(),
@@ -953,6 +1021,8 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                                         'SOCS': 'CAESHAgBEhIaAB',
                                     }
                                 )
+                                if resp.status_code == 429:
+                                    scrape_rate_limiter.report_rate_limited(parse_retry_after(resp.headers.get('Retry-After')))
                                 resp.raise_for_status()
                                 
                                 # Parse results
@@ -994,7 +1064,7 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                                     break
                                     
                                 start += 10
-                                time.sleep(1)  # Delay between pages
+                                scrape_rate_limiter.acquire_sync()  # Pace follow-up pages with the shared budget
                             
                             return search_results
                                 
@@ -1015,49 +1085,57 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                 # If requested, fetch full page content asynchronously (for both API and web scraping)
                 if include_raw_content and results:
                     content_semaphore = asyncio.Semaphore(3)
+                    page_store = get_current_page_store()
                     
-                    async with aiohttp.ClientSession() as session:
-                        fetch_tasks = []
-                        
-                        async def fetch_full_content(result):
-                            async with content_semaphore:
-                                url = result['url']
-                                headers = {
-                                    'User-Agent': get_useragent(),
-                                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-                                }
+                    session = get_aiohttp_session()
+                    fetch_tasks = []
+                    
+                    async def fetch_page_text(url):
+                        """Download a page and extract its text; None keeps the search snippet."""
+                        async with content_semaphore:
+                            headers = {
+                                'User-Agent': get_useragent(),
+                                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+                            }
+                            
+                            await asyncio.sleep(0.2 + random.random() * 0.6)
+                            async with session.get(url, headers=headers, timeout=10) as response:
+                                if response.status != 200:
+                                    return None
+                                # Check content type to handle binary files
+                                content_type = response.headers.get('Content-Type', '').lower()
                                 
+                                # Handle PDFs and other binary files
+                                if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
+                                    # For PDFs, indicate that content is binary and not parsed
+                                    return f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
                                 try:
-                                    await asyncio.sleep(0.2 + random.random() * 0.6)
-                                    async with session.get(url, headers=headers, timeout=10) as response:
-                                        if response.status == 200:
-                                            # Check content type to handle binary files
-                                            content_type = response.headers.get('Content-Type', '').lower()
-                                            
-                                            # Handle PDFs and other binary files
-                                            if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
-                                                # For PDFs, indicate that content is binary and not parsed
-                                                result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
-                                            else:
-                                                try:
-                                                    # Try to decode as UTF-8 with replacements for non-UTF8 characters
-                                                    html = await response.text(errors='replace')
-                                                    soup = BeautifulSoup(html, 'html.parser')
-                                                    result['raw_content'] = soup.get_text()
-                                                except UnicodeDecodeError as ude:
-                                                    # Fallback if we still have decoding issues
-                                                    result['raw_content'] = f"[Could not decode content: {str(ude)}]"
-                                except Exception as e:
-                                    print(f"Warning: Failed to fetch content for {url}: {str(e)}")
-                                    result['raw_content'] = f"[Error fetching content: {str(e)}]"
-                                return result
-                        
-                        for result in results:
-                            fetch_tasks.append(fetch_full_content(result))
-                        
-                        updated_results = await asyncio.gather(*fetch_tasks)
-                        results = updated_results
-                        print(f"Fetched full content for {len(results)} results")
+                                    # Try to decode as UTF-8 with replacements for non-UTF8 characters
+                                    html = await response.text(errors='replace')
+                                    soup = BeautifulSoup(html, 'html.parser')
+                                    return soup.get_text()
+                                except UnicodeDecodeError as ude:
+                                    # Fallback if we still have decoding issues
+                                    return f"[Could not decode content: {str(ude)}]"
+                    
+                    async def fetch_full_content(result):
+                        url = result['url']
+                        try:
+                            # The page store skips pages this run has already downloaded and parsed
+                            content = await page_store.get_or_fetch(url, lambda: fetch_page_text(url), kind="text")
+                            if content is not None:
+                                result['raw_content'] = content
+                        except Exception as e:
+                            print(f"Warning: Failed to fetch content for {url}: {str(e)}")
+                            result['raw_content'] = f"[Error fetching content: {str(e)}]"
+                        return result
+                    
+                    for result in results:
+                        fetch_tasks.append(fetch_full_content(result))
+                    
+                    updated_results = await asyncio.gather(*fetch_tasks)
+                    results = updated_results
+                    print(f"Fetched full content for {len(results)} results")
                 
                 return {
                     "query": query,
@@ -1089,6 +1167,86 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
         if executor:
             executor.shutdown(wait=False)
 
+async def _fetch_page_markdown(client: httpx.AsyncClient, url: str) -> str:
+    """Fetch a single URL and convert the HTML to markdown, raising on HTTP errors."""
+    # Fetch the content
+    response = await client.get(url)
+    response.raise_for_status()
+    
+    # Convert HTML to markdown if successful
+    if response.status_code == 200:
+        # Handle different content types
+        content_type = response.headers.get('Content-Type', '')
+        if 'text/html' in content_type:
+            # Convert HTML to markdown
+            return markdownify(response.text)
+        else:
+            # For non-HTML content, just mention the content type
+            return f"Content type: {content_type} (not converted to markdown)"
+    else:
+        return f"Error: Received status code {response.status_code}"
+
+async def fetch_page_contents(urls: List[str], stats: Optional[FetchStats] = None) -> List[str]:
+    """
+    Fetches a list of URLs concurrently and converts each HTML page to markdown.
+
+    Fetches run under a global and a per-host concurrency cap with per-request and
+    overall deadlines taken from the run configuration. Pages already fetched in the
+    current run are served from the run's page store, and concurrent requests for the
+    same page share one download.
+
+    Args:
+        urls (List[str]): A list of URLs to fetch
+        stats (FetchStats, optional): Collector that receives the timing of every fetch
+
+    Returns:
+        List[str]: One entry per URL, in input order, with the page markdown, or a short
+            note describing the content type or the error encountered
+    """
+    configurable = Configuration.from_runnable_config(ensure_config())
+    page_store = get_current_page_store()
+
+    # Shared keep-alive HTTP client
+    client = get_http_client()
+
+    # Fetch the URLs and convert each to markdown
+    with span("fetch_pages", PROVIDER, urls=len(urls)) as current, profile_scope("fetch_pages", span=current):
+        results, fetch_stats = await fetch_concurrently(
+            urls,
+            lambda url: page_store.get_or_fetch(
+                url, lambda: cassette_call("page", {"url": url}, lambda: _fetch_page_markdown(client, url))),
+            max_concurrency=int(configurable.scrape_max_concurrency),
+            per_host_limit=int(configurable.scrape_per_host_limit),
+            request_timeout=float(configurable.scrape_request_timeout),
+            total_timeout=float(configurable.scrape_total_timeout),
+        )
+        if current is not None:
+            current.set(bytes_in=sum(len(result.encode("utf-8")) for result in results if isinstance(result, str)),
+                        failures=sum(1 for result in results if isinstance(result, Exception)))
+
+    if stats is not None:
+        stats.records.extend(fetch_stats.records)
+        stats.wall_time += fetch_stats.wall_time
+
+    # Handle any exceptions during fetch
+    return [f"Error fetching URL: {str(result) or type(result).__name__}" if isinstance(result, Exception) else result
+            for result in results]
+
+def format_scraped_pages(titles: List[str], urls: List[str], pages: List[str]) -> str:
+    """
+    Formats scraped page contents with clear section dividers and source attribution.
+
+    Args:
+        titles (List[str]): Page titles corresponding to each URL
+        urls (List[str]): The scraped URLs
+        pages (List[str]): Page contents in markdown, aligned with urls
+
+    Returns:
+        str: A formatted string containing the full content of each page
+    """
+    entries = ({"title": title, "url": url, "raw_content": page} for title, url, page in zip(titles, urls, pages))
+    return render(iter_search_result_segments(entries, include_summary=False))
+
 async def scrape_pages(titles: List[str], urls: List[str]) -> str:
     """
     Scrapes content from a list of URLs and formats it into a readable markdown document.
@@ -1107,63 +1265,28 @@ async def scrape_pages(titles: List[str], urls: List[str]) -> str:
         str: A formatted string containing the full content of each page in markdown format,
              with clear section dividers and source attribution
     """
-    
-    # Create an async HTTP client
-    async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-        pages = []
-        
-        # Fetch each URL and convert to markdown
-        for url in urls:
-            try:
-                # Fetch the content
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # Convert HTML to markdown if successful
-                if response.status_code == 200:
-                    # Handle different content types
-                    content_type = response.headers.get('Content-Type', '')
-                    if 'text/html' in content_type:
-                        # Convert HTML to markdown
-                        markdown_content = markdownify(response.text)
-                        pages.append(markdown_content)
-                    else:
-                        # For non-HTML content, just mention the content type
-                        pages.append(f"Content type: {content_type} (not converted to markdown)")
-                else:
-                    pages.append(f"Error: Received status code {response.status_code}")
-        
-            except Exception as e:
-                # Handle any exceptions during fetch
-                pages.append(f"Error fetching URL: {str(e)}")
-        
-        # Create formatted output 
-        formatted_output = f"Search results: \n\n"
-        
-        for i, (title, url, page) in enumerate(zip(titles, urls, pages)):
-            formatted_output += f"\n\n--- SOURCE {i+1}: {title} ---\n"
-            formatted_output += f"URL: {url}\n\n"
-            formatted_output += f"FULL CONTENT:\n {page}"
-            formatted_output += "\n\n" + "-" * 80 + "\n"
-        
-    return  formatted_output
+    pages = await fetch_page_contents(urls)
+    return format_scraped_pages(titles, urls, pages)
+
+@traceable
+async def duckduckgo_search_async(search_queries: List[str]):
+    """
+    Performs DuckDuckGo searches with retry logic to handle rate limits.
 
-@tool
-async def duckduckgo_search(search_queries: List[str]):
-    """Perform searches using DuckDuckGo with retry logic to handle rate limits
-    
     Args:
         search_queries (List[str]): List of search queries to process
-        
+
     Returns:
-        List[dict]: List of search results
+        List[dict]: List of search responses, one per query, in the Tavily response format
     """
     
     async def process_single_query(query):
         # Execute synchronous search in the event loop's thread pool
         loop = asyncio.get_event_loop()
+        retries = 0
         
         def perform_search():
+            nonlocal retries
             max_retries = 3
             retry_count = 0
             backoff_factor = 2.0
@@ -1172,46 +1295,50 @@ async def duckduckgo_search(search_queries: List[str]):
             while retry_count <= max_retries:
                 try:
                     results = []
-                    with DDGS() as ddgs:
-                        # Change query slightly and add delay between retries
-                        if retry_count > 0:
-                            # Random delay with exponential backoff
-                            delay = backoff_factor ** retry_count + random.random()
-                            print(f"Retry {retry_count}/{max_retries} for query '{query}' after {delay:.2f}s delay")
-                            time.sleep(delay)
-                            
-                            # Add a random element to the query to bypass caching/rate limits
-                            modifiers = ['about', 'info', 'guide', 'overview', 'details', 'explained']
-                            modified_query = f"{query} {random.choice(modifiers)}"
-                        else:
-                            modified_query = query
-                        
-                        # Execute search
-                        ddg_results = list(ddgs.text(modified_query, max_results=5))
-                        
-                        # Format results
-                        for i, result in enumerate(ddg_results):
-                            results.append({
-                                'title': result.get('title', ''),
-                                'url': result.get('href', ''),
-                                'content': result.get('body', ''),
-                                'score': 1.0 - (i * 0.1),  # Simple scoring mechanism
-                                'raw_content': result.get('body', '')
-                            })
+                    ddgs = get_ddgs_client()
+                    # Change query slightly and add delay between retries
+                    if retry_count > 0:
+                        # Random delay with exponential backoff
+                        delay = backoff_factor ** retry_count + random.random()
+                        print(f"Retry {retry_count}/{max_retries} for query '{query}' after {delay:.2f}s delay")
+                        time.sleep(delay)
                         
-                        # Return successful results
-                        return {
-                            'query': query,
-                            'follow_up_questions': None,
-                            'answer': None,
-                            'images': [],
-                            'results': results
-                        }
+                        # Add a random element to the query to bypass caching/rate limits
+                        modifiers = ['about', 'info', 'guide', 'overview', 'details', 'explained']
+                        modified_query = f"{query} {random.choice(modifiers)}"
+                    else:
+                        modified_query = query
+                    
+                    # Execute search
+                    ddg_results = list(ddgs.text(modified_query, max_results=5))
+                    
+                    # Format results
+                    for i, result in enumerate(ddg_results):
+                        results.append({
+                            'title': result.get('title', ''),
+                            'url': result.get('href', ''),
+                            'content': result.get('body', ''),
+                            'score': 1.0 - (i * 0.1),  # Simple scoring mechanism
+                            'raw_content': result.get('body', '')
+                        })
+                    
+                    # Return successful results
+                    return {
+                        'query': query,
+                        'follow_up_questions': None,
+                        'answer': None,
+                        'images': [],
+                        'results': results
+                    }
                 except Exception as e:
                     # Store the exception and retry
                     last_exception = e
                     retry_count += 1
+                    retries += 1
                     print(f"DuckDuckGo search error: {str(e)}. Retrying {retry_count}/{max_retries}")
+                    if is_rate_limit_error(e):
+                        # Slow down every other DuckDuckGo search as well
+                        rate_limiter.report_rate_limited()
                     
                     # If not a rate limit error, don't retry
                     if "Ratelimit" not in str(e) and retry_count >= 1:
@@ -1230,35 +1357,72 @@ async def duckduckgo_search(search_queries: List[str]):
                 'error': str(last_exception)
             }
             
-        return await loop.run_in_executor(None, perform_search)
+        try:
+            return await loop.run_in_executor(None, perform_search)
+        finally:
+            # The executor thread does not see the current span, so retries are added here
+            add_to_current_span("retries", retries)
+
+    rate_limiter = get_rate_limiter("duckduckgo")
 
-    # Process queries with delay between them to reduce rate limiting
-    search_docs = []
+    async def process_query_with_rate_limit(query):
+        # Wait for a token from the shared DuckDuckGo bucket to reduce rate limiting
+        await rate_limiter.acquire()
+        return await process_single_query(query)
+
+    # Process queries concurrently, paced by the rate limiter
+    search_docs = await asyncio.gather(*[process_query_with_rate_limit(query) for query in search_queries])
+    return list(search_docs)
+
+def _collect_titles_and_urls(search_docs):
+    """Safely extract URLs and titles from search responses, handling empty result cases"""
     urls = []
     titles = []
-    for i, query in enumerate(search_queries):
-        # Add delay between queries (except first one)
-        if i > 0:
-            delay = 2.0 + random.random() * 2.0  # Random delay 2-4 seconds
-            await asyncio.sleep(delay)
-        
-        # Process the query
-        result = await process_single_query(query)
-        search_docs.append(result)
-        
-        # Safely extract URLs and titles from results, handling empty result cases
+    for result in search_docs:
         if result['results'] and len(result['results']) > 0:
             for res in result['results']:
                 if 'url' in res and 'title' in res:
                     urls.append(res['url'])
                     titles.append(res['title'])
+    return titles, urls
+
+@tool
+async def duckduckgo_search(search_queries: List[str]):
+    """Perform searches using DuckDuckGo with retry logic to handle rate limits
+    
+    Args:
+        search_queries (List[str]): List of search queries to process
+        
+    Returns:
+        List[dict]: List of search results
+    """
+    search_docs = await traced_search_provider("duckduckgo", search_queries, {})
+    titles, urls = _collect_titles_and_urls(search_docs)
     
     # If we got any valid URLs, scrape the pages
     if urls:
         return await scrape_pages(titles, urls)
     else:
         # Return a formatted error message if no valid URLs were found
-        return "No valid search results found. Please try different search queries or use a different search API."
+        return NO_RESULTS_MESSAGE
+
+def format_tavily_results(search_results) -> str:
+    """
+    Formats Tavily search responses, deduplicated by URL, into a readable string.
+
+    Args:
+        search_results (List[dict]): Search responses as returned by tavily_search_async
+
+    Returns:
+        str: A formatted string of search results
+    """
+    # Deduplicate results by URL
+    unique_results = first_sources_by_url(search_results)
+    if not unique_results:
+        return NO_RESULTS_MESSAGE
+
+    # Format the search results directly using the raw_content already provided, limiting content size
+    return render(iter_search_result_segments(unique_results, include_summary=True, char_limit=30000))
 
 @tool
 async def tavily_search(queries: List[str]) -> str:
@@ -1272,45 +1436,245 @@ async def tavily_search(queries: List[str]) -> str:
         str: A formatted string of search results
     """
     # Use tavily_search_async with include_raw_content=True to get content directly
-    search_results = await tavily_search_async(
-        queries,
-        max_results=5,
-        topic="general",
-        include_raw_content=True
-    )
+    search_results = await traced_search_provider(
+        "tavily", queries, {"max_results": 5, "topic": "general", "include_raw_content": True})
 
-    # Format the search results directly using the raw_content already provided
-    formatted_output = f"Search results: \n\n"
-    
-    # Deduplicate results by URL
-    unique_results = {}
-    for response in search_results:
-        for result in response['results']:
-            url = result['url']
-            if url not in unique_results:
-                unique_results[url] = result
-    
-    # Format the unique results
-    for i, (url, result) in enumerate(unique_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:30000]}"  # Limit content size
-        formatted_output += "\n\n" + "-" * 80 + "\n"
-    
-    if unique_results:
-        return formatted_output
+    # Keep the passages relevant to the queries rather than the head of each page
+    search_results = select_passages(search_results, queries,
+                                     max_tokens_per_source=RAW_CHAR_LIMITS["tavily"] // ASCII_CHARS_PER_TOKEN)
+    return format_tavily_results(search_results)
+
+async def run_search_provider(search_api: str, query_list: list[str], params_to_pass: dict) -> list[dict]:
+    """Call the provider for search_api and return one search response per query, in order.
+
+    Raises:
+        ValueError: If the search API is not supported
+    """
+    if search_api == "tavily":
+        return await tavily_search_async(query_list, **params_to_pass)
+    elif search_api == "duckduckgo":
+        return await duckduckgo_search_async(query_list)
+    elif search_api == "perplexity":
+        return await perplexity_search_async(query_list, **params_to_pass)
+    elif search_api == "exa":
+        return await exa_search(query_list, **params_to_pass)
+    elif search_api == "arxiv":
+        return await arxiv_search_async(query_list, **params_to_pass)
+    elif search_api == "pubmed":
+        return await pubmed_search_async(query_list, **params_to_pass)
+    elif search_api == "linkup":
+        return await linkup_search(query_list, **params_to_pass)
+    elif search_api == "googlesearch":
+        return await google_search_async(query_list, **params_to_pass)
     else:
-        return "No valid search results found. Please try different search queries or use a different search API."
+        raise ValueError(f"Unsupported search API: {search_api}")
+
+async def traced_search_provider(search_api: str, query_list: list[str], params_to_pass: dict) -> list[dict]:
+    """Call run_search_provider, through the run's cassette if any, inside a provider span recording the query count and payload sizes, profiled when selected."""
+    with span(f"search:{search_api}", PROVIDER, queries=len(query_list)) as current, \
+            profile_scope(f"search:{search_api}", span=current):
+        if current is not None:
+            current.set(bytes_out=len(json.dumps({"queries": query_list, "params": params_to_pass}, default=str).encode("utf-8")))
+        responses = await cassette_search(search_api, query_list, params_to_pass,
+                                          lambda queries: run_search_provider(search_api, queries, params_to_pass))
+        if current is not None:
+            current.set(bytes_in=len(json.dumps(responses, default=str).encode("utf-8")),
+                        errors=sum(1 for response in responses if response.get("error")))
+        return responses
+
+async def execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                         cache: Optional[SearchCache] = None, bypass_cache: bool = False,
+                         skip_urls: Optional[set] = None) -> list[dict]:
+    """执行检索并返回原始搜索结果，重复的查询优先从缓存读取。
+
+    未命中缓存的查询交给本次运行的查询合并器：与其他章节已检索或正在检索的查询近似重复的查询
+    不再单独检索，直接共享那次检索的结果。
+
+    参数:
+        search_api: 要使用的搜索 API 名称
+        query_list: 要执行的搜索查询列表
+        params_to_pass: 传递给搜索 API 的参数
+        cache: 可选的持久化搜索缓存
+        bypass_cache: 为 True 时跳过缓存读取，但仍写入最新结果
+        skip_urls: 已经拥有的 URL，这些结果会被丢弃且不再抓取
+
+    返回:
+        与 query_list 顺序一致的搜索结果列表；DuckDuckGo 结果的 raw_content 为抓取后的页面内容
+    """
+    # Per-provider rate limits from the run configuration, if any
+    configure_rate_limits(Configuration.from_runnable_config(ensure_config()).search_rate_limits)
+
+    responses: Dict[str, dict] = {}
+    if cache is not None and not bypass_cache:
+        for query in query_list:
+            cached = cache.get(search_api, query, params_to_pass)
+            if cached is not None:
+                responses[query] = cached
+
+    # Only the queries we have not seen go to the provider, near-duplicates of other sections' queries only once
+    pending = [query for query in dict.fromkeys(query_list) if query not in responses]
+    if pending:
+        coalescer = get_current_query_coalescer()
+        if coalescer is not None:
+            fetched, searched = await coalescer.search(search_api, pending, params_to_pass,
+                                                       lambda queries: traced_search_provider(search_api, queries, params_to_pass))
+        else:
+            fetched = await traced_search_provider(search_api, pending, params_to_pass)
+            searched = pending
+        searched = set(searched)
+        for query, response in zip(pending, fetched):
+            responses[query] = response
+            # Never persist failed lookups, nor a near-duplicate's response under this query's key
+            if cache is not None and query in searched and not response.get("error"):
+                cache.set(search_api, query, params_to_pass, response)
+
+    search_docs = [responses[query] for query in query_list if query in responses]
+
+    if skip_urls:
+        search_docs = [{**response, 'results': [result for result in response.get('results') or []
+                                                if result.get('url') not in skip_urls]}
+                       for response in search_docs]
+
+    if search_api == "duckduckgo":
+        # DuckDuckGo only returns snippets, so fetch the pages themselves
+        titles, urls = _collect_titles_and_urls(search_docs)
+        pages = iter(await fetch_page_contents(urls))
+        scraped_docs = []
+        for response in search_docs:
+            results = []
+            for result in response['results']:
+                if 'url' in result and 'title' in result:
+                    result = {**result, 'raw_content': next(pages)}
+                results.append(result)
+            scraped_docs.append({**response, 'results': results})
+        search_docs = scraped_docs
+
+    return search_docs
+
+def format_sections_for_queries(sections: list[Section]) -> str:
+    """ Format the name and description of sections for the batch query writer """
+    return "\n\n".join(f"章节名称: {section.name}\n章节主题: {section.description}" for section in sections)
+
+def match_batch_queries(batch: Any, sections: list[Section], number_of_queries: int) -> Dict[str, List[SearchQuery]]:
+    """将批量生成的检索查询按章节名称对应到各章节，并逐章节校验。
 
-async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict) -> str:
+    参数:
+        batch: 批量查询生成的结构化输出，期望为 SectionQueriesBatch
+        sections: 需要检索的章节
+        number_of_queries: 每个章节最多保留的查询数量
+
+    返回:
+        章节名称到查询列表的字典；输出缺失、名称无法对应或没有有效查询的章节不在其中，
+        由这些章节自己的 generate_queries 重新生成
+    """
+    if not isinstance(batch, SectionQueriesBatch):
+        return {}
+
+    def key(name: str) -> str:
+        return " ".join(str(name).split()).casefold()
+
+    wanted = {key(section.name): section.name for section in sections}
+    matched: Dict[str, List[SearchQuery]] = {}
+    for entry in batch.sections:
+        name = wanted.get(key(entry.section_name))
+        if name is None or name in matched:
+            continue
+        queries, seen = [], set()
+        for query in entry.queries:
+            text = (query.search_query or "").strip()
+            if text and text.casefold() not in seen:
+                seen.add(text.casefold())
+                queries.append(SearchQuery(search_query=text))
+        if queries:
+            matched[name] = queries[:number_of_queries]
+    return matched
+
+def merge_search_docs(existing: list[dict], new: list[dict]) -> list[dict]:
+    """将新的搜索结果并入已有结果，按 URL 去重，只追加之前没有出现过的来源。
+
+    参数:
+        existing: 之前迭代累积的搜索结果
+        new: 本次迭代的搜索结果
+
+    返回:
+        合并后的搜索结果列表；没有新来源的响应不会被追加
+    """
+    seen = {result['url'] for response in existing for result in response.get('results') or [] if 'url' in result}
+    merged = list(existing)
+    for response in new:
+        results = []
+        for result in response.get('results') or []:
+            url = result.get('url')
+            if url is not None and url in seen:
+                continue
+            if url is not None:
+                seen.add(url)
+            results.append(result)
+        if results:
+            merged.append({**response, 'results': results})
+    return merged
+
+# Characters of raw_content each formatter keeps per source
+RAW_CHAR_LIMITS = {"tavily": 30000, "duckduckgo": None}
+DEFAULT_RAW_CHAR_LIMIT = 4000 * 4
+
+def format_search_docs(search_api: str, search_docs: list[dict], token_budget: Optional[int] = None,
+                       token_counter: Optional[TokenCounter] = None,
+                       queries: Optional[Sequence[str]] = None, passage_chars: int = 600) -> str:
+    """将 execute_search 返回的搜索结果格式化为提示词上下文字符串。
+
+    参数:
+        search_api: 搜索 API 名称
+        search_docs: execute_search 返回的搜索结果
+        token_budget: 可选的 token 上限；给定时按相关度分数贪心挑选来源，保证结果不超出预算
+        token_counter: 计算 token 数的函数，默认使用 CJK 感知的估算器
+        queries: 可选的检索查询；给定时用 BM25 从 raw_content 中挑选与查询最相关的段落，代替截取开头
+        passage_chars: 段落切分的目标长度（字符数）
+    """
+    count = token_counter or estimate_tokens
+    if queries:
+        raw_char_limit = RAW_CHAR_LIMITS.get(search_api, DEFAULT_RAW_CHAR_LIMIT)
+        search_docs = select_passages(
+            search_docs, queries, token_budget=token_budget, count=count,
+            max_tokens_per_source=raw_char_limit // ASCII_CHARS_PER_TOKEN if raw_char_limit else None,
+            passage_chars=passage_chars,
+        )
+
+    if token_budget is not None:
+        sources = pack_sources(search_docs, token_budget, count,
+                               raw_char_limit=RAW_CHAR_LIMITS.get(search_api, DEFAULT_RAW_CHAR_LIMIT))
+        formatted = format_search_docs(search_api, [{"query": "", "results": sources}])
+        # Separators and labels are only estimated during packing, so enforce the budget on the final text
+        return truncate_to_tokens(formatted, token_budget, count)
+
+    if search_api == "tavily":
+        return format_tavily_results(search_docs)
+    elif search_api == "duckduckgo":
+        titles, urls = _collect_titles_and_urls(search_docs)
+        if not urls:
+            return NO_RESULTS_MESSAGE
+        pages = [result['raw_content'] for response in search_docs for result in response['results']
+                 if 'url' in result and 'title' in result]
+        return format_scraped_pages(titles, urls, pages)
+    else:
+        return deduplicate_and_format_sources(search_docs, max_tokens_per_source=4000)
+
+async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                                    cache: Optional[SearchCache] = None, bypass_cache: bool = False,
+                                    token_budget: Optional[int] = None,
+                                    token_counter: Optional[TokenCounter] = None,
+                                    passage_chars: int = 600) -> str:
     """选择并执行合适的搜索 API。
     
     参数:
         search_api: 要使用的搜索 API 名称
         query_list: 要执行的搜索查询列表
         params_to_pass: 传递给搜索 API 的参数
+        cache: 可选的持久化搜索缓存，按 API + 规范化查询 + 参数命中
+        bypass_cache: 为 True 时本次运行跳过缓存读取
+        token_budget: 可选的检索资料 token 上限，见 format_search_docs
+        token_counter: 计算 token 数的函数
+        passage_chars: 按查询挑选相关段落时的段落长度（字符数）
         
     返回:
         包含搜索结果的格式化字符串
@@ -1318,29 +1682,6 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
     异常:
         ValueError: 如果指定了不支持的搜索 API
     """
-    if search_api == "tavily":
-        # Tavily search tool used with both workflow and agent 
-        return await tavily_search.ainvoke({'queries': query_list}, **params_to_pass)
-    elif search_api == "duckduckgo":
-        # DuckDuckGo search tool used with both workflow and agent 
-        return await duckduckgo_search.ainvoke({'search_queries': query_list})
-    elif search_api == "perplexity":
-        search_results = perplexity_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "exa":
-        search_results = await exa_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "arxiv":
-        search_results = await arxiv_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "pubmed":
-        search_results = await pubmed_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "linkup":
-        search_results = await linkup_search(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    elif search_api == "googlesearch":
-        search_results = await google_search_async(query_list, **params_to_pass)
-        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000)
-    else:
-        raise ValueError(f"Unsupported search API: {search_api}")
+    search_docs = await execute_search(search_api, query_list, params_to_pass, cache=cache, bypass_cache=bypass_cache)
+    return format_search_docs(search_api, search_docs, token_budget=token_budget, token_counter=token_counter,
+                              queries=query_list, passage_chars=passage_chars)
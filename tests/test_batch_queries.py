@@ -0,0 +1,104 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.prompts import query_writer_instructions
+from open_deep_research.state import (
+    Feedback,
+    Queries,
+    SearchQuery,
+    Section,
+    SectionQueries,
+    SectionQueriesBatch,
+    Sections,
+)
+from open_deep_research.utils import match_batch_queries
+
+PLAN = [
+    Section(name="Intro", description="introduction", research=False, content=""),
+    Section(name="Hardware", description="accelerator hardware", research=True, content=""),
+    Section(name="Software", description="software stack", research=True, content=""),
+]
+
+
+def batch(*entries):
+    return SectionQueriesBatch(sections=[
+        SectionQueries(section_name=name, queries=[SearchQuery(search_query=q) for q in queries])
+        for name, queries in entries
+    ])
+
+
+def test_match_batch_queries_validates_each_section():
+    research = [s for s in PLAN if s.research]
+    matched = match_batch_queries(
+        batch((" hardware ", ["gpu", "GPU", " ", "tpu", "npu"]), ("Software", ["  "]), ("Unknown", ["x"])),
+        research, number_of_queries=2)
+    # Names match case- and whitespace-insensitively; duplicates and blank queries are dropped
+    assert matched == {"Hardware": [SearchQuery(search_query="gpu"), SearchQuery(search_query="tpu")]}
+    assert match_batch_queries(AIMessage(content="not structured"), research, 2) == {}
+    assert match_batch_queries(None, research, 2) == {}
+
+
+def run_report(monkeypatch, thread_id, batch_query_generation):
+    """Run the graph with fakes and return the per-section query prompts, the searched queries and the report."""
+    per_section_calls = []
+
+    class FakeModel:
+        def __init__(self, structured_output=None):
+            self.structured_output = structured_output
+
+        async def ainvoke(self, messages, **kwargs):
+            if self.structured_output is SectionQueriesBatch:
+                # Software is missing from the batch and falls back to its own generate_queries
+                return batch(("Hardware", ["gpu roadmap"]))
+            if self.structured_output is Queries:
+                if messages[0].content.startswith(query_writer_instructions[:20]):
+                    per_section_calls.append(messages[0].content)
+                return Queries(queries=[SearchQuery(search_query="fallback query")])
+            if self.structured_output is Sections:
+                return Sections(sections=[s.model_copy() for s in PLAN])
+            if self.structured_output is Feedback:
+                return Feedback(grade="pass", follow_up_queries=[])
+            return AIMessage(content="written")
+
+    searched = []
+
+    async def fake_provider(search_api, queries, params):
+        searched.extend(queries)
+        return [{"query": q, "results": [{"title": "t", "url": f"https://{q}", "content": "c", "raw_content": "q"}]}
+                for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    graph = graph_module.builder.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"search_api": "exa", "thread_id": thread_id, "warm_cache_min_coverage": 2.0,
+                               "batch_query_generation": batch_query_generation}}
+
+    asyncio.run(graph.ainvoke({"topic": "t"}, config))
+    asyncio.run(graph.ainvoke(Command(resume={"feedback": "正确"}), config))
+    return per_section_calls, searched, graph.get_state(config).values["final_report"]
+
+
+def test_batch_queries_skip_per_section_generation(monkeypatch):
+    per_section_calls, searched, report = run_report(monkeypatch, "batch-1", True)
+
+    assert len(per_section_calls) == 1 and "software stack" in per_section_calls[0]
+    assert "gpu roadmap" in searched
+    assert report == "written\n\nwritten\n\nwritten"
+
+
+def test_batch_query_generation_can_be_turned_off(monkeypatch):
+    per_section_calls, searched, report = run_report(monkeypatch, "batch-off", False)
+
+    # Every research section goes back through its own generate_queries
+    assert len(per_section_calls) == 2
+    assert any("accelerator hardware" in c for c in per_section_calls)
+    assert any("software stack" in c for c in per_section_calls)
+    assert "gpu roadmap" not in searched
+    assert report == "written\n\nwritten\n\nwritten"
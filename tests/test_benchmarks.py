@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+
+from bench_end_to_end import measure  # noqa: E402
+from fakes import FakeChatModel, FakeSearchBackend, install_fakes  # noqa: E402
+from load_test import percentile, run_level  # noqa: E402
+
+
+def args(**overrides):
+    values = dict(queries=2, llm_latency=0.0, search_latency=0.0, results=3, content_chars=2000, output_chars=500,
+                  max_concurrent_sections=4, max_concurrent_llm_calls=8, repeat=1, topic="Offline benchmark topic",
+                  cassette=None, config=None)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_graph_runs_offline_end_to_end():
+    result = asyncio.run(measure("graph", sections=2, depth=2, args=args()))
+
+    # 2 planning queries, then 2 queries per section and iteration
+    assert result["search_calls"] == 2 + 2 * 2 * 2
+    # Planning queries and plan, queries per section, then write + grade per iteration, and introduction and conclusion
+    assert result["llm_calls"] == 2 + 2 + 2 * 2 * 2 + 2
+    assert result["report_chars"] > 0 and result["peak_mem_mb"] > 0
+    assert result["critical_path"][0] == "generate_report_plan"
+    assert result["critical_path"][-1] == "compile_final_report"
+    assert 0 < result["critical_path_s"] <= result["wall_s"] + 0.05
+
+
+def test_multi_agent_runs_offline_end_to_end():
+    result = asyncio.run(measure("multi_agent", sections=3, depth=1, args=args()))
+
+    assert result["search_calls"] == 3 * 2
+    # Supervisor: plan, introduction, conclusion, finish; researchers: search, section, finish
+    assert result["llm_calls"] == 4 + 3 * 3
+    assert result["report_chars"] > 0
+
+
+def test_percentile():
+    assert percentile([], 99) == 0.0
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([1.0, 2.0], 100) == 2.0
+
+
+def test_load_level_runs_concurrent_reports():
+    chat_model = FakeChatModel(sections=2, search_depth=1)
+
+    async def level():
+        with install_fakes(chat_model, FakeSearchBackend(counter=chat_model.counter)):
+            return await run_level(4, args(workflow="graph", depth=1, stream=True, topic=None))
+
+    result = asyncio.run(level())
+
+    assert result["completed"] == 4 and result["failed"] == 0
+    assert result["reports_per_min"] > 0 and result["p50_s"] <= result["p99_s"]
+    assert result["lag_max_ms"] >= 0
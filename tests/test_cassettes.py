@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from open_deep_research import graph as graph_module
+from open_deep_research import model_registry, utils
+from open_deep_research.cassettes import Cassette, CassetteMissError, cassette_search, install_cassette_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+
+from fakes import FakeChatModel, FakeSearchBackend  # noqa: E402
+
+
+def run_in(config, make):
+    """Await a coroutine inside a runnable, as graph nodes do, so calls see the config."""
+    async def call(_):
+        return await make()
+
+    return asyncio.run(RunnableLambda(call).ainvoke(None, config))
+
+
+def cassette_config(path, mode):
+    return {"configurable": {"cassette_path": str(path), "cassette_mode": mode, "cassette_replay_latency": "zero"}}
+
+
+def test_chat_model_calls_are_recorded_and_replayed(tmp_path):
+    path = tmp_path / "chat.jsonl.gz"
+    recorded = install_cassette_cache(GenericFakeChatModel(messages=iter([
+        AIMessage(content="", tool_calls=[{"name": "Sections", "args": {"sections": ["a"]}, "id": "call_1"}]),
+        AIMessage(content="second answer"),
+    ])))
+
+    async def ask_twice(model):
+        return [await model.ainvoke("same prompt"), await model.ainvoke("same prompt")]
+
+    first = run_in(cassette_config(path, "record"), lambda: ask_twice(recorded))
+    assert len(Cassette(str(path))) == 2
+
+    replayer = install_cassette_cache(GenericFakeChatModel(messages=iter([AIMessage(content="live")])))
+    replayed = run_in(cassette_config(path, "replay"), lambda: ask_twice(replayer))
+    # The same prompt is answered in recorded order
+    assert [m.content for m in replayed] == ["", "second answer"]
+    assert replayed[0].tool_calls == first[0].tool_calls
+
+    with pytest.raises(CassetteMissError):
+        run_in(cassette_config(path, "replay"), lambda: replayer.ainvoke("another prompt"))
+
+
+def test_search_entries_are_per_query(tmp_path):
+    path = tmp_path / "search.jsonl.gz"
+    batches = []
+
+    async def fetch(queries):
+        batches.append(queries)
+        return [{"query": q, "results": [{"url": f"https://{q}"}]} for q in queries]
+
+    run_in(cassette_config(path, "record"), lambda: cassette_search("tavily", ["a", "b"], {"max_results": 1}, fetch))
+
+    # Replayed one query at a time, without reaching the provider
+    replayed = run_in(cassette_config(path, "replay"),
+                      lambda: cassette_search("tavily", ["b"], {"max_results": 1}, fetch))
+    assert replayed == [{"query": "b", "results": [{"url": "https://b"}]}]
+    assert batches == [["a", "b"]]
+
+    with pytest.raises(CassetteMissError):
+        run_in(cassette_config(path, "replay"), lambda: cassette_search("tavily", ["a"], {"max_results": 5}, fetch))
+
+
+def test_graph_run_replays_offline(monkeypatch, tmp_path):
+    path = tmp_path / "run.jsonl.gz"
+    backend = FakeSearchBackend(results=2, content_chars=1500)
+    monkeypatch.setattr(model_registry, "init_chat_model", lambda **kwargs: FakeChatModel(sections=2))
+    monkeypatch.setattr(utils, "get_tavily_client", lambda: backend)
+    model_registry.clear_model_registry()
+
+    def run_report(thread_id, mode):
+        graph = graph_module.builder.compile(checkpointer=MemorySaver())
+        config = {"configurable": {"thread_id": thread_id, "search_api": "tavily", "max_search_depth": 1,
+                                   **cassette_config(path, mode)["configurable"]}}
+
+        async def run():
+            await graph.ainvoke({"topic": "cassettes"}, config)
+            return await graph.ainvoke(Command(resume={"feedback": "正确"}), config)
+
+        return asyncio.run(run())["final_report"]
+
+    try:
+        report = run_report("cassette-record", "record")
+        searches = backend.counter.get("search_calls")
+
+        async def offline(*args, **kwargs):
+            raise AssertionError("replay reached the model")
+
+        monkeypatch.setattr(FakeChatModel, "_agenerate", offline)
+        assert run_report("cassette-replay", "replay") == report
+        assert backend.counter.get("search_calls") == searches
+    finally:
+        model_registry.clear_model_registry()
@@ -0,0 +1,28 @@
+import asyncio
+
+from open_deep_research.clients import aclose_clients, client_pool_stats, get_http_client, get_requests_session
+
+
+def test_http_client_is_reused_within_a_loop_and_closed_on_shutdown():
+    async def run():
+        client = get_http_client()
+        assert get_http_client() is client
+        assert client_pool_stats()["loop_clients"] >= 1
+        await aclose_clients()
+        return client
+
+    client = asyncio.run(run())
+    assert client.is_closed
+
+
+def test_each_event_loop_gets_its_own_async_clients():
+    async def get():
+        return get_http_client()
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+    assert first is not second
+
+
+def test_requests_session_is_process_wide():
+    assert get_requests_session() is get_requests_session()
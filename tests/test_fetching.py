@@ -0,0 +1,59 @@
+import asyncio
+
+from open_deep_research.fetching import fetch_concurrently
+
+
+def test_results_keep_input_order():
+    delays = {"https://a.com/1": 0.03, "https://b.com/1": 0.01, "https://c.com/1": 0.02}
+
+    async def fetch_one(url):
+        await asyncio.sleep(delays[url])
+        return url.upper()
+
+    results, stats = asyncio.run(fetch_concurrently(list(delays), fetch_one))
+    assert results == [url.upper() for url in delays]
+    assert stats.summary()["fetches"] == 3
+    assert stats.summary()["failures"] == 0
+    # Concurrent, so the batch takes about as long as the slowest fetch
+    assert stats.wall_time < 0.06
+
+
+def test_per_host_and_global_limits():
+    in_flight = {"total": 0, "a.com": 0}
+    peaks = {"total": 0, "a.com": 0}
+
+    async def fetch_one(url):
+        host = "a.com" if "a.com" in url else None
+        in_flight["total"] += 1
+        peaks["total"] = max(peaks["total"], in_flight["total"])
+        if host:
+            in_flight[host] += 1
+            peaks[host] = max(peaks[host], in_flight[host])
+        await asyncio.sleep(0.01)
+        in_flight["total"] -= 1
+        if host:
+            in_flight[host] -= 1
+        return url
+
+    urls = [f"https://a.com/{i}" for i in range(6)] + [f"https://b{i}.com/" for i in range(6)]
+    asyncio.run(fetch_concurrently(urls, fetch_one, max_concurrency=4, per_host_limit=2))
+    assert peaks["a.com"] <= 2
+    assert peaks["total"] <= 4
+
+
+def test_request_and_total_deadlines():
+    async def fetch_one(url):
+        if "slow" in url:
+            await asyncio.sleep(1)
+        return url
+
+    results, stats = asyncio.run(fetch_concurrently(
+        ["https://fast.com", "https://slow.com"], fetch_one, request_timeout=0.05, total_timeout=1))
+    assert results[0] == "https://fast.com"
+    assert isinstance(results[1], asyncio.TimeoutError)
+    assert stats.summary()["failures"] == 1
+
+    urls = [f"https://slow{i}.com" for i in range(3)]
+    results, stats = asyncio.run(fetch_concurrently(urls, fetch_one, max_concurrency=1, request_timeout=None, total_timeout=0.05))
+    assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+    assert stats.wall_time < 0.5
@@ -0,0 +1,64 @@
+import io
+
+from open_deep_research.formatting import iter_source_segments, render, truncate, write_segments
+from open_deep_research.state import Section
+from open_deep_research.utils import (
+    deduplicate_and_format_sources,
+    format_scraped_pages,
+    format_sections,
+    format_tavily_results,
+)
+
+RESPONSE = [
+    {"query": "q1", "results": [
+        {"title": "A", "url": "https://a", "content": "a summary", "raw_content": "x" * 50},
+        {"title": "B", "url": "https://b", "content": "b summary", "raw_content": None},
+    ]},
+    {"query": "q2", "results": [
+        {"title": "A2", "url": "https://a", "content": "a2 summary", "raw_content": "short"},
+    ]},
+]
+
+
+def test_truncate_copies_only_kept_prefix():
+    assert truncate("abcdef", 3, "...") == "abc..."
+    assert truncate("abc", 3, "...") == "abc"
+    assert truncate("abc", None) == "abc"
+
+
+def test_deduplicate_and_format_sources_keeps_last_source_per_url():
+    text = deduplicate_and_format_sources(RESPONSE, max_tokens_per_source=2)
+    assert text.startswith("Content from sources:\n" + "=" * 80 + "\nSource: A2\n")
+    assert "Full source content limited to 2 tokens: short\n\n" in text
+    assert "Source: B\n" in text and text.count("URL: https://a\n") == 1
+    assert text.endswith("=" * 80)
+
+
+def test_format_tavily_results_keeps_first_source_per_url():
+    text = format_tavily_results(RESPONSE)
+    assert text == (
+        "Search results: \n\n"
+        "\n\n--- SOURCE 1: A ---\nURL: https://a\n\nSUMMARY:\na summary\n\nFULL CONTENT:\n" + "x" * 50
+        + "\n\n" + "-" * 80 + "\n"
+        "\n\n--- SOURCE 2: B ---\nURL: https://b\n\nSUMMARY:\nb summary\n\n"
+        "\n\n" + "-" * 80 + "\n"
+    )
+
+
+def test_format_scraped_pages_and_sections():
+    assert format_scraped_pages(["T"], ["https://t"], ["body"]) == (
+        "Search results: \n\n\n\n--- SOURCE 1: T ---\nURL: https://t\n\nFULL CONTENT:\n body\n\n" + "-" * 80 + "\n"
+    )
+    section = Section(name="Intro", description="d", research=False, content="")
+    assert format_sections([section]) == (
+        f"\n{'=' * 60}\nSection 1: Intro\n{'=' * 60}\nDescription:\nd\nRequires Research: \nFalse\n\n"
+        "Content:\n[Not yet written]\n\n"
+    )
+
+
+def test_write_segments_matches_render():
+    sources = [result for r in RESPONSE for result in r["results"] if result["raw_content"]]
+    buffer = io.StringIO()
+    written = write_segments(iter_source_segments(sources), buffer)
+    assert buffer.getvalue() == render(iter_source_segments(sources))
+    assert written == len(buffer.getvalue())
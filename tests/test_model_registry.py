@@ -0,0 +1,26 @@
+from open_deep_research.model_registry import ModelRegistry
+from open_deep_research.state import Queries
+
+
+def test_models_and_structured_wrappers_are_reused(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    registry = ModelRegistry()
+
+    writer = registry.get("gpt-4.1", model_provider="openai", model_kwargs={"temperature": 0}, base_url="http://localhost:8000/v1")
+    assert registry.get("gpt-4.1", model_provider="openai", model_kwargs={"temperature": 0}, base_url="http://localhost:8000/v1") is writer
+
+    structured = registry.get("gpt-4.1", model_provider="openai", model_kwargs={"temperature": 0},
+                              base_url="http://localhost:8000/v1", structured_output=Queries)
+    assert structured is registry.get("gpt-4.1", model_provider="openai", model_kwargs={"temperature": 0},
+                                      base_url="http://localhost:8000/v1", structured_output=Queries)
+    assert structured is not writer
+
+    # A different endpoint or kwargs gets its own client
+    assert registry.get("gpt-4.1", model_provider="openai", model_kwargs={"temperature": 0}) is not writer
+    assert registry.get("gpt-4.1", model_provider="openai", model_kwargs={"temperature": 1},
+                        base_url="http://localhost:8000/v1") is not writer
+
+    stats = registry.stats()
+    assert stats["requests"] == 6
+    assert stats["reuses"] == 2
+    assert stats["pool_size"] == 4
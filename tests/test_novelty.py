@@ -0,0 +1,89 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.novelty import is_low_yield, measure_novelty, section_stop_log, shingles
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section
+
+TEXT = "accelerators trade memory bandwidth against compute density in modern data centers"
+
+
+def response(*results):
+    return {"query": "q", "results": [{"title": u, "url": u, "content": c, "score": s} for u, c, s in results]}
+
+
+def test_measure_novelty():
+    previous = [response(("https://a", TEXT, 0.8))]
+    repeated = measure_novelty(previous, [response(("https://b", TEXT, 0.2))], iteration=2)
+    assert repeated.new_urls == 1 and repeated.new_shingles == 0 and repeated.content_growth == 0.0
+    assert repeated.score_gain == 0.25
+
+    fresh = measure_novelty(previous, [response(("https://c", "liquid cooling lowers rack power usage effectiveness "
+                                                              "in dense deployments today", 0.8))], iteration=2)
+    assert fresh.content_growth > 0.5 and fresh.score_gain == 1.0
+    assert measure_novelty(previous, [], iteration=2).new_urls == 0
+    assert len(shingles(TEXT)) == len(TEXT.split()) - 4
+
+
+def test_is_low_yield():
+    assert not is_low_yield(None, 0.1, 0.1)
+    assert is_low_yield({"content_growth": 0.05, "score_gain": 0.0}, 0.1, 0.1)
+    assert not is_low_yield({"content_growth": 0.05, "score_gain": 0.5}, 0.1, 0.1)
+    assert not is_low_yield({"content_growth": 0.0, "score_gain": 0.0}, 0.0, 0.0)
+
+
+def run_stalling_section(monkeypatch, name, **configurable):
+    """Research a section whose every search returns the same page; returns the queries searched."""
+    follow_ups = iter(range(100))
+
+    class FakeModel:
+        def __init__(self, structured_output=None):
+            self.structured_output = structured_output
+
+        async def ainvoke(self, messages, **kwargs):
+            if self.structured_output is Queries:
+                return Queries(queries=[SearchQuery(search_query="first")])
+            if self.structured_output is Feedback:
+                return Feedback(grade="fail", follow_up_queries=[SearchQuery(search_query=f"more {next(follow_ups)}")])
+            return AIMessage(content="written")
+
+    searches = []
+
+    async def fake_provider(search_api, queries, params):
+        searches.extend(queries)
+        # Every query returns the same page
+        return [{"query": q, "results": [{"title": "t", "url": "https://same", "content": TEXT, "raw_content": TEXT}]}
+                for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    section = Section(name=name, description="d", research=True, content="")
+    config = {"configurable": {"search_api": "exa", "max_search_depth": 5, **configurable}}
+
+    output = asyncio.run(graph_module.section_graph.ainvoke({"topic": "t", "section": section, "search_iterations": 0},
+                                                            config))
+
+    assert [s.name for s in output["completed_sections"]] == [name]
+    return searches
+
+
+def test_section_stops_when_searching_adds_nothing(monkeypatch):
+    searches = run_stalling_section(monkeypatch, "Stalls")
+
+    assert searches == ["first", "more 0"]
+    entry = section_stop_log()[-1]
+    assert entry["section"] == "Stalls" and entry["reason"] == "low_novelty" and entry["iterations"] == 2
+    assert entry["novelty"][0]["new_urls"] == 0
+
+
+def test_zero_thresholds_disable_the_novelty_stop(monkeypatch):
+    searches = run_stalling_section(monkeypatch, "Persists", novelty_min_content_growth=0, novelty_min_score_gain=0)
+
+    # 0 reaches the node through the RunnableConfig, so only max_search_depth stops the section
+    assert searches == ["first", "more 0", "more 1", "more 2", "more 3"]
+    entry = section_stop_log()[-1]
+    assert entry["section"] == "Persists" and entry["reason"] == "max_depth" and entry["iterations"] == 5
@@ -0,0 +1,95 @@
+import asyncio
+
+from open_deep_research.page_store import PageFetchAborted, PageStore, canonicalize_url, get_page_store
+
+
+def test_canonicalize_url():
+    assert canonicalize_url("HTTPS://Example.com:443/a/?utm_source=x&b=2&a=1#frag") == "https://example.com/a?a=1&b=2"
+    assert canonicalize_url("http://example.com") == "http://example.com/"
+    assert canonicalize_url("https://example.com/a") == canonicalize_url("https://example.com/a/")
+
+
+def test_concurrent_fetches_coalesce():
+    store = PageStore()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "page"
+
+    async def run():
+        results = await asyncio.gather(*[store.get_or_fetch("https://example.com/a?utm_medium=x", fetch) for _ in range(5)])
+        # Served from the store without a new fetch
+        results.append(await store.get_or_fetch("https://example.com/a/", fetch))
+        return results
+
+    assert asyncio.run(run()) == ["page"] * 6
+    assert len(calls) == 1
+    assert store.stats() == {"hits": 1, "misses": 1, "coalesced": 4, "pages": 1}
+
+
+def test_failures_are_shared_but_not_stored():
+    store = PageStore()
+
+    async def failing_fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        return await asyncio.gather(*[store.get_or_fetch("https://example.com", failing_fetch) for _ in range(2)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert store.get("https://example.com") is None
+
+
+def test_extractors_do_not_collide():
+    store = PageStore()
+    store.put("https://example.com", "# markdown")
+    store.put("https://example.com", "plain text", kind="text")
+    assert store.get("https://example.com") == "# markdown"
+    assert store.get("https://example.com", kind="text") == "plain text"
+
+
+def test_run_stores_are_isolated():
+    assert get_page_store("run-a") is get_page_store("run-a")
+    assert get_page_store("run-a") is not get_page_store("run-b")
+    assert get_page_store() is get_page_store(None)
+
+
+def test_finished_run_releases_its_store():
+    from open_deep_research.graph import compile_final_report
+    from open_deep_research.state import Section
+
+    store = get_page_store("run-done")
+    store.put("https://example.com", "# markdown")
+    shared = get_page_store()
+    section = Section(name="Intro", description="d", research=False, content="")
+    state = {"sections": [section], "completed_sections": [section.model_copy(update={"content": "text"})]}
+
+    compile_final_report(state, {"configurable": {"thread_id": "run-done"}})
+    assert get_page_store("run-done") is not store
+    assert get_page_store("run-done").get("https://example.com") is None
+
+    # Runs sharing the process-wide store leave it in place
+    compile_final_report(state, {"configurable": {"thread_id": "run-done", "page_store_scope": "process"}})
+    assert get_page_store() is shared
+
+
+def test_cancelled_owner_fails_waiters_with_an_exception():
+    async def slow():
+        await asyncio.sleep(1)
+        return "late"
+
+    async def run():
+        store = PageStore()
+        owner = asyncio.create_task(asyncio.wait_for(store.get_or_fetch("https://example.com", slow), 0.1))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(store.get_or_fetch("https://example.com", slow))
+        return await asyncio.gather(owner, waiter, return_exceptions=True)
+
+    owner_result, waiter_result = asyncio.run(run())
+    assert isinstance(owner_result, asyncio.TimeoutError)
+    assert isinstance(waiter_result, PageFetchAborted)
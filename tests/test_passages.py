@@ -0,0 +1,54 @@
+import numpy as np
+
+from open_deep_research.passages import PassageIndex, chunk_text, select_passages, tokenize
+from open_deep_research.token_budget import estimate_tokens
+from open_deep_research.utils import format_search_docs
+
+BOILERPLATE = "\n\n".join(f"Menu item {i} | Home | Login | Subscribe to our newsletter" for i in range(60))
+RELEVANT = "Grouped-query attention shares key and value heads to shrink the KV cache during inference."
+
+
+def make_docs():
+    return [{"query": "q", "results": [
+        {"title": "Page", "url": "https://example.com/a", "content": "summary", "score": 0.9,
+         "raw_content": BOILERPLATE + "\n\n" + RELEVANT + "\n\n" + BOILERPLATE},
+        {"title": "中文页面", "url": "https://example.com/b", "content": "摘要", "score": 0.5,
+         "raw_content": "网站导航。登录注册。\n\n" * 30 + "分组查询注意力通过共享键值头减少推理时的缓存占用。"},
+    ]}]
+
+
+def test_tokenize_uses_words_and_cjk_bigrams():
+    assert tokenize("KV Cache 缓存占用") == ["kv", "cache", "缓存", "存占", "占用"]
+
+
+def test_chunk_text_respects_max_chars():
+    passages = chunk_text(BOILERPLATE + "\n\n" + "x" * 1500, max_chars=200)
+    assert all(len(p) <= 200 for p in passages)
+    assert "".join(passages).count("x") == 1500
+
+
+def test_bm25_ranks_matching_passage_first():
+    index = PassageIndex(["the cat sat", "grouped query attention kv cache", "kv"])
+    scores = index.score("kv cache attention")
+    assert int(np.argmax(scores)) == 1
+    assert index.score("unrelated words").sum() == 0
+
+
+def test_select_passages_keeps_relevant_text_under_budget():
+    docs = select_passages(make_docs(), ["grouped-query attention KV cache", "分组查询注意力 缓存"],
+                           token_budget=200, count=estimate_tokens, passage_chars=100)
+    english, chinese = (r["raw_content"] for r in docs[0]["results"])
+    assert RELEVANT in english
+    assert "分组查询注意力" in chinese
+    assert estimate_tokens(english) + estimate_tokens(chinese) <= 200
+
+
+def test_format_search_docs_prefers_relevant_passages_over_head():
+    text = format_search_docs("exa", make_docs(), token_budget=600, queries=["grouped-query attention KV cache"])
+    assert RELEVANT in text
+    assert estimate_tokens(text) <= 600
+
+
+def test_unmatched_queries_leave_documents_unchanged():
+    docs = make_docs()
+    assert select_passages(docs, ["zzz qqq"]) is docs
@@ -0,0 +1,95 @@
+import asyncio
+import sqlite3
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.persistence import durable_graph, get_node_memo, make_node_key
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section
+
+
+class FakeModel:
+    def __init__(self, calls, structured_output=None, fail=False):
+        self.calls = calls
+        self.structured_output = structured_output
+        self.fail = fail
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls.append(self.structured_output)
+        if self.structured_output is Queries:
+            return Queries(queries=[SearchQuery(search_query="memo query")])
+        if self.structured_output is Feedback:
+            return Feedback(grade="pass", follow_up_queries=[])
+        if self.fail:
+            raise ValueError("malformed output")
+        return AIMessage(content="section text")
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    llm_calls, search_calls = [], []
+    state = {"fail_writer": False}
+
+    def fake_get_chat_model(model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None):
+        return FakeModel(llm_calls, structured_output, fail=state["fail_writer"] and structured_output is None)
+
+    async def fake_provider(search_api, queries, params):
+        search_calls.append(list(queries))
+        return [{"query": q, "results": [{"title": "t", "url": "https://memo", "content": "c", "score": 1.0,
+                                          "raw_content": "memo query evidence"}]} for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model", fake_get_chat_model)
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    return llm_calls, search_calls, state
+
+
+def section_input():
+    return {"topic": "t", "section": Section(name="s", description="d", research=True, content=""), "search_iterations": 0}
+
+
+def test_make_node_key_ignores_message_ids():
+    a = {"messages": [AIMessage(content="x", id="1")]}
+    b = {"messages": [AIMessage(content="x", id="2")]}
+    assert make_node_key("n", a) == make_node_key("n", b)
+    assert make_node_key("n", a) != make_node_key("other", a)
+
+
+def test_rerun_replays_completed_nodes_and_retries_failed_branch(tmp_path, fakes):
+    llm_calls, search_calls, state = fakes
+    config = {"configurable": {"search_api": "exa", "node_memo_path": str(tmp_path / "memo.sqlite")}}
+
+    state["fail_writer"] = True
+    with pytest.raises(ValueError):
+        asyncio.run(graph_module.section_graph.ainvoke(section_input(), config))
+    assert search_calls == [["memo query"]]
+    calls_before_retry = len(llm_calls)
+
+    state["fail_writer"] = False
+    output = asyncio.run(graph_module.section_graph.ainvoke(section_input(), config))
+    assert output["completed_sections"][0].content == "section text"
+    # Queries and search were replayed; only the writer and grader ran again
+    assert search_calls == [["memo query"]]
+    assert llm_calls[calls_before_retry:] == [None, Feedback]
+
+    # A full re-run costs nothing
+    calls = len(llm_calls)
+    again = asyncio.run(graph_module.section_graph.ainvoke(section_input(), config))
+    assert again == output
+    assert len(llm_calls) == calls
+    assert get_node_memo(str(tmp_path / "memo.sqlite")).stats()["entries"] == 3
+
+
+def test_durable_graph_checkpoints_to_sqlite_wal(tmp_path, fakes):
+    path = str(tmp_path / "checkpoints.sqlite")
+
+    async def run():
+        async with durable_graph(graph_module.section_builder, path) as graph:
+            config = {"configurable": {"search_api": "exa", "thread_id": "report-1"}}
+            await graph.ainvoke(section_input(), config)
+            return await graph.aget_state(config)
+
+    snapshot = asyncio.run(run())
+    assert snapshot.values["completed_sections"][0].content == "section text"
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+
+from open_deep_research.profiling import profile_scope, profile_summary
+from open_deep_research.tracing import traced_node, trace_run
+
+
+def burn(seconds):
+    """Spin on the CPU for a while, allocating a list that outlives the call."""
+    kept = []
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        kept.append(str(len(kept)))
+    return kept
+
+
+def profile_config(run, tmp_path, targets):
+    return {"configurable": {"thread_id": run, "profile_targets": targets, "profile_dir": str(tmp_path),
+                             "profile_interval_ms": 1.0}}
+
+
+def test_unselected_names_are_not_profiled(tmp_path):
+    config = profile_config("profile-off", tmp_path, ["search:*"])
+    with profile_scope("write_section", config) as call:
+        assert call is None
+    assert not os.listdir(tmp_path)
+
+
+def test_node_profile_separates_cpu_from_waiting(tmp_path):
+    held = []
+
+    @traced_node("busy_node")
+    async def busy_node(state, config):
+        held.append(burn(0.2))
+        await asyncio.sleep(0.3)
+        return {}
+
+    config = profile_config("profile-node", tmp_path, ["busy_*"])
+
+    async def run():
+        async with trace_run(echo=False) as trace:
+            await busy_node({}, config)
+        return trace.spans
+
+    spans = asyncio.run(run())
+    summary = profile_summary("profile-node")["busy_node"]
+    assert summary["calls"] == 1 and summary["samples"] > 0
+    assert 0 < summary["cpu_s"] < summary["wall_s"]
+    assert summary["allocated_bytes"] > 0
+    assert spans[0].attributes["cpu_s"] > 0 and spans[0].attributes["alloc_bytes"] > 0
+
+    run_dir = tmp_path / "profile-node"
+    assert sorted(os.listdir(run_dir)) == ["allocations.txt", "busy_node.folded", "busy_node.txt"]
+    assert "burn (tests/test_profiling.py" in (run_dir / "busy_node.folded").read_text()
+    report = (run_dir / "busy_node.txt").read_text()
+    assert "waiting" in report and "Hottest functions" in report
+    assert "test_profiling.py" in (run_dir / "allocations.txt").read_text()
+
+
+def test_concurrent_calls_are_attributed_to_their_own_target(tmp_path):
+    config = profile_config("profile-concurrent", tmp_path, ["*"])
+
+    async def busy():
+        with profile_scope("busy", config):
+            # CPU spent in a child task still counts for the call that started it
+            await asyncio.create_task(spin())
+
+    async def spin():
+        for _ in range(10):
+            burn(0.02)
+            await asyncio.sleep(0)
+
+    async def idle():
+        with profile_scope("idle", config):
+            await asyncio.sleep(0.3)
+
+    def sync_node():
+        with profile_scope("sync", config):
+            burn(0.05)
+
+    async def run():
+        await asyncio.gather(busy(), idle(), asyncio.to_thread(sync_node))
+
+    asyncio.run(run())
+    summary = profile_summary("profile-concurrent")
+    assert summary["busy"]["samples"] > 20
+    assert summary["idle"]["samples"] < summary["busy"]["samples"] / 5
+    # Calls off the main thread are measured with their thread's CPU time
+    assert summary["sync"]["samples"] == 0 and summary["sync"]["cpu_s"] > 0
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from open_deep_research.query_coalescer import QueryCoalescer, query_terms, token_set_similarity
+
+
+def test_near_duplicate_queries_share_terms():
+    a = query_terms("X market size 2024")
+    assert a == query_terms("x  Market size in 2024")
+    assert token_set_similarity(a, query_terms("X market size 2023")) < 0.85
+    assert token_set_similarity(query_terms("大模型 推理 加速"), query_terms("大模型的推理加速")) >= 0.85
+
+
+def test_concurrent_branches_share_one_search():
+    fetched = []
+
+    async def fetch(queries):
+        fetched.append(list(queries))
+        await asyncio.sleep(0.01)
+        return [{"query": q, "results": [{"url": f"https://{q}"}]} for q in queries]
+
+    async def run():
+        coalescer = QueryCoalescer()
+        first, second = await asyncio.gather(
+            coalescer.search("exa", ["X market size 2024", "X growth drivers"], {}, fetch),
+            coalescer.search("exa", ["x market size in 2024", "X growth drivers", "X regulation"], {}, fetch),
+        )
+        later = await coalescer.search("exa", ["X Market Size 2024"], {}, fetch)
+        other_params = await coalescer.search("exa", ["X market size 2024"], {"max_results": 3}, fetch)
+        return coalescer, first, second, later, other_params
+
+    coalescer, (first, _), (second, searched), (later, searched_later), (other_params, _) = asyncio.run(run())
+    assert fetched == [["X market size 2024", "X growth drivers"], ["X regulation"], ["X market size 2024"]]
+    # The response of the searched query fans out to every query coalesced into it
+    assert second[0]["results"] == first[0]["results"] and second[1] == first[1]
+    assert later[0]["query"] == "X market size 2024"
+    # Only queries a call searched itself are reported as searched
+    assert searched == ["X regulation"] and searched_later == []
+    assert other_params[0]["results"] == first[0]["results"]
+    assert coalescer.stats() == {"queries": 7, "searches": 4, "exact_duplicates": 2, "near_duplicates": 1,
+                                 "dedup_ratio": 3 / 7}
+
+
+def test_failed_searches_are_not_reused():
+    calls = []
+
+    async def fetch(queries):
+        calls.append(list(queries))
+        if len(calls) == 1:
+            return [{"query": q, "error": "rate limited", "results": []} for q in queries]
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        return [{"query": q, "results": []} for q in queries]
+
+    async def run():
+        coalescer = QueryCoalescer()
+        assert (await coalescer.search("exa", ["q"], {}, fetch))[0][0]["error"] == "rate limited"
+        with pytest.raises(RuntimeError):
+            await coalescer.search("exa", ["q"], {}, fetch)
+        assert "error" not in (await coalescer.search("exa", ["q"], {}, fetch))[0][0]
+        await coalescer.search("exa", ["q"], {}, fetch)
+
+    asyncio.run(run())
+    assert calls == [["q"], ["q"], ["q"]]
+
+
+def test_in_flight_only_coalescer_searches_again_once_done():
+    calls = []
+
+    async def fetch(queries):
+        calls.append(list(queries))
+        return [{"query": q, "results": []} for q in queries]
+
+    async def run():
+        coalescer = QueryCoalescer(keep_completed=False)
+        await coalescer.search("exa", ["q"], {}, fetch)
+        await coalescer.search("exa", ["q"], {}, fetch)
+
+    asyncio.run(run())
+    assert calls == [["q"], ["q"]]
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from open_deep_research.rate_limit import TokenBucket, configure_rate_limits, get_rate_limiter, parse_retry_after
+
+
+def test_burst_then_steady_rate():
+    bucket = TokenBucket(rate=20, burst=3)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    # Three tokens are available immediately, the other two refill at 20/s
+    assert 0.08 <= elapsed < 0.3
+    assert bucket.stats()["acquired"] == 5
+
+
+def test_concurrent_callers_share_the_bucket():
+    bucket = TokenBucket(rate=50, burst=1)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(6)])
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_rate_limited_feedback_pauses_and_slows_down():
+    bucket = TokenBucket(rate=100, burst=5)
+    bucket.report_rate_limited(retry_after=0.1)
+    assert bucket.rate == 50
+
+    start = time.monotonic()
+    bucket.acquire_sync()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+
+
+def test_configure_overrides():
+    configure_rate_limits({"test-provider": {"rate": 2, "burst": 4}})
+    stats = get_rate_limiter("test-provider").stats()
+    assert stats["base_rate"] == 2
+    assert stats["burst"] == 4
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.configuration import Configuration
+from open_deep_research.scheduler import PriorityLimiter, endpoint_key, get_llm_limiter, llm_slot, scheduler_stats, section_priority
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section
+
+
+def test_limiter_bounds_concurrency_and_serves_priority_first():
+    limiter = PriorityLimiter(2)
+    running = 0
+    peak = 0
+    order = []
+
+    async def job(name, priority):
+        nonlocal running, peak
+        async with limiter.slot(priority):
+            running += 1
+            peak = max(peak, running)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def run():
+        await asyncio.gather(*(job(f"short{i}", 1) for i in range(2)),
+                             job("medium", 5), job("long", 10), job("tiny", 0))
+
+    asyncio.run(run())
+    assert peak == 2
+    # The first two take free slots, the queued jobs run longest first
+    assert order[2:] == ["long", "medium", "tiny"]
+    stats = limiter.stats()
+    assert stats["acquired"] == 5
+    assert stats["max_queue_depth"] == 3
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+    assert stats["max_wait"] > 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = PriorityLimiter(1)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        # The slot is free again
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+        limiter.release()
+
+    asyncio.run(run())
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_resizing_wakes_waiters():
+    limiter = PriorityLimiter(1)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.configure(2)
+        await asyncio.wait_for(waiter, timeout=1)
+        assert limiter.stats()["in_flight"] == 2
+
+    asyncio.run(run())
+
+
+def test_endpoint_key_and_registry(monkeypatch):
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    assert endpoint_key("qwen", "openai", "http://vllm:8000/v1") == "http://vllm:8000/v1"
+    assert endpoint_key("openai:gpt-4.1") == "openai:gpt-4.1"
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://vllm:8000/v1")
+    assert endpoint_key("qwen", "openai") == "http://vllm:8000/v1"
+
+    limiter = get_llm_limiter("http://test-endpoint", 3)
+    assert get_llm_limiter("http://test-endpoint") is limiter
+    assert scheduler_stats()["llm"]["http://test-endpoint"]["capacity"] == 3
+    assert section_priority("a longer section description") > section_priority("short")
+
+
+def test_section_calls_share_the_configured_endpoint_limiter(monkeypatch):
+    endpoints = []
+    base_urls = []
+
+    class FakeModel:
+        def __init__(self, structured_output=None):
+            self.structured_output = structured_output
+
+        async def ainvoke(self, messages, **kwargs):
+            if self.structured_output is Queries:
+                return Queries(queries=[SearchQuery(search_query="q")])
+            if self.structured_output is Feedback:
+                return Feedback(grade="pass", follow_up_queries=[])
+            return AIMessage(content="written")
+
+    def get_chat_model(model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None):
+        base_urls.append(base_url)
+        return FakeModel(structured_output)
+
+    def recording_slot(endpoint, *args, **kwargs):
+        endpoints.append(endpoint)
+        return llm_slot(endpoint, *args, **kwargs)
+
+    async def fake_provider(search_api, queries, params):
+        return [{"query": q, "results": [{"title": "t", "url": "https://a", "content": "c", "raw_content": "r"}]}
+                for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model", get_chat_model)
+    monkeypatch.setattr(graph_module, "llm_slot", recording_slot)
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    # The planner and writer share one self-hosted endpoint by default
+    endpoint = Configuration.writer_model_base_url
+    assert Configuration.planer_model_base_url == endpoint
+    config = {"configurable": {"search_api": "exa"}}
+    section = Section(name="S", description="d", research=True, content="")
+
+    asyncio.run(graph_module.section_graph.ainvoke({"topic": "t", "section": section, "search_iterations": 0}, config))
+
+    # Query writing, writing and grading all count against the one limiter of the endpoint they call
+    assert len(endpoints) == 3 and set(endpoints) == {endpoint}
+    assert set(base_urls) == {endpoint}
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from open_deep_research import utils
+from open_deep_research.search_cache import SearchCache, make_cache_key
+
+
+def make_response(query):
+    return {"query": query, "follow_up_questions": None, "answer": None, "images": [],
+            "results": [{"title": query, "url": f"https://example.com/{query}", "content": "c", "score": 1.0, "raw_content": "r"}]}
+
+
+def test_cache_key_normalizes_query():
+    assert make_cache_key("tavily", "MCP  servers ", {"max_results": 5}) == make_cache_key("tavily", "mcp servers", {"max_results": 5})
+    assert make_cache_key("tavily", "mcp servers", {"max_results": 5}) != make_cache_key("tavily", "mcp servers", {"max_results": 1})
+    assert make_cache_key("tavily", "mcp servers", {}) != make_cache_key("exa", "mcp servers", {})
+
+
+def test_cache_hit_miss_and_ttl(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    assert cache.get("tavily", "q", {}) is None
+    cache.set("tavily", "q", {}, make_response("q"))
+    assert cache.get("tavily", " Q ", {})["query"] == "q"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("tavily", "q", {}) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("tavily", "a", {}, make_response("a"))
+    time.sleep(0.01)
+    cache.set("tavily", "b", {}, make_response("b"))
+    time.sleep(0.01)
+    cache.get("tavily", "a", {})
+    cache.set("tavily", "c", {}, make_response("c"))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("tavily", "b", {}) is None
+    assert cache.get("tavily", "a", {}) is not None
+
+
+def test_execute_search_only_fetches_misses(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_provider(search_api, query_list, params_to_pass):
+        calls.append(list(query_list))
+        return [make_response(query) for query in query_list]
+
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    cache = SearchCache(str(tmp_path / "cache.sqlite"))
+
+    asyncio.run(utils.execute_search("exa", ["a", "b"], {}, cache=cache))
+    docs = asyncio.run(utils.execute_search("exa", ["b", "c"], {}, cache=cache))
+    asyncio.run(utils.execute_search("exa", ["a"], {}, cache=cache, bypass_cache=True))
+
+    assert calls == [["a", "b"], ["c"], ["a"]]
+    assert [doc["query"] for doc in docs] == ["b", "c"]
+
+
+def test_coalesced_queries_are_not_cached_under_their_own_key(tmp_path, monkeypatch):
+    async def fake_provider(search_api, query_list, params_to_pass):
+        return [make_response(query) for query in query_list]
+
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    cache = SearchCache(str(tmp_path / "cache.sqlite"))
+
+    async def search(_):
+        await utils.execute_search("exa", ["X market size 2024"], {}, cache=cache)
+        return await utils.execute_search("exa", ["X market size in 2024"], {}, cache=cache)
+
+    docs = asyncio.run(RunnableLambda(search).ainvoke(None, {"configurable": {"thread_id": "coalesce-cache"}}))
+
+    # The near-duplicate shares the run's response, but the cache only keeps the query actually searched
+    assert docs[0]["query"] == "X market size 2024"
+    assert cache.get("exa", "X market size 2024", {}) is not None
+    assert cache.get("exa", "X market size in 2024", {}) is None
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+
+from open_deep_research import utils
+
+
+def perplexity_transport(delay=0.05, fail_first=0):
+    calls = {"count": 0}
+
+    async def handler(request):
+        calls["count"] += 1
+        if calls["count"] <= fail_first:
+            return httpx.Response(503)
+        await asyncio.sleep(delay)
+        query = request.read().decode()
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": f"answer to {query[-20:]}"}}],
+            "citations": ["https://a.com", "https://b.com"],
+        })
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_perplexity_queries_run_concurrently(monkeypatch):
+    transport, calls = perplexity_transport(delay=0.1)
+    monkeypatch.setattr(utils, "get_http_client", lambda: httpx.AsyncClient(transport=transport))
+
+    async def run():
+        start = time.monotonic()
+        ticker = asyncio.create_task(asyncio.sleep(0.01))
+        docs = await utils.perplexity_search_async(["q1", "q2", "q3"])
+        # The event loop kept running other work while requests were outstanding
+        assert ticker.done()
+        return docs, time.monotonic() - start
+
+    docs, elapsed = asyncio.run(run())
+    assert [doc["query"] for doc in docs] == ["q1", "q2", "q3"]
+    assert docs[0]["results"][1]["url"] == "https://b.com"
+    assert calls["count"] == 3
+    assert elapsed < 0.25
+
+
+def test_perplexity_retries_server_errors(monkeypatch):
+    transport, calls = perplexity_transport(delay=0, fail_first=1)
+    monkeypatch.setattr(utils, "get_http_client", lambda: httpx.AsyncClient(transport=transport))
+    monkeypatch.setattr(utils.random, "random", lambda: 0.0)
+
+    docs = asyncio.run(utils.perplexity_search_async(["q1"], max_retries=2))
+    assert calls["count"] == 2
+    assert docs[0]["results"][0]["raw_content"].startswith("answer to")
@@ -0,0 +1,101 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.section_dag import SectionBoard, cyclic_sections, dependencies_of
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section, SectionQueriesBatch, Sections
+
+
+def section(name, research=False, depends_on=None, content=""):
+    return Section(name=name, description=f"about {name}", research=research, content=content, depends_on=depends_on)
+
+
+def test_dependencies_default_to_research_sections_in_plan_order():
+    plan = [section("Intro", depends_on=[]), section("A", research=True), section("B", research=True),
+            section("Summary"), section("Outlook", depends_on=["Summary", "A", "missing"])]
+    assert dependencies_of(plan[0], plan) == []
+    assert dependencies_of(plan[3], plan) == ["A", "B"]
+    assert dependencies_of(plan[4], plan) == ["A", "Summary"]
+
+
+def test_cyclic_sections():
+    plan = [section("A", research=True), section("X", depends_on=["Y"]), section("Y", depends_on=["X"]),
+            section("Z", depends_on=["A"]), section("Self", depends_on=["Self"])]
+    # A section never counts as its own dependency
+    assert cyclic_sections(plan) == {"X", "Y"}
+
+
+def test_section_board_wait_publish_fail_and_timeout():
+    async def run():
+        board = SectionBoard()
+        waiter = asyncio.create_task(board.wait_for(["A", "B"]))
+        await board.publish(section("A", content="a"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await board.publish(section("B", content="b"))
+        assert [s.content for s in await waiter] == ["a", "b"]
+
+        failing = asyncio.create_task(board.wait_for(["A", "C"]))
+        await board.fail("C")
+        assert await failing is None
+
+        assert await board.wait_for([]) == []
+        assert await board.wait_for(["D"], timeout=0.01) is None
+
+    asyncio.run(run())
+
+
+def test_independent_sections_are_written_while_research_runs(monkeypatch):
+    plan = [section("Intro", depends_on=[]), section("A", research=True), section("Conclusion", depends_on=["A"])]
+    final_prompts = {}
+    intro_written = asyncio.Event()
+
+    class FakeModel:
+        def __init__(self, structured_output=None):
+            self.structured_output = structured_output
+
+        async def ainvoke(self, messages, **kwargs):
+            if self.structured_output is Queries:
+                return Queries(queries=[SearchQuery(search_query="q")])
+            if self.structured_output is Sections:
+                return Sections(sections=[s.model_copy() for s in plan])
+            if self.structured_output is Feedback:
+                return Feedback(grade="pass", follow_up_queries=[])
+            if self.structured_output is SectionQueriesBatch:
+                return SectionQueriesBatch(sections=[])
+            prompt = messages[0].content
+            for name in ("Intro", "Conclusion"):
+                if f"<章节名称>\n{name}\n</章节名称>" in prompt:
+                    final_prompts[name] = prompt
+                    intro_written.set()
+                    return AIMessage(content=f"{name} text")
+            # The research section only finishes once the independent introduction is written
+            await asyncio.wait_for(intro_written.wait(), 5)
+            return AIMessage(content="A text")
+
+    async def fake_provider(search_api, queries, params):
+        return [{"query": q, "results": [{"title": "t", "url": f"https://{q}", "content": "c", "raw_content": "q"}]}
+                for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    graph = graph_module.builder.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"search_api": "exa", "thread_id": "dag-1"}}
+
+    async def nodes_run(input):
+        return [node async for update in graph.astream(input, config, stream_mode="updates") for node in update]
+
+    asyncio.run(nodes_run({"topic": "t"}))
+    nodes = asyncio.run(nodes_run(Command(resume={"feedback": "正确"})))
+
+    # Both sections were written early, so the final pass had nothing left to do
+    assert "write_dependent_sections" in nodes and "write_final_sections" not in nodes
+    assert graph.get_state(config).values["final_report"] == "Intro text\n\nA text\n\nConclusion text"
+    assert "Section 1" not in final_prompts["Intro"]
+    assert "Section 1: A\n" in final_prompts["Conclusion"] and "A text" in final_prompts["Conclusion"]
@@ -0,0 +1,85 @@
+import asyncio
+
+from open_deep_research import utils
+from open_deep_research.graph import search_web
+from open_deep_research.state import SearchQuery, Section
+from open_deep_research.utils import merge_search_docs
+
+
+def result(url, text):
+    return {"title": url, "url": url, "content": text, "score": 0.5, "raw_content": text}
+
+
+def test_merge_search_docs_adds_only_new_urls():
+    existing = [{"query": "a", "results": [result("https://1", "one")]}]
+    new = [{"query": "b", "results": [result("https://1", "again"), result("https://2", "two"), result("https://2", "dup")]},
+           {"query": "c", "results": [result("https://1", "third")]}]
+    merged = merge_search_docs(existing, new)
+    assert [[r["url"] for r in response["results"]] for response in merged] == [["https://1"], ["https://2"]]
+    assert merged[0]["results"][0]["content"] == "one"
+
+
+def test_search_web_accumulates_sources_across_iterations(monkeypatch):
+    calls = []
+
+    async def fake_provider(search_api, queries, params):
+        calls.append(list(queries))
+        return [{"query": q, "results": [result("https://shared", "shared page"), result(f"https://{q}", f"page for {q}")]}
+                for q in queries]
+
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    config = {"configurable": {"search_api": "exa"}}
+    state = {"topic": "t", "section": Section(name="s", description="d", research=True, content=""),
+             "search_iterations": 0, "search_queries": [SearchQuery(search_query="alpha")]}
+
+    first = asyncio.run(search_web(state, config))
+    state.update(first, search_queries=[SearchQuery(search_query="Alpha "), SearchQuery(search_query="beta")])
+    second = asyncio.run(search_web(state, config))
+
+    # The repeated query is not searched again
+    assert calls == [["alpha"], ["beta"]]
+    assert second["searched_queries"] == ["alpha", "beta"]
+    urls = [r["url"] for response in second["source_docs"] for r in response["results"]]
+    assert urls == ["https://shared", "https://alpha", "https://beta"]
+    # The writer sees old and new evidence
+    assert "page for alpha" in second["source_str"] and "page for beta" in second["source_str"]
+    assert second["search_iterations"] == 2
+
+
+def test_source_pool_coverage():
+    from open_deep_research.source_pool import SourcePool
+
+    pool = SourcePool([{"query": "plan", "results": [
+        {"title": "大模型推理优化", "url": "https://a", "content": "KV cache quantization reduces memory", "raw_content": None},
+    ]}])
+    assert pool.covers("KV cache quantization")
+    assert pool.covers("大模型推理")
+    assert not pool.covers("speculative decoding benchmarks")
+    assert [r["url"] for d in pool.relevant_docs(["KV cache quantization"]) for r in d["results"]] == ["https://a"]
+    assert pool.relevant_docs(["speculative decoding"]) == []
+
+
+def test_first_round_reuses_planning_results(monkeypatch):
+    from open_deep_research.source_pool import warm_cache_stats
+
+    calls = []
+
+    async def fake_provider(search_api, queries, params):
+        calls.append(list(queries))
+        return [{"query": q, "results": [result(f"https://{q}", f"page for {q}")]} for q in queries]
+
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    before = warm_cache_stats()
+    planning_docs = [{"query": "topic", "results": [result("https://plan", "planning page about kv cache quantization")]}]
+    state = {"topic": "t", "section": Section(name="s", description="d", research=True, content=""),
+             "search_iterations": 0, "planning_docs": planning_docs,
+             "search_queries": [SearchQuery(search_query="kv cache quantization"), SearchQuery(search_query="beta")]}
+
+    output = asyncio.run(search_web(state, {"configurable": {"search_api": "exa"}}))
+    # Only the uncovered query goes to the provider
+    assert calls == [["beta"]]
+    assert output["searched_queries"] == ["kv cache quantization", "beta"]
+    assert [r["url"] for d in output["source_docs"] for r in d["results"]] == ["https://plan", "https://beta"]
+    after = warm_cache_stats()
+    assert after["lookups"] - before["lookups"] == 2
+    assert after["hits"] - before["hits"] == 1
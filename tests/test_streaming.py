@@ -0,0 +1,70 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section, Sections
+from open_deep_research.streaming import OrderedSectionBuffer, astream_report
+
+PLAN = [
+    Section(name="A", description="first researched section", research=True, content=""),
+    Section(name="B", description="second researched section with a much longer description", research=True, content=""),
+    Section(name="Conclusion", description="wrap up", research=False, content=""),
+]
+
+
+class FakeModel:
+    def __init__(self, structured_output=None):
+        self.structured_output = structured_output
+
+    async def ainvoke(self, messages, **kwargs):
+        if self.structured_output is Queries:
+            return Queries(queries=[SearchQuery(search_query="q")])
+        if self.structured_output is Sections:
+            return Sections(sections=[section.model_copy() for section in PLAN])
+        if self.structured_output is Feedback:
+            return Feedback(grade="pass", follow_up_queries=[])
+        return AIMessage(content="written")
+
+
+def test_ordered_section_buffer():
+    buffer = OrderedSectionBuffer(["a", "b", "c"])
+    assert buffer.add("b", "B") == []
+    assert buffer.add("unknown", "x") == []
+    assert buffer.add("a", "A") == [{"index": 0, "name": "a", "content": "A"}, {"index": 1, "name": "b", "content": "B"}]
+    assert buffer.add("a", "again") == []
+    assert not buffer.complete
+    assert buffer.add("c", "C") == [{"index": 2, "name": "c", "content": "C"}]
+    assert buffer.complete
+
+
+def test_astream_report_emits_sections_in_plan_order(monkeypatch):
+    async def fake_provider(search_api, queries, params):
+        return [{"query": q, "results": [{"title": "t", "url": f"https://{q}", "content": "c", "raw_content": "q"}]}
+                for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    graph = graph_module.builder.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"search_api": "exa", "thread_id": "stream-1"}}
+
+    async def collect(input):
+        return [event async for event in astream_report(graph, input, config)]
+
+    first = asyncio.run(collect({"topic": "t"}))
+    assert [event["event"] for event in first] == ["interrupt"]
+
+    events = asyncio.run(collect(Command(resume={"feedback": "正确"})))
+    kinds = [event["event"] for event in events]
+    assert kinds[0] == "report_plan"
+    assert kinds[-1] == "final_report"
+    assert sorted(e["name"] for e in events if e["event"] == "section_ready") == ["A", "B", "Conclusion"]
+    ordered = [(e["index"], e["name"]) for e in events if e["event"] == "section"]
+    assert ordered == [(0, "A"), (1, "B"), (2, "Conclusion")]
+    # Every section is released before the final report is compiled
+    assert kinds.index("final_report") > max(i for i, kind in enumerate(kinds) if kind == "section")
@@ -0,0 +1,57 @@
+from open_deep_research.token_budget import (
+    estimate_tokens,
+    get_token_counter,
+    pack_sources,
+    remaining_budget,
+    truncate_to_tokens,
+)
+from open_deep_research.utils import format_search_docs
+
+
+def test_estimate_tokens_is_cjk_aware():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 40) == 10
+    # Chinese costs about one token per character, not a quarter
+    assert estimate_tokens("深度研究" * 10) == 40
+    assert estimate_tokens("深度 research") == 2 + 3
+
+
+def test_unknown_counter_falls_back_to_estimator():
+    assert get_token_counter(None) is estimate_tokens
+    assert get_token_counter("no-such-counter") is estimate_tokens
+
+
+def test_truncate_to_tokens_and_remaining_budget():
+    text = "中文" * 100
+    assert estimate_tokens(truncate_to_tokens(text, 50, estimate_tokens)) == 50
+    assert truncate_to_tokens("short", 10, estimate_tokens) == "short"
+    assert remaining_budget(100, estimate_tokens, "a" * 40, "中文") == 88
+    assert remaining_budget(1, estimate_tokens, "a" * 40) == 0
+
+
+def test_pack_sources_is_greedy_by_score():
+    docs = [{"query": "q", "results": [
+        {"title": "low", "url": "https://low", "content": "", "score": 0.1, "raw_content": "低" * 100},
+        {"title": "high", "url": "https://high", "content": "", "score": 0.9, "raw_content": "高" * 1000},
+        {"title": "mid", "url": "https://mid", "content": "", "score": 0.5, "raw_content": "中" * 100},
+    ]}]
+    packed = pack_sources(docs, budget=400, count=estimate_tokens, overhead_tokens=0, min_raw_tokens=50)
+    # The best source is cut to the whole budget, nothing else fits
+    assert [s["title"] for s in packed] == ["high"]
+    assert sum(estimate_tokens(s["raw_content"]) for s in packed) <= 400
+
+    packed = pack_sources(docs, budget=1300, count=estimate_tokens, overhead_tokens=0, min_raw_tokens=50)
+    assert [s["title"] for s in packed] == ["high", "mid", "low"]
+    assert packed[0]["raw_content"] == "高" * 1000
+
+
+def test_format_search_docs_respects_budget():
+    docs = [{"query": "q", "results": [
+        {"title": f"来源{i}", "url": f"https://example.com/{i}", "content": "摘要" * 50,
+         "score": 1.0 - i / 10, "raw_content": "正文" * 5000}
+        for i in range(5)
+    ]}]
+    for search_api in ("tavily", "exa", "duckduckgo"):
+        text = format_search_docs(search_api, docs, token_budget=3000)
+        assert estimate_tokens(text) <= 3000
+        assert "来源0" in text
@@ -0,0 +1,171 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.novelty import section_stop_log
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section, Sections
+from open_deep_research.token_ledger import (
+    LedgerEntry,
+    TokenLedger,
+    get_run_ledger,
+    ledger_entries,
+    ledger_scope,
+    over_budget,
+    start_run_ledger,
+    token_ledger_summary,
+)
+
+
+def fake_model(*messages):
+    return GenericFakeChatModel(messages=iter(messages))
+
+
+def run_in(config, call):
+    """Run a coroutine function inside a runnable, as graph nodes do, so calls see the config."""
+    asyncio.run(RunnableLambda(call).ainvoke(None, config))
+
+
+def test_reported_usage_is_charged_to_scope():
+    config = {"configurable": {"thread_id": "ledger-reported"}}
+    model = fake_model(AIMessage(content="done", usage_metadata={"input_tokens": 40, "output_tokens": 10,
+                                                                 "total_tokens": 50}))
+
+    async def call(_):
+        async with ledger_scope("writer", "Intro"):
+            with ledger_scope(role="grader"):
+                await model.ainvoke("hello")
+
+    run_in(config, call)
+
+    [entry] = ledger_entries("ledger-reported")
+    assert entry["role"] == "grader" and entry["section"] == "Intro"
+    assert (entry["input_tokens"], entry["output_tokens"], entry["estimated"]) == (40, 10, False)
+
+
+def test_missing_usage_is_estimated():
+    config = {"configurable": {"thread_id": "ledger-estimated"}}
+    model = fake_model(AIMessage(content="four words of output"))
+
+    async def call(_):
+        await model.ainvoke("two words")
+
+    run_in(config, call)
+
+    [entry] = ledger_entries("ledger-estimated")
+    assert entry["estimated"] and entry["input_tokens"] > 0 and entry["output_tokens"] > 0
+    assert token_ledger_summary("ledger-estimated")["total"]["estimated_calls"] == 1
+
+
+def test_summary_groups_and_costs():
+    ledger = TokenLedger("r", budget=1000, prices={"m": {"input": 1.0, "output": 2.0}})
+    ledger.record(LedgerEntry("write_section", "writer", "A", "m", 100, 50, False))
+    ledger.record(LedgerEntry("write_section", "grader", "A", "m", 200, 20, True))
+    ledger.record(LedgerEntry("generate_queries", "query_writer", "B", "other", 30, 0, False))
+
+    summary = ledger.summary()
+    assert summary["total"]["total_tokens"] == 400 and summary["used_fraction"] == 0.4
+    assert summary["by_node"]["write_section"]["calls"] == 2
+    assert summary["by_section"]["A"]["total_tokens"] == 370
+    assert summary["by_role"]["grader"]["estimated_calls"] == 1
+    assert summary["by_model"]["m"]["cost"] == (300 * 1.0 + 70 * 2.0) / 1e6
+    assert summary["by_model"]["other"]["cost"] == 0.0
+
+
+def test_section_degrades_near_budget(monkeypatch):
+    calls = []
+
+    class FakeModel:
+        def __init__(self, structured_output=None):
+            self.structured_output = structured_output
+
+        async def ainvoke(self, messages, **kwargs):
+            calls.append(self.structured_output)
+            if self.structured_output is Queries:
+                return Queries(queries=[SearchQuery(search_query=f"q{i}") for i in range(3)])
+            if self.structured_output is Feedback:
+                return Feedback(grade="fail", follow_up_queries=[SearchQuery(search_query="more")])
+            return AIMessage(content="written")
+
+    searches = []
+
+    async def fake_provider(search_api, queries, params):
+        searches.extend(queries)
+        return [{"query": q, "results": []} for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    config = {"configurable": {"thread_id": "ledger-budget", "search_api": "exa", "number_of_queries": 3,
+                               "run_token_budget": 100}}
+    ledger = get_run_ledger(config)
+    ledger.clear()
+    ledger.record(LedgerEntry("generate_report_plan", "planner", None, "m", 80, 5, False))
+    assert over_budget(config)
+
+    section = Section(name="Costs", description="d", research=True, content="")
+    output = asyncio.run(graph_module.section_graph.ainvoke({"topic": "t", "section": section, "search_iterations": 0},
+                                                            config))
+
+    assert [s.name for s in output["completed_sections"]] == ["Costs"]
+    assert searches == ["q0"]
+    assert Feedback not in calls
+    assert section_stop_log()[-1]["reason"] == "token_budget"
+
+
+def test_runs_without_thread_id_do_not_share_a_ledger():
+    async def report(_):
+        start_run_ledger()
+        # Let the other run start (and reset its ledger) before charging this one
+        await asyncio.sleep(0.01)
+        await fake_model(AIMessage(content="x", usage_metadata={"input_tokens": 5, "output_tokens": 1,
+                                                                "total_tokens": 6})).ainvoke("hi")
+        await asyncio.sleep(0.01)
+        return get_run_ledger()
+
+    async def run_both():
+        return await asyncio.gather(RunnableLambda(report).ainvoke(None), RunnableLambda(report).ainvoke(None))
+
+    first, second = asyncio.run(run_both())
+    assert first is not second and "default" not in (first.run, second.run)
+    assert first.total_tokens == second.total_tokens == 6
+
+
+def test_memoized_plan_still_starts_a_new_ledger(monkeypatch, tmp_path):
+    llm_calls = []
+
+    class FakeModel:
+        def __init__(self, structured_output=None):
+            self.structured_output = structured_output
+
+        async def ainvoke(self, messages, **kwargs):
+            llm_calls.append(self.structured_output)
+            if self.structured_output is Queries:
+                return Queries(queries=[SearchQuery(search_query="plan query")])
+            return Sections(sections=[Section(name="A", description="d", research=True, content="")])
+
+    async def fake_provider(search_api, queries, params):
+        return [{"query": q, "results": []} for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    config = {"configurable": {"thread_id": "ledger-memo", "search_api": "exa",
+                               "node_memo_path": str(tmp_path / "memo.sqlite")}}
+
+    async def plan(_):
+        return await graph_module.generate_report_plan({"topic": "t"}, config)
+
+    run_in(config, plan)
+    calls = len(llm_calls)
+    get_run_ledger(config).record(LedgerEntry("generate_report_plan", "planner", None, "m", 80, 5, False))
+
+    run_in(config, plan)
+    # The plan came from the memo, and the new report still starts from an empty ledger
+    assert len(llm_calls) == calls
+    assert get_run_ledger(config).total_tokens == 0
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command
+
+from open_deep_research import graph as graph_module
+from open_deep_research import utils
+from open_deep_research.scheduler import llm_slot
+from open_deep_research.state import Feedback, Queries, SearchQuery, Section, SectionQueriesBatch, Sections
+from open_deep_research.tracing import Span, critical_path, span, trace_run, traced_node
+
+PLAN = [
+    Section(name="A", description="researched", research=True, content=""),
+    Section(name="Conclusion", description="wrap up", research=False, content=""),
+]
+
+
+class FakeModel:
+    def __init__(self, structured_output=None):
+        self.structured_output = structured_output
+
+    async def ainvoke(self, messages, **kwargs):
+        if self.structured_output is Queries:
+            return Queries(queries=[SearchQuery(search_query="q")])
+        if self.structured_output is SectionQueriesBatch:
+            return SectionQueriesBatch(sections=[])
+        if self.structured_output is Sections:
+            return Sections(sections=[s.model_copy() for s in PLAN])
+        if self.structured_output is Feedback:
+            return Feedback(grade="pass", follow_up_queries=[])
+        return AIMessage(content="written")
+
+
+def test_graph_run_writes_spans_and_prints_critical_path(monkeypatch, tmp_path, capsys):
+    async def fake_provider(search_api, queries, params):
+        return [{"query": q, "results": [{"title": "t", "url": f"https://{q}", "content": "c", "raw_content": "q"}]}
+                for q in queries]
+
+    monkeypatch.setattr(graph_module, "get_chat_model",
+                        lambda model, model_provider=None, model_kwargs=None, base_url=None, structured_output=None:
+                        FakeModel(structured_output))
+    monkeypatch.setattr(utils, "run_search_provider", fake_provider)
+    path = tmp_path / "trace.jsonl"
+    graph = graph_module.builder.compile(checkpointer=MemorySaver())
+    config = {"configurable": {"search_api": "exa", "thread_id": "trace-1", "trace_path": str(path)}}
+
+    asyncio.run(graph.ainvoke({"topic": "t"}, config))
+    asyncio.run(graph.ainvoke(Command(resume={"feedback": "正确"}), config))
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert {s["run"] for s in spans} == {"trace-1"}
+    nodes = {s["name"]: s for s in spans if s["kind"] == "node"}
+    assert {"generate_report_plan", "human_feedback", "build_section_with_web_research",
+            "generate_queries", "search_web", "write_section", "write_dependent_sections",
+            "gather_completed_sections", "compile_final_report"} <= set(nodes)
+    # The human feedback node is interrupted on the first invocation
+    assert any(s["name"] == "human_feedback" and s["status"] == "interrupted" for s in spans)
+    # Subgraph nodes are children of the section branch
+    assert nodes["search_web"]["parent_id"] == nodes["build_section_with_web_research"]["span_id"]
+    assert "queue_wait" in nodes["build_section_with_web_research"]["attributes"]
+
+    llm_spans = [s for s in spans if s["kind"] == "llm"]
+    assert llm_spans and all("queue_wait" in s["attributes"] for s in llm_spans)
+    providers = [s for s in spans if s["name"] == "search:exa"]
+    assert providers and all(s["attributes"]["bytes_in"] > 0 and s["attributes"]["bytes_out"] > 0 for s in providers)
+    assert providers[0]["parent_id"] == nodes["generate_report_plan"]["span_id"]
+
+    out = capsys.readouterr().out
+    assert "Trace of run trace-1" in out and "Critical path:" in out and "compile_final_report" in out
+
+
+def test_concurrent_runs_without_thread_id_get_separate_traces(tmp_path, capsys):
+    @traced_node("step")
+    async def step(state):
+        # Let the other run start and finish its own steps in between
+        await asyncio.sleep(0.05 if state["topic"] == "slow" else 0)
+        return {}
+
+    @traced_node("finish", final=True)
+    async def finish(state):
+        return {}
+
+    builder = StateGraph(dict)
+    builder.add_node("step", step)
+    builder.add_node("finish", finish)
+    builder.add_edge(START, "step")
+    builder.add_edge("step", "finish")
+    builder.add_edge("finish", END)
+    graph = builder.compile()
+    path = tmp_path / "trace.jsonl"
+    config = {"configurable": {"trace_path": str(path)}}
+
+    async def run_both():
+        await asyncio.gather(graph.ainvoke({"topic": "slow"}, config), graph.ainvoke({"topic": "fast"}, config))
+
+    asyncio.run(run_both())
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    runs = {}
+    for s in spans:
+        runs.setdefault(s["run"], []).append(s["name"])
+    assert len(runs) == 2 and "default" not in runs
+    assert all(sorted(names) == ["finish", "step"] for names in runs.values())
+    assert capsys.readouterr().out.count("Critical path:") == 2
+
+
+def test_llm_spans_record_tokens_and_export_otlp(tmp_path):
+    model = GenericFakeChatModel(messages=iter([
+        AIMessage(content="hello there", usage_metadata={"input_tokens": 7, "output_tokens": 2, "total_tokens": 9})
+    ]))
+    path = tmp_path / "trace.otlp.jsonl"
+
+    async def run():
+        async with trace_run("otlp-run", path=str(path), format="otlp") as trace:
+            with span("node", "node"):
+                async with llm_slot("fake-endpoint", 2):
+                    await model.ainvoke([HumanMessage(content="hi")])
+        return trace
+
+    trace = asyncio.run(run())
+    llm = next(s for s in trace.spans if s.kind == "llm")
+    assert llm.attributes["input_tokens"] == 7 and llm.attributes["output_tokens"] == 2
+    assert llm.attributes["bytes_out"] == 2 and llm.attributes["bytes_in"] == len("hello there")
+
+    exported = [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0] for line in path.read_text().splitlines()]
+    assert [s["name"] for s in exported] == ["llm", "node"]
+    assert exported[0]["parentSpanId"] == exported[1]["spanId"] and exported[0]["kind"] == 3
+    assert {"key": "input_tokens", "value": {"intValue": "7"}} in exported[0]["attributes"]
+
+
+def test_critical_path_follows_the_latest_chain():
+    def make(name, start, duration, parent=None):
+        s = Span(name, "node", parent.span_id if parent else None)
+        s.start, s.duration = start, duration
+        return s
+
+    plan = make("plan", 0, 2)
+    fast = make("fast_section", 2, 1)
+    slow = make("slow_section", 2, 5)
+    search = make("search", 2.5, 3, parent=slow)
+    write = make("write", 5.5, 1.5, parent=slow)
+    final = make("final", 7, 1)
+    path = critical_path([plan, fast, slow, search, write, final])
+    assert [(depth, s.name) for depth, s in path] == [(0, "plan"), (0, "slow_section"), (1, "search"), (1, "write"),
+                                                      (0, "final")]